@@ -46,6 +46,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.staticfiles.StaticFilesMiddleware',
+    'core.profiling.SamplingProfilerMiddleware',
+    'core.slow_queries.SlowQueryLogMiddleware',
+    'core.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -84,7 +88,9 @@ DATABASES = {
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
-        'PASSWORD': os.environ.get('DB_PASS')
+        'PASSWORD': os.environ.get('DB_PASS'),
+        # The workers of the serve command keep their connection
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
     }
 }
 
@@ -107,6 +113,28 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# The first hasher is the preferred one, hashes made by the other
+# hashers are upgraded on the next successful login. Hashing runs in a pool
+# of PASSWORD_HASHING_WORKERS processes, 0 runs it in the request thread.
+# Use 0 with the serve command: its workers handle one request at a time,
+# so the number of workers already bounds the concurrent hashing and a pool
+# per worker only adds processes
+
+PASSWORD_HASHERS = [
+    'core.hashers.ScryptPasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
+# Argon2 requires the argon2-cffi package
+if os.environ.get('PASSWORD_HASHER') == 'argon2':
+    PASSWORD_HASHERS.insert(0, PASSWORD_HASHERS.pop(1))
+
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', 2))
+PASSWORD_HASHING_QUEUE = 32
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.0/topics/i18n/
@@ -131,4 +159,265 @@ MEDIA_URL = '/media/'
 STATIC_ROOT = '/vol/web/static'
 MEDIA_ROOT = '/vol/web/media'
 
+# Hashed names and .br and .gz variants are written by collectstatic and
+# served by core.staticfiles.StaticFilesMiddleware
+STATICFILES_STORAGE = 'core.staticfiles.CompressedManifestStaticFilesStorage'
+STATIC_COMPRESS_TYPES = [
+    'text/css', 'text/javascript', 'application/javascript',
+    'application/json', 'image/svg+xml', 'text/html', 'text/plain',
+]
+STATIC_COMPRESSION_LEVELS = {'br': 11, 'gzip': 9}
+STATIC_COMPRESS_RATIO = 0.95
+STATIC_IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+STATIC_MAX_AGE = 60
+# 'X-Accel-Redirect' with the internal location of STATIC_ROOT for nginx,
+# or 'X-Sendfile' with STATIC_ROOT for Apache, lets the front server send
+# the files, None sends them from the app
+STATIC_SENDFILE_HEADER = os.environ.get('STATIC_SENDFILE_HEADER') or None
+STATIC_SENDFILE_PREFIX = '/protected-static/'
+
 AUTH_USER_MODEL = 'core.User'
+
+
+# Preforking server of the serve command, see core.server
+# 0 workers sizes the pool to the cores available, the workers are replaced
+# after max requests plus a random jitter of up to the given number. A
+# worker handles one connection at a time, so a client sending or reading
+# slowly holds it for up to SERVER_TIMEOUT seconds per socket operation:
+# run it behind a buffering proxy such as the nginx of docker-compose
+
+SERVER_BIND = os.environ.get('SERVER_BIND', '0.0.0.0:8000')
+SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', 0))
+SERVER_MAX_REQUESTS = 10000
+SERVER_MAX_REQUESTS_JITTER = 1000
+# Seconds to wait for a client socket
+SERVER_TIMEOUT = int(os.environ.get('SERVER_TIMEOUT', 5))
+# Seconds to wait for the busy workers to stop
+SERVER_GRACEFUL_TIMEOUT = 30
+SERVER_BACKLOG = 2048
+# Requested once before the workers are forked
+SERVER_WARM_UP_PATHS = ['/recipe/recipes/']
+
+
+# Sampling profiler
+# Requests are profiled with probability PROFILING_SAMPLE_RATE or when they
+# carry a signed X-Profile-Token header (see core.profiling.make_profile_token)
+
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_TOKEN_MAX_AGE = 60 * 60
+PROFILING_DIR = os.environ.get('PROFILING_DIR', '/vol/web/profiles')
+PROFILING_INTERVAL = 0.005
+PROFILING_MAX_SAMPLES = 2000
+PROFILING_MAX_CONCURRENT = 1
+PROFILING_MAX_FILES = 50
+PROFILING_MAX_BYTES = 100 * 1024 * 1024
+
+
+# Slow query log
+# Statements slower than the threshold are aggregated in core.SlowQuery,
+# a sample of the slow SELECTs gets an EXPLAIN (ANALYZE, BUFFERS) on Postgres
+
+SLOW_QUERY_THRESHOLD_MS = float(
+    os.environ.get('SLOW_QUERY_THRESHOLD_MS', 100)
+)
+SLOW_QUERY_EXPLAIN_RATE = 0.1
+
+
+# Django REST framework
+# orjson and MessagePack renderers and parsers, see core.renderers,
+# token bucket rates, see core.throttling
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'core.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.ORJSONParser',
+        'core.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # Proxies in front of the app, the client address for the throttles
+    # is taken that deep from X-Forwarded-For, 0 uses REMOTE_ADDR
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+    'DEFAULT_THROTTLE_RATES': {
+        'read': '600/min',
+        'write': '120/min',
+        'upload': '20/min',
+        'login': '20/min',
+    },
+}
+
+# None keeps the buckets in the worker process, so that every limit holds
+# per worker and a client spread over the workers of the serve command gets
+# the rate once per worker. A cache alias, e.g. 'shared', shares them
+THROTTLE_CACHE = os.environ.get('THROTTLE_CACHE') or None
+
+
+# In-memory per-user recipe indexes (cookable and similar recipes)
+
+RECIPE_INDEX_TTL = 300
+RECIPE_INDEX_MAX_USERS = 1000
+COOKABLE_MAX_RESULTS = 100
+SIMILAR_MAX_RESULTS = 50
+# Changed recipes scored directly before the LSH index is compacted
+SIMILARITY_PENDING_LIMIT = 1000
+
+
+# Caches
+# Kept in each worker process. Everything that must be the same in all the
+# workers is keyed by a version read from the database, or kept in the
+# 'shared' database cache, created with the createcachetable command
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'default',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+    # Compressed response bodies, kept apart so that they do not evict the
+    # recipe representations, at most COMPRESSION_CACHE_MAX_SIZE each
+    'compression': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'compression',
+        'OPTIONS': {'MAX_ENTRIES': 500},
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'core_shared_cache',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
+
+# Cached recipe representations, see recipe.cache
+
+RECIPE_CACHE = 'default'
+RECIPE_CACHE_TIMEOUT = 10 * 60
+# Whole list responses, keyed by the change sequence of the user
+RECIPE_LIST_CACHE_TIMEOUT = 60
+# Expired entries are served this much longer while one request
+# refreshes them, and refreshed early with the probability scaled by beta
+RECIPE_CACHE_STALE_TIMEOUT = 60 * 60
+RECIPE_CACHE_EARLY_BETA = 1.0
+# Seconds between the flushes of the cache counters of a worker to the
+# database, see the cache_stats command
+RECIPE_CACHE_METRICS_INTERVAL = 10
+
+
+# Set-based add/remove of recipe tags and ingredients, see core.relations
+
+RECIPE_LINKS_MAX_IDS = 1000
+
+# Most recipes one ?ids multi-get returns
+RECIPE_MULTI_GET_MAX_IDS = 100
+
+
+# Read requests run by one request of the batch endpoint, see core.views
+BATCH_MAX_REQUESTS = 50
+
+
+# Transactional outbox, see core.outbox
+# Change events are written with the change and delivered to every sink
+# by the dispatch_outbox command, a failing batch is retried with backoff
+
+OUTBOX_SINKS = [
+    {
+        'BACKEND': 'core.outbox.FileSink',
+        'OPTIONS': {
+            'path': os.environ.get(
+                'OUTBOX_FILE', '/vol/web/outbox/events.jsonl'
+            ),
+        },
+    },
+]
+if os.environ.get('OUTBOX_WEBHOOK_URL'):
+    OUTBOX_SINKS.append({
+        'BACKEND': 'core.outbox.WebhookSink',
+        'OPTIONS': {'url': os.environ['OUTBOX_WEBHOOK_URL']},
+    })
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_POLL_INTERVAL = 1.0
+OUTBOX_MAX_ATTEMPTS = 12
+OUTBOX_MAX_BACKOFF = 5 * 60
+# Seconds a claimed batch is held by its dispatcher before it is retried
+OUTBOX_LEASE_TIMEOUT = 60
+
+
+# Change feed for syncing clients, see core.changes
+
+CHANGES_PAGE_SIZE = 500
+
+
+# Response compression, see core.compression
+# Encodings in order of preference, the content types missing from
+# COMPRESSION_LEVELS are not compressed. text/html is left out: the admin
+# and browsable API pages hold the CSRF token next to echoed query input,
+# which compression exposes to the BREACH attack
+
+COMPRESSION_ENCODINGS = ['br', 'zstd', 'gzip']
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_LEVELS = {
+    'application/json': {'br': 4, 'zstd': 3, 'gzip': 6},
+    'application/x-ndjson': {'br': 4, 'zstd': 3, 'gzip': 6},
+    'application/msgpack': {'zstd': 3, 'gzip': 6},
+    'text/css': {'br': 9, 'zstd': 9, 'gzip': 9},
+    'application/javascript': {'br': 9, 'zstd': 9, 'gzip': 9},
+}
+# Cache alias for the compressed bodies, None compresses every response
+COMPRESSION_CACHE = 'compression'
+COMPRESSION_CACHE_TIMEOUT = 10 * 60
+COMPRESSION_CACHE_MAX_SIZE = 64 * 1024
+
+# Streamed recipe exports
+EXPORT_BATCH_SIZE = 500
+
+
+# Account deletion, the users are deactivated at once and their data is
+# purged in batches by the purge_users command, see core.purge
+
+PURGE_BATCH_SIZE = 500
+PURGE_BATCH_PAUSE = 0.05
+PURGE_LEASE_TIMEOUT = 300
+
+
+# Job queue, jobs are stored in the database and run by the run_worker
+# command, see core.jobs. Retries wait JOB_RETRY_BACKOFF seconds doubled
+# per attempt, a running job is claimed again after its visibility timeout
+
+JOB_POOL = os.environ.get('JOB_POOL', 'thread')
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 4))
+JOB_POLL_INTERVAL = 1.0
+JOB_VISIBILITY_TIMEOUT = 5 * 60
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BACKOFF = 10
+JOB_MAX_BACKOFF = 60 * 60
+
+
+# Pagination, the lists are paginated when ?page or ?page_size is given.
+# Counts of querysets estimated at least this large use the PostgreSQL
+# planner estimate instead of COUNT(*), see core.pagination
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+ESTIMATED_COUNT_THRESHOLD = 100000
+
+
+# Hash partitioning of the recipes by owner on PostgreSQL, see
+# core.partitioning. 0 keeps the tables unpartitioned, the migration
+# partitions them when set, the partition_recipes command later on
+
+RECIPE_PARTITIONS = int(os.environ.get('RECIPE_PARTITIONS', 0))
+RECIPE_PARTITION_BATCH_SIZE = 10000
+
+
+# Idempotency-Key header of the POST requests, see core.idempotency.
+# Duplicates of a request in flight wait for its response, a request
+# in flight for longer than the lock timeout is considered lost
+
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+IDEMPOTENCY_WAIT_TIMEOUT = 30
+IDEMPOTENCY_POLL_INTERVAL = 0.1
+IDEMPOTENCY_LOCK_TIMEOUT = 5 * 60
@@ -18,10 +18,13 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.views import BatchView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('user/', include('user.urls')),
     path('recipe/', include('recipe.urls')),
+    path('batch/', BatchView.as_view(), name='batch'),
 ]
 
 if settings.DEBUG:
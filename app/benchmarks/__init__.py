@@ -0,0 +1,12 @@
+'''
+Standalone benchmarks, run from the app directory with
+python -m benchmarks.<name>
+'''
+import os
+
+import django
+
+
+def setup():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    django.setup()
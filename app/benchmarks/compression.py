@@ -0,0 +1,46 @@
+'''
+Compares the response encodings on a list of 1000 recipe representations:
+compression ratio, compression time and the cost of a compressed cache hit
+'''
+import time
+
+from benchmarks import setup
+
+setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+
+from benchmarks.renderers import recipes  # noqa: E402
+from core.compression import CODECS, compress  # noqa: E402
+from core.renderers import ORJSONRenderer  # noqa: E402
+
+ROUNDS = 50
+
+
+def measure(function, *args):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        function(*args)
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+
+def main():
+    body = ORJSONRenderer().render(recipes())
+    print(f'uncompressed {len(body)} bytes')
+
+    levels = settings.COMPRESSION_LEVELS['application/json']
+    for encoding, level in levels.items():
+        codec = CODECS[encoding]
+        compressed = codec.compress(body, level)
+        elapsed = measure(codec.compress, body, level)
+        cache.clear()
+        compress(body, encoding, level)
+        hit = measure(compress, body, encoding, level)
+        print(f'{encoding:5} level {level}  {len(compressed):7} bytes  '
+              f'ratio {len(body) / len(compressed):5.1f}  '
+              f'compress {elapsed:6.2f} ms  cache hit {hit:5.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+'''
+Measures the ingredient bitmap index for one user with 100k recipes
+of 5-15 ingredients out of 2000
+'''
+import random
+import time
+
+from benchmarks import setup
+
+setup()
+
+from core.ingredient_index import IngredientBitmapIndex  # noqa: E402
+
+RECIPES = 100000
+INGREDIENTS = 2000
+QUERIES = 50
+
+
+def main():
+    rng = random.Random(1)
+    links = [
+        (recipe_id, ingredient_id)
+        for recipe_id in range(RECIPES)
+        for ingredient_id in rng.sample(range(INGREDIENTS), rng.randint(5, 15))
+    ]
+
+    start = time.perf_counter()
+    index = IngredientBitmapIndex(links)
+    print(f'build: {(time.perf_counter() - start) * 1000:.0f}ms')
+
+    for max_missing in (0, 1, 2):
+        timings = []
+        found = 0
+        for _ in range(QUERIES):
+            have = rng.sample(range(INGREDIENTS), 300)
+            start = time.perf_counter()
+            found += len(index.search(have, max_missing))
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        print(f'missing={max_missing}: '
+              f'p50={timings[len(timings) // 2] * 1000:.1f}ms '
+              f'max={timings[-1] * 1000:.1f}ms '
+              f'avg results={found / QUERIES:.0f}')
+
+    start = time.perf_counter()
+    for recipe_id in range(1000):
+        index.add(recipe_id, [rng.randrange(INGREDIENTS)])
+    print(f'incremental add: '
+          f'{(time.perf_counter() - start):.3f}ms per change')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+'''
+Compares login throughput and the latency of a concurrent read workload
+with password hashing in the request threads and in the hashing pool
+'''
+import os
+import statistics
+import threading
+import time
+
+from benchmarks import setup
+
+setup()
+
+from django.test import override_settings  # noqa: E402
+
+from core.hashers import hash_password  # noqa: E402
+from core.models import User, Tag  # noqa: E402
+from recipe.serializers import TagSerializer  # noqa: E402
+
+DURATION = 5
+LOGIN_THREADS = 8
+PASSWORD = 'benchmarkpassword'
+
+
+def login_loop(user, stop, counter):
+    while not stop.is_set():
+        user.check_password(PASSWORD)
+        counter.append(1)
+
+
+def read_loop(stop, latencies):
+    tags = [Tag(name=f'tag {i}') for i in range(200)]
+    while not stop.is_set():
+        start = time.perf_counter()
+        TagSerializer(tags, many=True).data
+        latencies.append(time.perf_counter() - start)
+
+
+def run(workers):
+    with override_settings(PASSWORD_HASHING_WORKERS=workers):
+        user = User(email='bench@gmail.com', name='bench')
+        user.password = hash_password(PASSWORD)
+
+        stop = threading.Event()
+        logins, latencies = [], []
+        threads = [
+            threading.Thread(target=login_loop, args=(user, stop, logins))
+            for _ in range(LOGIN_THREADS)
+        ]
+        threads.append(
+            threading.Thread(target=read_loop, args=(stop, latencies))
+        )
+        for thread in threads:
+            thread.start()
+        time.sleep(DURATION)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f'workers={workers}: {len(logins) / DURATION:.1f} logins/s, '
+          f'read p50={p50:.2f}ms p99={p99:.2f}ms')
+
+
+def main():
+    run(0)
+    run(os.cpu_count())
+
+
+if __name__ == '__main__':
+    main()
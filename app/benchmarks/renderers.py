@@ -0,0 +1,67 @@
+'''
+Compares the DRF JSON, orjson and MessagePack renderers and parsers on a
+list of 1000 recipe representations: bytes on the wire and encode and
+decode time
+'''
+import io
+import random
+import time
+from collections import OrderedDict
+
+from benchmarks import setup
+
+setup()
+
+from rest_framework.parsers import JSONParser  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from rest_framework.utils.serializer_helpers import ReturnList  # noqa: E402
+
+from core.parsers import ORJSONParser, MessagePackParser  # noqa: E402
+from core.renderers import ORJSONRenderer, MessagePackRenderer  # noqa: E402
+
+RECIPES = 1000
+ROUNDS = 50
+
+
+def recipes():
+    rng = random.Random(1)
+    data = ReturnList(serializer=None)
+    for pk in range(1, RECIPES + 1):
+        data.append(OrderedDict([
+            ('id', pk),
+            ('title', f'Recipe {pk} with a reasonably long title'),
+            ('price', f'{rng.randint(100, 99999) / 100:.2f}'),
+            ('tags', rng.sample(range(1, 200), rng.randint(0, 6))),
+            ('ingredients', rng.sample(range(1, 2000), rng.randint(3, 15))),
+            ('coverage', rng.randint(1, 12) / 12),
+        ]))
+    return data
+
+
+def measure(function, *args):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        function(*args)
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+
+def main():
+    data = recipes()
+    pairs = [
+        ('DRF json', JSONRenderer(), JSONParser()),
+        ('orjson', ORJSONRenderer(), ORJSONParser()),
+        ('msgpack', MessagePackRenderer(), MessagePackParser()),
+    ]
+    for name, renderer, parser in pairs:
+        body = renderer.render(data)
+        encode = measure(renderer.render, data)
+        decode = measure(lambda: parser.parse(io.BytesIO(body)))
+        print(f'{name:10} {len(body):8} bytes  encode {encode:6.2f} ms  '
+              f'decode {decode:6.2f} ms')
+
+    identical = ORJSONRenderer().render(data) == JSONRenderer().render(data)
+    print(f'orjson output identical to DRF: {identical}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+'''
+Compares manage.py runserver with manage.py serve: the time from the
+start of the process to the first response, the latency of the first
+requests and the throughput and latency of CLIENTS concurrent clients
+'''
+import http.client
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+HOST = '127.0.0.1'
+PORT = 8765
+URL = '/recipe/tags/'
+CLIENTS = 8
+DURATION = 10
+WORKERS = os.environ.get('SERVER_WORKERS', '0')
+
+COMMANDS = {
+    'runserver': ['runserver', '--noreload', f'{HOST}:{PORT}'],
+    'serve': ['serve', '--bind', f'{HOST}:{PORT}', '--workers', WORKERS],
+}
+
+
+def get():
+    connection = http.client.HTTPConnection(HOST, PORT, timeout=10)
+    try:
+        start = time.perf_counter()
+        connection.request('GET', URL)
+        connection.getresponse().read()
+        return time.perf_counter() - start
+    finally:
+        connection.close()
+
+
+def wait_until_ready(process):
+    while process.poll() is None:
+        try:
+            with socket.create_connection((HOST, PORT), timeout=0.1):
+                return
+        except OSError:
+            time.sleep(0.005)
+    raise RuntimeError('The server exited')
+
+
+def client(stop, latencies):
+    while not stop.is_set():
+        latencies.append(get())
+
+
+def measure(name):
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, 'manage.py'] + COMMANDS[name],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready(process)
+        first = get()
+        ready = time.perf_counter() - start
+        second = get()
+
+        stop = threading.Event()
+        latencies = [[] for _ in range(CLIENTS)]
+        threads = [
+            threading.Thread(target=client, args=(stop, latencies[i]))
+            for i in range(CLIENTS)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(DURATION)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait()
+
+    timings = sorted(t for clients in latencies for t in clients)
+    print(f'{name:10} first response {ready * 1000:6.0f}ms  '
+          f'first request {first * 1000:5.1f}ms  '
+          f'second {second * 1000:5.1f}ms  '
+          f'{len(timings) / DURATION:7.0f} req/s  '
+          f'p50 {timings[len(timings) // 2] * 1000:5.1f}ms  '
+          f'p99 {timings[int(len(timings) * 0.99)] * 1000:6.1f}ms')
+
+
+def main():
+    for name in COMMANDS:
+        measure(name)
+        time.sleep(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+'''
+Compares the MinHash LSH index with the exact Jaccard computation on
+50k synthetic recipes built around shared ingredient themes
+'''
+import random
+import time
+
+import numpy as np
+
+from benchmarks import setup
+
+setup()
+
+from core.similarity import MinHashLSHIndex, minhash  # noqa: E402
+
+RECIPES = 50000
+THEMES = 500
+FEATURES = 5000
+QUERIES = 50
+K = 10
+
+
+def synthetic_recipes(rng):
+    themes = [rng.sample(range(FEATURES), 15) for _ in range(THEMES)]
+    recipes = []
+    for _ in range(RECIPES):
+        theme = rng.choice(themes)
+        kept = rng.sample(theme, rng.randint(8, 15))
+        noise = rng.sample(range(FEATURES), rng.randint(0, 4))
+        recipes.append(set(kept) | set(noise))
+    return recipes
+
+
+def exact_top(recipes, query, k):
+    target = recipes[query]
+    scores = [
+        (len(target & other) / len(target | other), i)
+        for i, other in enumerate(recipes) if i != query
+    ]
+    scores.sort(reverse=True)
+    return scores[:k]
+
+
+def main():
+    rng = random.Random(3)
+    recipes = synthetic_recipes(rng)
+
+    start = time.perf_counter()
+    signatures = minhash([
+        np.array(sorted(r), dtype=np.uint64) for r in recipes
+    ])
+    print(f'signatures: {time.perf_counter() - start:.2f}s')
+
+    start = time.perf_counter()
+    index = MinHashLSHIndex(list(range(RECIPES)), signatures)
+    print(f'index build: {time.perf_counter() - start:.2f}s')
+
+    lsh_times, exact_times, recalls = [], [], []
+    for query in rng.sample(range(RECIPES), QUERIES):
+        start = time.perf_counter()
+        found = {r for r, _ in index.similar(query, K)}
+        lsh_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        exact = exact_top(recipes, query, K)
+        exact_times.append(time.perf_counter() - start)
+
+        # recipes tied with the k-th exact score are equally correct
+        threshold = exact[-1][0]
+        relevant = sum(
+            1 for r in found
+            if len(recipes[query] & recipes[r])
+            / len(recipes[query] | recipes[r]) >= threshold
+        )
+        recalls.append(relevant / K)
+
+    print(f'LSH query p50: {np.median(lsh_times) * 1000:.2f}ms')
+    print(f'exact query p50: {np.median(exact_times) * 1000:.2f}ms')
+    print(f'recall@{K}: {np.mean(recalls):.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+'''Measures the per-request overhead of the token bucket throttles'''
+import time
+
+from benchmarks import setup
+
+setup()
+
+from django.test import RequestFactory, override_settings  # noqa: E402
+
+from core.throttling import ReadWriteThrottle  # noqa: E402
+
+ITERATIONS = 100000
+
+
+class User:
+    is_authenticated = True
+    pk = 1
+
+
+class View:
+    action = 'list'
+
+
+def main():
+    request = RequestFactory().get('/')
+    request.user = User()
+    view = View()
+
+    for alias in (None, 'default'):
+        with override_settings(THROTTLE_CACHE=alias):
+            start = time.perf_counter()
+            for _ in range(ITERATIONS):
+                ReadWriteThrottle().allow_request(request, view)
+            elapsed = time.perf_counter() - start
+
+        print(f'THROTTLE_CACHE={alias}: '
+              f'{elapsed / ITERATIONS * 1e6:.2f} us per request')
+
+
+if __name__ == '__main__':
+    main()
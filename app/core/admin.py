@@ -1,15 +1,29 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.utils import timezone
 
-from .models import User, Tag, Ingredient
+from .models import User, Tag, Ingredient, Recipe, SlowQuery, OutboxEvent, \
+    UserPurge, Job
+from .pagination import EstimatedCountPaginator
+from .purge import request_deletion
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    '''
+    Changelist of a large table, paged by estimated counts and without
+    the COUNT(*) of the unfiltered table
+    '''
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(BaseUserAdmin, LargeTableAdmin):
     ordering = ['id']
     list_display = ['email', 'name']
-    search_fields = ['email', 'name'],
+    search_fields = ['email', 'name']
     sortable_by = ['email', 'name']
+    actions = ['schedule_deletion']
     fieldsets = (
         (('Authentication'), {
             'fields': ('email', 'name', 'password'),
@@ -33,18 +47,103 @@ class UserAdmin(BaseUserAdmin):
         }),
     )
 
+    def schedule_deletion(self, request, queryset):
+        for user in queryset:
+            request_deletion(user)
+        self.message_user(
+            request, f'{len(queryset)} users deactivated and scheduled for '
+            'deletion'
+        )
+    schedule_deletion.short_description = \
+        'Deactivate and purge the selected users in the background'
+
 
-class RecepyAttrBaseAdmin(admin.ModelAdmin):
-    ordering = ['name']
+class RecepyAttrBaseAdmin(LargeTableAdmin):
+    ordering = ['-id']
+    list_display = ['name', 'owner', 'recipe_count']
+    list_select_related = ['owner']
     search_fields = ['name', ]
     sortable_by = ['name', 'owner', ]
+    autocomplete_fields = ['owner']
+    readonly_fields = ['recipe_count']
 
 
 @admin.register(Tag)
 class TagAdmin(RecepyAttrBaseAdmin):
-    ordering = ['-name']
+    pass
 
 
 @admin.register(Ingredient)
 class IngredientAdmin(RecepyAttrBaseAdmin):
-    search_fields = ['name', 'owner', ]
+    pass
+
+
+@admin.register(Recipe)
+class RecipeAdmin(LargeTableAdmin):
+    ordering = ['-id']
+    list_display = ['id', 'title', 'owner', 'price']
+    list_select_related = ['owner']
+    search_fields = ['title']
+    sortable_by = ['id', 'title', 'price']
+    autocomplete_fields = ['owner', 'tags', 'ingredients']
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    ordering = ['-total_duration']
+    list_display = ['sql', 'view', 'count', 'total_duration', 'max_duration',
+                    'last_seen']
+    list_filter = ['view']
+    search_fields = ['sql', 'fingerprint']
+    readonly_fields = ['fingerprint', 'sql', 'view', 'count',
+                       'total_duration', 'max_duration', 'explain',
+                       'last_seen']
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    ordering = ['id']
+    list_display = ['id', 'topic', 'object_id', 'created_at', 'attempts',
+                    'available_at']
+    list_filter = ['topic']
+    readonly_fields = ['topic', 'owner_id', 'object_id', 'payload',
+                       'created_at', 'attempts', 'last_error']
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(UserPurge)
+class UserPurgeAdmin(admin.ModelAdmin):
+    ordering = ['-requested_at']
+    list_display = ['email', 'requested_at', 'started_at', 'finished_at',
+                    'recipes', 'tags', 'ingredients', 'images']
+    search_fields = ['email']
+    readonly_fields = list_display + ['user_id']
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    ordering = ['-id']
+    list_display = ['id', 'task', 'status', 'priority', 'run_at', 'attempts',
+                    'worker']
+    list_filter = ['status', 'task']
+    readonly_fields = ['task', 'kwargs', 'created_at', 'attempts', 'worker',
+                       'last_error']
+    actions = ['retry']
+
+    def has_add_permission(self, request):
+        return False
+
+    def retry(self, request, queryset):
+        count = queryset.filter(status=Job.FAILED).update(
+            status=Job.QUEUED, attempts=0, run_at=timezone.now()
+        )
+        self.message_user(request, f'{count} failed jobs queued again')
+    retry.short_description = 'Queue the selected failed jobs again'
@@ -0,0 +1,76 @@
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+
+from core.models import Change, ChangeSequence, Tag, Ingredient, Recipe
+
+KINDS = {
+    Recipe: 'recipe',
+    Tag: 'tag',
+    Ingredient: 'ingredient',
+}
+
+
+def record_changes(owner_id, kind, object_ids, deleted=False):
+    '''
+    Moves the objects to the head of the change feed of the owner. Every
+    object gets the next number of the per-user sequence, the sequence
+    row stays locked until the transaction commits so the changes of one
+    user become visible in the order of their numbers
+    '''
+    object_ids = list(dict.fromkeys(object_ids))
+    if not object_ids:
+        return
+
+    qn = connection.ops.quote_name
+    user_table = qn(get_user_model()._meta.db_table)
+    sequence_table = qn(ChangeSequence._meta.db_table)
+    change_table = qn(Change._meta.db_table)
+    seq = qn('seq')
+    values = ', '.join(['(%s, %s, %s, %s, %s)'] * len(object_ids))
+
+    with transaction.atomic(savepoint=False):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {sequence_table} ({qn("owner_id")}, {seq}, '
+                f'{qn("signature_seq")}) '
+                f'SELECT {qn("id")}, %s, 0 FROM {user_table} '
+                f'WHERE {qn("id")} = %s '
+                f'ON CONFLICT ({qn("owner_id")}) DO UPDATE '
+                f'SET {seq} = {sequence_table}.{seq} + excluded.{seq} '
+                f'RETURNING {seq}',
+                [len(object_ids), owner_id],
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return
+            first = row[0] - len(object_ids) + 1
+
+            params = []
+            for number, object_id in enumerate(object_ids, first):
+                params += [owner_id, kind, object_id, number, deleted]
+            cursor.execute(
+                f'INSERT INTO {change_table} ({qn("owner_id")}, '
+                f'{qn("kind")}, {qn("object_id")}, {qn("seq")}, '
+                f'{qn("deleted")}) VALUES {values} '
+                f'ON CONFLICT ({qn("owner_id")}, {qn("kind")}, '
+                f'{qn("object_id")}) DO UPDATE SET '
+                f'{qn("seq")} = excluded.{qn("seq")}, '
+                f'{qn("deleted")} = excluded.{qn("deleted")}',
+                params,
+            )
+
+
+def read_changes(owner_id, since, limit):
+    '''
+    Returns ([(kind, object_id, seq, deleted)], has_more) of the objects
+    changed after the since sequence number with one indexed query. A
+    full sync (since 0) skips the tombstones
+    '''
+    changes = Change.objects.filter(owner_id=owner_id, seq__gt=since)
+    if not since:
+        changes = changes.filter(deleted=False)
+    page = list(
+        changes.order_by('seq')
+        .values_list('kind', 'object_id', 'seq', 'deleted')[:limit + 1]
+    )
+    return page[:limit], len(page) > limit
@@ -0,0 +1,193 @@
+import hashlib
+import zlib
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class GzipCodec:
+    name = 'gzip'
+
+    class Compressor:
+        def __init__(self, level):
+            self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+        def compress(self, data):
+            return self.compressor.compress(data) \
+                + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+        def finish(self):
+            return self.compressor.flush()
+
+    def compress(self, data, level):
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+
+
+class BrotliCodec:
+    name = 'br'
+
+    class Compressor:
+        def __init__(self, level):
+            self.compressor = brotli.Compressor(quality=level)
+
+        def compress(self, data):
+            return self.compressor.process(data) + self.compressor.flush()
+
+        def finish(self):
+            return self.compressor.finish()
+
+    def compress(self, data, level):
+        return brotli.compress(data, quality=level)
+
+
+class ZstdCodec:
+    name = 'zstd'
+
+    class Compressor:
+        def __init__(self, level):
+            self.compressor = zstandard.ZstdCompressor(level=level) \
+                .compressobj()
+
+        def compress(self, data):
+            return self.compressor.compress(data) + self.compressor.flush(
+                zstandard.COMPRESSOBJ_FLUSH_BLOCK
+            )
+
+        def finish(self):
+            return self.compressor.flush()
+
+    def compress(self, data, level):
+        return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+CODECS = {codec.name: codec for codec in [
+    GzipCodec(),
+    BrotliCodec() if brotli is not None else None,
+    ZstdCodec() if zstandard is not None else None,
+] if codec is not None}
+
+
+@lru_cache(maxsize=256)
+def negotiate(accept_encoding, preference):
+    '''
+    Returns the encoding with the highest q-value in the Accept-Encoding
+    header, ties go to the first encoding of the preference
+    '''
+    accepted = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+
+    best, best_q = None, 0.0
+    for name in preference:
+        q = accepted.get(name, accepted.get('*', 0.0))
+        if name in CODECS and q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def compress(data, encoding, level):
+    '''
+    Compresses the body once per content: the compressed bodies are kept
+    in COMPRESSION_CACHE under the digest of the uncompressed body, so
+    responses assembled from cached data are not compressed again.
+    Bodies over COMPRESSION_CACHE_MAX_SIZE are compressed every time
+    '''
+    codec = CODECS[encoding]
+    if settings.COMPRESSION_CACHE is None \
+            or len(data) > settings.COMPRESSION_CACHE_MAX_SIZE:
+        return codec.compress(data, level)
+
+    cache = caches[settings.COMPRESSION_CACHE]
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    key = f'compressed:{encoding}:{level}:{digest}'
+    compressed = cache.get(key)
+    if compressed is None:
+        compressed = codec.compress(data, level)
+        cache.set(key, compressed, settings.COMPRESSION_CACHE_TIMEOUT)
+    return compressed
+
+
+def compress_stream(chunks, encoding, level):
+    '''Compresses every chunk as it comes, flushing after each one'''
+    compressor = CODECS[encoding].Compressor(level)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware:
+    '''
+    Compresses the responses with the best encoding accepted by the
+    client. Only the content types listed in COMPRESSION_LEVELS are
+    compressed, with their levels, and bodies under COMPRESSION_MIN_SIZE
+    are sent as they are. Streaming responses are compressed chunk by
+    chunk
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.has_header('Content-Encoding') \
+                or response.status_code in (204, 206, 304):
+            return response
+
+        content_type = response.get('Content-Type', '') \
+            .split(';')[0].strip().lower()
+        levels = settings.COMPRESSION_LEVELS.get(content_type)
+        if not levels:
+            return response
+        if not response.streaming \
+                and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding', ))
+        encoding = negotiate(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''),
+            tuple(e for e in settings.COMPRESSION_ENCODINGS if e in levels),
+        )
+        if encoding is None:
+            return response
+        level = levels[encoding]
+
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content, encoding, level
+            )
+            del response['Content-Length']
+        else:
+            compressed = compress(response.content, encoding, level)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
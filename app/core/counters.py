@@ -0,0 +1,34 @@
+from collections import Counter
+
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def recompute_recipe_counts(model, through, column):
+    '''
+    Recomputes recipe_count of every tag or ingredient from the
+    recipe through table in a single UPDATE
+    '''
+    links = through.objects.filter(**{column: OuterRef('pk')}) \
+        .order_by().values(column).annotate(total=Count('*')).values('total')
+    return model.objects.update(recipe_count=Coalesce(
+        Subquery(links, output_field=IntegerField()), 0
+    ))
+
+
+def apply_count_changes(model, changes):
+    '''Applies {pk: delta} changes grouping the rows by their delta'''
+    by_delta = {}
+    for pk, delta in changes.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(pk)
+    for delta, pks in by_delta.items():
+        model.objects.filter(pk__in=pks).update(
+            recipe_count=F('recipe_count') + delta
+        )
+
+
+def linked_counts(through, column, **filters):
+    return Counter(
+        through.objects.filter(**filters).values_list(column, flat=True)
+    )
@@ -0,0 +1,34 @@
+import json
+
+from django.db import DatabaseError, connections, transaction
+
+
+def estimate_count(queryset):
+    '''
+    Returns the planner estimate of the rows of the queryset on
+    PostgreSQL, from pg_class for a whole table and from EXPLAIN
+    otherwise. Returns None on the other databases
+    '''
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    query = queryset.query
+    try:
+        with transaction.atomic(using=queryset.db), \
+                connection.cursor() as cursor:
+            if not query.where and not query.distinct \
+                    and not query.low_mark and query.high_mark is None:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                    [connection.ops.quote_name(queryset.model._meta.db_table)]
+                )
+                row = cursor.fetchone()
+                return int(row[0]) if row else None
+            sql, params = query.get_compiler(queryset.db).as_sql()
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+    except DatabaseError:
+        return None
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
@@ -1,4 +1,40 @@
+from decimal import Decimal, InvalidOperation
+
 from rest_framework import filters
+from rest_framework.exceptions import ValidationError
+
+
+def parse_ids(value, param):
+    '''Parses the comma separated list of ids of the query parameter'''
+    try:
+        return [int(i) for i in value.split(',') if i.strip()]
+    except ValueError:
+        raise ValidationError({param: 'Expected comma separated ids'})
+
+
+def parse_int(request, param, default, maximum=None):
+    '''Parses the non-negative integer query parameter'''
+    try:
+        value = int(request.query_params.get(param, default))
+    except ValueError:
+        value = -1
+    if value < 0:
+        raise ValidationError({param: 'Expected a non-negative number'})
+    return value if maximum is None else min(value, maximum)
+
+
+def parse_decimal(request, param):
+    '''Parses the decimal query parameter, None when it is not given'''
+    value = request.query_params.get(param)
+    if value is None:
+        return None
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        number = None
+    if number is None or not number.is_finite():
+        raise ValidationError({param: 'Expected a number'})
+    return number
 
 
 class IsOwnerFilterBackend(filters.BaseFilterBackend):
@@ -30,13 +66,63 @@ class RecipeIngredientsFilterBackend(filters.BaseFilterBackend):
 class AssignedToRecipeFilterBackend(filters.BaseFilterBackend):
     '''
     Filters tag or ingredient by the fact that it assigned or not to a recipe
+    using the maintained recipe_count
     '''
     def filter_queryset(self, request, queryset, view):
         assigned = (request.query_params.get('assigned') == '1')
         not_assigned = (request.query_params.get('not_assigned') == '1')
 
         if assigned:
-            return queryset.filter(recipe__isnull=False).distinct()
+            return queryset.filter(recipe_count__gt=0)
         elif not_assigned:
-            return queryset.filter(recipe__isnull=True).distinct()
+            return queryset.filter(recipe_count=0)
+        return queryset
+
+
+class RecipePriceFilterBackend(filters.BaseFilterBackend):
+    '''Filters recipes by the min_price and max_price, both inclusive'''
+    def filter_queryset(self, request, queryset, view):
+        min_price = parse_decimal(request, 'min_price')
+        max_price = parse_decimal(request, 'max_price')
+        if min_price is not None:
+            queryset = queryset.filter(price__gte=min_price)
+        if max_price is not None:
+            queryset = queryset.filter(price__lte=max_price)
         return queryset
+
+
+class RecipeTitleFilterBackend(filters.BaseFilterBackend):
+    '''
+    Filters recipes by the title range, title_from inclusive and title_to
+    exclusive, so ?title_from=b&title_to=c gives the titles starting with b
+    '''
+    def filter_queryset(self, request, queryset, view):
+        title_from = request.query_params.get('title_from')
+        title_to = request.query_params.get('title_to')
+        if title_from:
+            queryset = queryset.filter(title__gte=title_from)
+        if title_to:
+            queryset = queryset.filter(title__lt=title_to)
+        return queryset
+
+
+class RecipeOrderingFilter(filters.OrderingFilter):
+    '''
+    Orders recipes by ?ordering=price, title or price with title, in
+    either direction. The ordering is completed to one of the composite
+    (owner, ...) indexes of Recipe and ends with id so that the pages are
+    stable: price is followed by title and title by id
+    '''
+    ordering_fields = ['price', 'title']
+
+    def get_ordering(self, request, queryset, view):
+        fields = super().get_ordering(request, queryset, view)
+        if not fields:
+            return None
+        first = fields[0]
+        ordering = [first]
+        if first.lstrip('-') == 'price':
+            direction = '-' if first.startswith('-') else ''
+            titles = [field for field in fields if 'title' in field]
+            ordering.append(titles[0] if titles else f'{direction}title')
+        return ordering + ['-id' if ordering[-1].startswith('-') else 'id']
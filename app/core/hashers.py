@@ -0,0 +1,185 @@
+import base64
+import hashlib
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import BasePasswordHasher, make_password, \
+                                       check_password, mask_hash
+from django.utils.crypto import constant_time_compare
+from django.utils.translation import gettext_noop as _
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class ScryptPasswordHasher(BasePasswordHasher):
+    '''Memory-hard password hasher using hashlib.scrypt'''
+    algorithm = 'scrypt'
+    work_factor = 2 ** 14
+    block_size = 8
+    parallelism = 1
+    maxmem = 64 * 1024 * 1024
+
+    def encode(self, password, salt, n=None, r=None, p=None):
+        assert password is not None
+        assert salt and '$' not in salt
+        n = n or self.work_factor
+        r = r or self.block_size
+        p = p or self.parallelism
+        hash_ = hashlib.scrypt(
+            password.encode(),
+            salt=salt.encode(),
+            n=n,
+            r=r,
+            p=p,
+            maxmem=self.maxmem,
+            dklen=64,
+        )
+        hash_ = base64.b64encode(hash_).decode('ascii').strip()
+        return f'{self.algorithm}${n}${salt}${r}${p}${hash_}'
+
+    def decode(self, encoded):
+        algorithm, n, salt, r, p, hash_ = encoded.split('$', 5)
+        assert algorithm == self.algorithm
+        return {
+            'algorithm': algorithm,
+            'work_factor': int(n),
+            'salt': salt,
+            'block_size': int(r),
+            'parallelism': int(p),
+            'hash': hash_,
+        }
+
+    def verify(self, password, encoded):
+        decoded = self.decode(encoded)
+        encoded_2 = self.encode(
+            password,
+            decoded['salt'],
+            decoded['work_factor'],
+            decoded['block_size'],
+            decoded['parallelism'],
+        )
+        return constant_time_compare(encoded, encoded_2)
+
+    def safe_summary(self, encoded):
+        decoded = self.decode(encoded)
+        return {
+            _('algorithm'): decoded['algorithm'],
+            _('work factor'): decoded['work_factor'],
+            _('block size'): decoded['block_size'],
+            _('parallelism'): decoded['parallelism'],
+            _('salt'): mask_hash(decoded['salt']),
+            _('hash'): mask_hash(decoded['hash']),
+        }
+
+    def must_update(self, encoded):
+        decoded = self.decode(encoded)
+        return (
+            decoded['work_factor'] != self.work_factor
+            or decoded['block_size'] != self.block_size
+            or decoded['parallelism'] != self.parallelism
+        )
+
+    def harden_runtime(self, password, encoded):
+        pass
+
+
+class PasswordHashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many password operations, try again later.'
+    default_code = 'password_hashing_busy'
+
+
+def _hash(password):
+    return make_password(password)
+
+
+def _verify(password, encoded):
+    '''Returns if the password matches and if the hash must be upgraded'''
+    outdated = []
+    valid = check_password(password, encoded, setter=outdated.append)
+    return valid, bool(outdated)
+
+
+class PasswordHashingPool:
+    '''
+    Runs the password hashers in a pool of spawned processes, forking a
+    process with threads could copy a held lock. At most
+    PASSWORD_HASHING_WORKERS + PASSWORD_HASHING_QUEUE operations are
+    accepted at a time, the others are rejected with PasswordHashingBusy
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._config = None
+        self._executor = None
+        self._slots = None
+
+    def _configure(self):
+        config = (
+            settings.PASSWORD_HASHING_WORKERS,
+            settings.PASSWORD_HASHING_QUEUE,
+        )
+        with self._lock:
+            if config != self._config or self._executor is None:
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                workers, queue = config
+                self._executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=django.setup,
+                )
+                self._slots = threading.BoundedSemaphore(workers + queue)
+                self._config = config
+        return self._executor, self._slots
+
+    def _discard(self, executor):
+        '''Drops the broken executor so that the next call starts a new one'''
+        with self._lock:
+            if self._executor is executor:
+                executor.shutdown(wait=False)
+                self._executor = None
+
+    def run(self, func, *args):
+        if not settings.PASSWORD_HASHING_WORKERS:
+            return func(*args)
+
+        for attempt in range(2):
+            executor, slots = self._configure()
+            if not slots.acquire(blocking=False):
+                raise PasswordHashingBusy()
+            try:
+                return executor.submit(func, *args).result()
+            except BrokenProcessPool:
+                # A worker died, e.g. killed for its memory, the operation
+                # is retried once in a new pool
+                self._discard(executor)
+                if attempt:
+                    raise
+            finally:
+                slots.release()
+
+
+pool = PasswordHashingPool()
+
+
+def hash_password(password):
+    '''Hashes the password outside of the request thread'''
+    if password is None:
+        return make_password(None)
+    return pool.run(_hash, password)
+
+
+def verify_password(password, encoded):
+    '''
+    Checks the password outside of the request thread, returns if it is
+    valid and if the stored hash uses an outdated hasher
+    '''
+    if password is None or not encoded:
+        return False, False
+    return pool.run(_verify, password, encoded)
@@ -0,0 +1,169 @@
+import hashlib
+import time
+from datetime import timedelta
+
+import orjson
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+from core.models import IdempotencyKey
+from core.renderers import ORJSONRenderer
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+
+
+class Replay(Exception):
+    '''Stops the request and answers with the stored response'''
+
+    def __init__(self, response):
+        self.response = response
+
+
+class KeyInUse(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'A request with this Idempotency-Key is in progress.'
+    default_code = 'idempotency_key_in_use'
+
+
+class KeyMismatch(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'This Idempotency-Key was used for another request.'
+    default_code = 'idempotency_key_mismatch'
+
+
+def fingerprint(request):
+    '''
+    Identifies the request by its method, path and body. Uploads are
+    hashed chunk by chunk from the parsed files, so that they are not
+    loaded into memory
+    '''
+    digest = hashlib.sha256()
+    for part in (request.method, request.get_full_path(),
+                 request.content_type or ''):
+        digest.update(part.encode() + b'\n')
+    if not request.content_type.startswith('multipart/'):
+        digest.update(request._request.body)
+        return digest.hexdigest()
+
+    for name, values in sorted(request.data.lists()):
+        digest.update(name.encode() + b'\n')
+        for value in values:
+            if hasattr(value, 'chunks'):
+                digest.update(f'{value.name}\n{value.size}\n'.encode())
+                for chunk in value.chunks():
+                    digest.update(chunk)
+            else:
+                digest.update(str(value).encode() + b'\n')
+    return digest.hexdigest()
+
+
+def replay(entry):
+    data = orjson.loads(entry.body) if entry.body else None
+    response = Response(data, status=entry.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def claim(user, key, request_fingerprint):
+    '''
+    Claims the key for the request, returns the entry or raises Replay
+    with the stored response. A duplicate of a request in flight waits
+    up to IDEMPOTENCY_WAIT_TIMEOUT for its response, a claim older than
+    IDEMPOTENCY_LOCK_TIMEOUT is taken over
+    '''
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+    while True:
+        now = timezone.now()
+        entry = IdempotencyKey.objects.filter(user=user, key=key).first()
+        if entry is None or entry.expires_at <= now:
+            IdempotencyKey.objects.filter(user=user, expires_at__lte=now) \
+                .delete()
+            try:
+                with transaction.atomic():
+                    return IdempotencyKey.objects.create(
+                        user=user, key=key, fingerprint=request_fingerprint,
+                        created_at=now,
+                        expires_at=now + timedelta(
+                            seconds=settings.IDEMPOTENCY_KEY_TTL
+                        ),
+                    )
+            except IntegrityError:
+                continue
+
+        if entry.fingerprint != request_fingerprint:
+            raise KeyMismatch()
+        if entry.status_code is not None:
+            raise Replay(replay(entry))
+
+        stale = now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT)
+        if entry.created_at <= stale and IdempotencyKey.objects.filter(
+                pk=entry.pk, created_at=entry.created_at,
+                status_code__isnull=True).update(created_at=now):
+            entry.created_at = now
+            return entry
+        if time.monotonic() >= deadline:
+            raise KeyInUse()
+        time.sleep(settings.IDEMPOTENCY_POLL_INTERVAL)
+
+
+def claimed(entry):
+    return IdempotencyKey.objects.filter(
+        pk=entry.pk, created_at=entry.created_at, status_code__isnull=True
+    )
+
+
+def store(entry, response):
+    '''
+    Stores the response for the replays, server errors release the key
+    so that the retry runs again
+    '''
+    if response.status_code >= 500:
+        claimed(entry).delete()
+        return
+    data = getattr(response, 'data', None)
+    claimed(entry).update(
+        status_code=response.status_code,
+        body=None if data is None else ORJSONRenderer().render(data),
+    )
+
+
+class IdempotencyMixin:
+    '''
+    Makes the POST requests of the view idempotent per user with the
+    Idempotency-Key header, the first response is stored for
+    IDEMPOTENCY_KEY_TTL seconds and replayed to the retries
+    '''
+    idempotency_entry = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        key = request.META.get(HEADER)
+        if request.method != 'POST' or not key \
+                or not request.user.is_authenticated:
+            return
+        if len(key) > IdempotencyKey._meta.get_field('key').max_length:
+            raise ValidationError({'Idempotency-Key': 'Key is too long'})
+        self.idempotency_entry = claim(
+            request.user, key, fingerprint(request)
+        )
+
+    def handle_exception(self, exc):
+        if isinstance(exc, Replay):
+            return exc.response
+        try:
+            return super().handle_exception(exc)
+        except Exception:
+            if self.idempotency_entry is not None:
+                claimed(self.idempotency_entry).delete()
+                self.idempotency_entry = None
+            raise
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self.idempotency_entry is not None:
+            store(self.idempotency_entry, response)
+            self.idempotency_entry = None
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,220 @@
+import threading
+
+from core.models import ChangeSequence, Recipe
+from core.utils import IndexRegistry
+
+
+def iter_bits(bitmap):
+    '''Yields the positions of the set bits of the bitmap'''
+    while bitmap:
+        lowest = bitmap & -bitmap
+        yield lowest.bit_length() - 1
+        bitmap ^= lowest
+
+
+def bitmap_from_positions(positions, size):
+    data = bytearray((size >> 3) + 1)
+    for position in positions:
+        data[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(data, 'little')
+
+
+def bitsliced_sum(bitmaps):
+    '''
+    Adds the 0/1 bitmaps position-wise, the result is a list of bit planes
+    where plane j holds bit j of the count of every position
+    '''
+    planes = []
+    for carry in bitmaps:
+        for j, plane in enumerate(planes):
+            planes[j] = plane ^ carry
+            carry &= plane
+            if not carry:
+                break
+        if carry:
+            planes.append(carry)
+    return planes
+
+
+def bitsliced_sub(minuend, subtrahend):
+    '''Position-wise subtraction of bit planes, minuend >= subtrahend'''
+    result = []
+    borrow = 0
+    for j in range(max(len(minuend), len(subtrahend))):
+        a = minuend[j] if j < len(minuend) else 0
+        b = subtrahend[j] if j < len(subtrahend) else 0
+        result.append(a ^ b ^ borrow)
+        borrow = (~a & b) | (~(a ^ b) & borrow)
+    return result
+
+
+def bitsliced_le(planes, value, mask):
+    '''Returns the bitmap of the positions of mask where planes <= value'''
+    greater = 0
+    equal = mask
+    for j in reversed(range(max(len(planes), value.bit_length()))):
+        plane = planes[j] if j < len(planes) else 0
+        if (value >> j) & 1:
+            equal &= plane
+        else:
+            greater |= equal & plane
+            equal &= ~plane
+    return mask & ~greater
+
+
+class IngredientBitmapIndex:
+    '''
+    Bitmap index of the recipes of one user by their ingredients.
+    Every recipe gets a slot, each ingredient maps to the bitmap of the
+    slots of its recipes and the ingredient counts of the recipes are
+    kept as bit planes, so the coverage of a set of ingredients is
+    computed with a few big integer operations per ingredient
+    '''
+
+    def __init__(self, links=()):
+        self.lock = threading.Lock()
+        self.slots = {}
+        self.recipe_ids = []
+        self.free_slots = []
+        self.ingredients = []
+        self.postings = {}
+        self.size_planes = []
+        self.live = 0
+
+        by_recipe = {}
+        for recipe_id, ingredient_id in links:
+            by_recipe.setdefault(recipe_id, set()).add(ingredient_id)
+        self._build(by_recipe)
+
+    def _build(self, by_recipe):
+        by_ingredient = {}
+        sizes = {}
+        for slot, (recipe_id, ingredients) in enumerate(by_recipe.items()):
+            self.slots[recipe_id] = slot
+            self.recipe_ids.append(recipe_id)
+            self.ingredients.append(ingredients)
+            for ingredient_id in ingredients:
+                by_ingredient.setdefault(ingredient_id, []).append(slot)
+            sizes[slot] = len(ingredients)
+
+        count = len(self.recipe_ids)
+        self.postings = {
+            ingredient_id: bitmap_from_positions(slots, count)
+            for ingredient_id, slots in by_ingredient.items()
+        }
+        width = max(sizes.values(), default=0).bit_length()
+        self.size_planes = [
+            bitmap_from_positions(
+                (slot for slot, size in sizes.items() if size >> j & 1),
+                count,
+            )
+            for j in range(width)
+        ]
+        self.live = (1 << count) - 1
+
+    def _slot(self, recipe_id):
+        slot = self.slots.get(recipe_id)
+        if slot is None:
+            if self.free_slots:
+                slot = self.free_slots.pop()
+                self.recipe_ids[slot] = recipe_id
+                self.ingredients[slot] = set()
+            else:
+                slot = len(self.recipe_ids)
+                self.recipe_ids.append(recipe_id)
+                self.ingredients.append(set())
+            self.slots[recipe_id] = slot
+            self.live |= 1 << slot
+        return slot
+
+    def _set_size(self, slot, size):
+        bit = 1 << slot
+        while len(self.size_planes) < size.bit_length():
+            self.size_planes.append(0)
+        for j, plane in enumerate(self.size_planes):
+            if size >> j & 1:
+                self.size_planes[j] = plane | bit
+            else:
+                self.size_planes[j] = plane & ~bit
+
+    def add(self, recipe_id, ingredient_ids):
+        with self.lock:
+            slot = self._slot(recipe_id)
+            bit = 1 << slot
+            current = self.ingredients[slot]
+            for ingredient_id in set(ingredient_ids) - current:
+                self.postings[ingredient_id] = \
+                    self.postings.get(ingredient_id, 0) | bit
+                current.add(ingredient_id)
+            self._set_size(slot, len(current))
+
+    def remove(self, recipe_id, ingredient_ids=None):
+        '''Removes the ingredients, or all of them, from the recipe'''
+        with self.lock:
+            slot = self.slots.get(recipe_id)
+            if slot is None:
+                return
+            bit = 1 << slot
+            current = self.ingredients[slot]
+            removed = current.copy() if ingredient_ids is None \
+                else current & set(ingredient_ids)
+            for ingredient_id in removed:
+                self.postings[ingredient_id] &= ~bit
+                current.discard(ingredient_id)
+            self._set_size(slot, len(current))
+
+    def discard_recipe(self, recipe_id):
+        self.remove(recipe_id)
+        with self.lock:
+            slot = self.slots.pop(recipe_id, None)
+            if slot is not None:
+                self.live &= ~(1 << slot)
+                self.recipe_ids[slot] = None
+                self.free_slots.append(slot)
+
+    def search(self, ingredient_ids, max_missing=0):
+        '''
+        Returns [(recipe_id, covered, total)] of the recipes missing at most
+        max_missing of their ingredients, ranked by coverage
+        '''
+        have = set(ingredient_ids)
+        with self.lock:
+            covered = bitsliced_sum(
+                self.postings[i] for i in have if i in self.postings
+            )
+            missing = bitsliced_sub(self.size_planes, covered)
+            not_empty = 0
+            for plane in self.size_planes:
+                not_empty |= plane
+            matches = bitsliced_le(missing, max_missing, self.live & not_empty)
+
+            results = []
+            for slot in iter_bits(matches):
+                ingredients = self.ingredients[slot]
+                results.append((
+                    self.recipe_ids[slot],
+                    len(ingredients & have),
+                    len(ingredients),
+                ))
+
+        results.sort(key=lambda r: (-r[1] / r[2], r[2] - r[1], -r[0]))
+        return results
+
+
+def build_index(owner_id):
+    links = Recipe.ingredients.through.objects.filter(
+        recipe__owner_id=owner_id
+    ).values_list('recipe_id', 'ingredient_id')
+    return IngredientBitmapIndex(links.iterator())
+
+
+def index_version(owner_id):
+    '''
+    The last number of the change feed of the owner, which moves with
+    every change of the ingredients of the recipes
+    '''
+    return ChangeSequence.objects.filter(owner_id=owner_id) \
+        .values_list('seq', flat=True).first()
+
+
+registry = IndexRegistry(build_index, index_version)
@@ -0,0 +1,233 @@
+import json
+import multiprocessing
+import os
+import socket
+import threading
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, \
+                               ThreadPoolExecutor, wait
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from core.models import Job
+
+TASKS = {}
+
+
+class Task:
+
+    def __init__(self, func, name, priority, max_attempts, timeout):
+        self.func = func
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+
+    def __call__(self, **kwargs):
+        return self.func(**kwargs)
+
+    def delay(self, **kwargs):
+        return enqueue(self.name, kwargs)
+
+
+def task(name, priority=0, max_attempts=None, timeout=None):
+    '''
+    Registers the function as a task run by the workers, the tasks are
+    looked up in the tasks modules of the installed apps. Jobs of higher
+    priority run first, a job running longer than timeout seconds is
+    considered lost and claimed again
+    '''
+    def register(func):
+        TASKS[name] = Task(
+            func, name, priority,
+            max_attempts or settings.JOB_MAX_ATTEMPTS,
+            timeout or settings.JOB_VISIBILITY_TIMEOUT,
+        )
+        return TASKS[name]
+    return register
+
+
+def get_task(name):
+    if name not in TASKS:
+        autodiscover_modules('tasks')
+    return TASKS[name]
+
+
+def enqueue(name, kwargs=None, priority=None, delay=0):
+    '''
+    Queues a job of the task, in the current transaction so the job only
+    exists once the work that asked for it is committed
+    '''
+    task = get_task(name)
+    return Job.objects.create(
+        task=name,
+        kwargs=json.dumps(kwargs or {}, cls=DjangoJSONEncoder),
+        priority=task.priority if priority is None else priority,
+        max_attempts=task.max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def backoff(attempts):
+    return min(
+        settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1),
+        settings.JOB_MAX_BACKOFF,
+    )
+
+
+def claim(worker, limit):
+    '''
+    Claims up to limit queued jobs, or running jobs past their visibility
+    timeout, with SELECT ... FOR UPDATE SKIP LOCKED. Lost jobs without
+    attempts left and jobs of unknown tasks are marked failed
+    '''
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            Job.objects.filter(
+                status__in=[Job.QUEUED, Job.RUNNING], run_at__lte=now
+            ).order_by('-priority', 'run_at', 'id')
+            .select_for_update(skip_locked=True)[:limit]
+        )
+        claimed = []
+        for job in jobs:
+            if job.status == Job.RUNNING \
+                    and job.attempts >= job.max_attempts:
+                job.status = Job.FAILED
+                job.last_error = 'Visibility timeout expired'
+                continue
+            try:
+                timeout = get_task(job.task).timeout
+            except KeyError:
+                job.status = Job.FAILED
+                job.last_error = f'Unknown task {job.task}'
+                continue
+            job.status = Job.RUNNING
+            job.attempts += 1
+            job.worker = worker
+            job.run_at = now + timedelta(seconds=timeout)
+            claimed.append(job)
+        Job.objects.bulk_update(
+            jobs, ['status', 'attempts', 'worker', 'run_at', 'last_error']
+        )
+    return claimed
+
+
+def leased(job):
+    '''Filters the job as long as it was not claimed again meanwhile'''
+    return Job.objects.filter(
+        pk=job.pk, worker=job.worker, attempts=job.attempts
+    )
+
+
+def run_task(name, kwargs):
+    try:
+        get_task(name)(**kwargs)
+    finally:
+        close_old_connections()
+
+
+def execute(job, executor=None):
+    '''
+    Runs the claimed job, in the executor when given. A finished job is
+    deleted, a failed one is retried with exponential backoff until it
+    runs out of attempts
+    '''
+    kwargs = json.loads(job.kwargs)
+    try:
+        if executor is None:
+            run_task(job.task, kwargs)
+        else:
+            executor.submit(run_task, job.task, kwargs).result()
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            leased(job).update(status=Job.FAILED, last_error=error)
+        else:
+            leased(job).update(
+                status=Job.QUEUED, last_error=error,
+                run_at=timezone.now() + timedelta(
+                    seconds=backoff(job.attempts)
+                ),
+            )
+        return False
+    leased(job).delete()
+    return True
+
+
+def setup_process():
+    django.setup()
+    autodiscover_modules('tasks')
+
+
+class Worker:
+    '''
+    Claims jobs while it has free slots and runs them in a pool of
+    threads, or of processes with pool='process'. The threads run the
+    bookkeeping of the jobs in both cases
+    '''
+
+    def __init__(self, concurrency, pool='thread', poll_interval=1.0):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = threading.Event()
+        self.threads = ThreadPoolExecutor(max_workers=concurrency)
+        self.processes = None
+        if pool == 'process':
+            self.processes = ProcessPoolExecutor(
+                max_workers=concurrency,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=setup_process,
+            )
+
+    def execute(self, job):
+        try:
+            return execute(job, self.processes)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopping.set()
+
+    def run(self, burst=False):
+        '''
+        Runs jobs until stopped, or until no job is ready with burst.
+        Returns the number of jobs run
+        '''
+        autodiscover_modules('tasks')
+        running = set()
+        total = 0
+        try:
+            while not self.stopping.is_set():
+                free = self.concurrency - len(running)
+                jobs = claim(self.name, free) if free else []
+                connection.close()
+                for job in jobs:
+                    running.add(self.threads.submit(self.execute, job))
+                total += len(jobs)
+
+                if not running:
+                    if burst:
+                        break
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                # A full claim may leave more jobs ready, otherwise wait
+                # for a slot or the next poll
+                done, running = wait(
+                    running,
+                    timeout=0 if jobs and len(jobs) == free
+                    else self.poll_interval,
+                    return_when=FIRST_COMPLETED,
+                )
+        finally:
+            self.threads.shutdown(wait=True)
+            if self.processes is not None:
+                self.processes.shutdown(wait=True)
+        return total
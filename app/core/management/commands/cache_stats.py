@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from recipe import cache as recipe_cache
+
+
+class Command(BaseCommand):
+    help = 'Shows the recipe cache counters of all the workers'
+
+    def handle(self, *args, **options):
+        totals = recipe_cache.metrics.totals(recipe_cache.METRICS)
+        requests = sum(totals.values())
+        for name in recipe_cache.METRICS:
+            share = totals[name] / requests * 100 if requests else 0
+            self.stdout.write(f'{name:>16} {totals[name]:>10} {share:6.1f}%')
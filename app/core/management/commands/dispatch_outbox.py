@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.models import OutboxEvent
+from core.outbox import Dispatcher, load_sinks
+
+
+class Command(BaseCommand):
+    help = 'Delivers the outbox change events to the configured sinks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=settings.OUTBOX_BATCH_SIZE)
+        parser.add_argument('--interval', type=float,
+                            default=settings.OUTBOX_POLL_INTERVAL,
+                            help='Seconds to wait when the outbox is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the outbox is drained')
+        parser.add_argument('--requeue', action='store_true',
+                            help='Retry the events which ran out of attempts')
+
+    def handle(self, *args, **options):
+        if options['requeue']:
+            count = OutboxEvent.objects.filter(
+                attempts__gte=settings.OUTBOX_MAX_ATTEMPTS
+            ).update(attempts=0)
+            self.stdout.write(f'{count} events requeued')
+
+        dispatcher = Dispatcher(
+            load_sinks(), options['batch_size'], options['interval']
+        )
+        total = dispatcher.run(once=options['once'])
+        self.stdout.write(self.style.SUCCESS(f'{total} events delivered'))
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.partitioning import partition_recipes
+
+
+class Command(BaseCommand):
+    help = 'Hash-partitions the recipe tables by owner while they are in use'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--partitions', type=int,
+                            default=settings.RECIPE_PARTITIONS or 16)
+        parser.add_argument('--batch-size', type=int,
+                            default=settings.RECIPE_PARTITION_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options['partitions'] < 2:
+            raise CommandError('Expected at least 2 partitions')
+        try:
+            partition_recipes(
+                connection, options['partitions'], options['batch_size'],
+                self.stdout.write,
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Recipes partitioned into {options["partitions"]} partitions'
+        ))
@@ -0,0 +1,46 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.purge import Purger, claim
+
+
+class Command(BaseCommand):
+    help = 'Purges the data of the users who deleted their account'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=settings.PURGE_BATCH_SIZE)
+        parser.add_argument('--pause', type=float,
+                            default=settings.PURGE_BATCH_PAUSE,
+                            help='Seconds to wait between the batches')
+        parser.add_argument('--interval', type=float, default=10,
+                            help='Seconds to wait when nothing is pending')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the pending purges are done')
+
+    def progress(self, purge):
+        self.stdout.write(
+            f'  {purge.email}: {purge.recipes} recipes, {purge.tags} tags, '
+            f'{purge.ingredients} ingredients, {purge.images} images'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            purge = claim()
+            while purge is not None:
+                self.stdout.write(f'Purging {purge.email}')
+                purge = Purger(
+                    purge, options['batch_size'], options['pause'],
+                    self.progress,
+                ).run()
+                elapsed = purge.finished_at - purge.started_at
+                self.stdout.write(self.style.SUCCESS(
+                    f'Purged {purge.email} in '
+                    f'{elapsed.total_seconds():.1f}s'
+                ))
+                purge = claim()
+            if options['once']:
+                return
+            time.sleep(options['interval'])
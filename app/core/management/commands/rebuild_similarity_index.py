@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from core.similarity import store_signatures, registry
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the MinHash signatures of all recipes in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--user', type=int,
+                            help='Only rebuild the recipes of this user id')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.order_by('id')
+        if options['user']:
+            recipes = recipes.filter(owner_id=options['user'])
+
+        last_id = 0
+        total = signed = 0
+        while True:
+            batch = list(
+                recipes.filter(id__gt=last_id)
+                .values_list('id', flat=True)[:options['batch_size']]
+            )
+            if not batch:
+                break
+            signed += len(store_signatures(batch))
+            total += len(batch)
+            last_id = batch[-1]
+            self.stdout.write(f'{total} recipes processed')
+
+        registry.clear()
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {signed} signatures of {total} recipes'
+        ))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.counters import recompute_recipe_counts
+from core.models import Tag, Ingredient, Recipe
+
+
+class Command(BaseCommand):
+    help = 'Recomputes recipe_count of all tags and ingredients'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            tags = recompute_recipe_counts(
+                Tag, Recipe.tags.through, 'tag_id'
+            )
+            ingredients = recompute_recipe_counts(
+                Ingredient, Recipe.ingredients.through, 'ingredient_id'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Recomputed {tags} tags and {ingredients} ingredients'
+        ))
@@ -0,0 +1,37 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.jobs import Worker
+
+
+class Command(BaseCommand):
+    help = 'Runs the queued jobs in a pool of threads or processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int,
+                            default=settings.JOB_WORKERS)
+        parser.add_argument('--pool', choices=['thread', 'process'],
+                            default=settings.JOB_POOL)
+        parser.add_argument('--interval', type=float,
+                            default=settings.JOB_POLL_INTERVAL,
+                            help='Seconds to wait when no job is ready')
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once no job is ready')
+
+    def handle(self, *args, **options):
+        worker = Worker(
+            options['concurrency'], options['pool'], options['interval']
+        )
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: worker.stop())
+
+        self.stdout.write(
+            f'Worker {worker.name} running {options["concurrency"]} '
+            f'{options["pool"]}s'
+        )
+        total = worker.run(burst=options['burst'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Worker {worker.name} stopped after {total} jobs'
+        ))
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+
+from core.server import Arbiter, worker_count
+
+
+class Command(BaseCommand):
+    help = 'Serves the app from a pool of preforked, warmed up workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bind', default=settings.SERVER_BIND,
+                            help='host:port to listen on')
+        parser.add_argument('--workers', type=int,
+                            default=settings.SERVER_WORKERS,
+                            help='Number of workers, 0 for one per core')
+        parser.add_argument('--max-requests', type=int,
+                            default=settings.SERVER_MAX_REQUESTS,
+                            help='Requests before a worker is replaced, '
+                                 '0 for never')
+        parser.add_argument('--max-requests-jitter', type=int,
+                            default=settings.SERVER_MAX_REQUESTS_JITTER)
+        parser.add_argument('--access-log', action='store_true')
+
+    def handle(self, *args, **options):
+        host, _, port = options['bind'].rpartition(':')
+        if not port.isdigit():
+            raise CommandError('Expected --bind host:port')
+        host = host.strip('[]') or '0.0.0.0'
+
+        arbiter = Arbiter(
+            get_wsgi_application(), (host, int(port)),
+            options['workers'] or worker_count(),
+            max_requests=options['max_requests'],
+            max_requests_jitter=options['max_requests_jitter'],
+            timeout=settings.SERVER_TIMEOUT,
+            graceful_timeout=settings.SERVER_GRACEFUL_TIMEOUT,
+            backlog=settings.SERVER_BACKLOG,
+            access_log=options['access_log'],
+            warm_up_paths=settings.SERVER_WARM_UP_PATHS,
+            log=lambda message: self.stdout.write(message),
+        )
+        arbiter.run()
+        self.stdout.write(self.style.SUCCESS('Server stopped'))
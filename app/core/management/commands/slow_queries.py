@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from core.models import SlowQuery
+
+ORDERINGS = {
+    'total': '-total_duration',
+    'max': '-max_duration',
+    'count': '-count',
+}
+
+
+class Command(BaseCommand):
+    help = 'Shows the slowest queries aggregated by fingerprint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--order', choices=ORDERINGS, default='total')
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--explain', action='store_true',
+                            help='Print the captured query plans')
+        parser.add_argument('--reset', action='store_true',
+                            help='Delete the collected statistics')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            SlowQuery.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS('Slow query log cleared'))
+            return
+
+        queries = SlowQuery.objects.order_by(ORDERINGS[options['order']])
+        for query in queries[:options['limit']]:
+            average = query.total_duration / query.count
+            self.stdout.write(
+                f'{query.fingerprint}  count={query.count}  '
+                f'total={query.total_duration:.1f}ms  '
+                f'avg={average:.1f}ms  max={query.max_duration:.1f}ms  '
+                f'view={query.view}'
+            )
+            self.stdout.write(f'    {query.sql}')
+            if options['explain'] and query.explain:
+                self.stdout.write(query.explain)
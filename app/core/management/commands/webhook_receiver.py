@@ -0,0 +1,33 @@
+import sys
+from http.server import ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+from core.outbox import WebhookReceiver
+
+
+class Command(BaseCommand):
+    help = 'Runs a local webhook consumer for the outbox WebhookSink'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8001)
+        parser.add_argument('--output', help='File to append the events to')
+        parser.add_argument('--rate', type=float,
+                            help='Events per second before answering 429')
+
+    def handle(self, *args, **options):
+        output = open(options['output'], 'a') if options['output'] \
+            else sys.stdout
+        handler = type('Receiver', (WebhookReceiver, ), {
+            'output': output, 'rate': options['rate'],
+        })
+        server = ThreadingHTTPServer(('', options['port']), handler)
+        self.stdout.write(f'Receiving events on port {options["port"]}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            if output is not sys.stdout:
+                output.close()
@@ -0,0 +1,46 @@
+# Generated by Django 3.0.7 on 2026-10-19 10:14
+
+from django.db import migrations, models
+
+from core.counters import recompute_recipe_counts
+
+
+def fill_recipe_counts(apps, schema_editor):
+    Recipe = apps.get_model('core', 'Recipe')
+    recompute_recipe_counts(
+        apps.get_model('core', 'Tag'), Recipe.tags.through, 'tag_id'
+    )
+    recompute_recipe_counts(
+        apps.get_model('core', 'Ingredient'),
+        Recipe.ingredients.through,
+        'ingredient_id',
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_slowquery'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['owner', 'recipe_count'], name='core_ingred_owner_i_6abac9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['owner', 'recipe_count'], name='core_tag_owner_i_e53f12_idx'),
+        ),
+        migrations.RunPython(fill_recipe_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.0.7 on 2026-10-19 10:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_recipe_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSignature',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='core.Recipe')),
+                ('signature', models.BinaryField()),
+            ],
+        ),
+    ]
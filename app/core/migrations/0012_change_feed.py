@@ -0,0 +1,58 @@
+# Generated by Django 3.0.7 on 2026-10-19 10:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_change_feed(apps, schema_editor):
+    User = apps.get_model('core', 'User')
+    Change = apps.get_model('core', 'Change')
+    kinds = [('recipe', 'Recipe'), ('tag', 'Tag'), ('ingredient', 'Ingredient')]
+    for user_id in User.objects.values_list('id', flat=True).iterator():
+        changes = []
+        for kind, model_name in kinds:
+            object_ids = apps.get_model('core', model_name).objects \
+                .filter(owner_id=user_id).values_list('id', flat=True)
+            changes += [
+                Change(owner_id=user_id, kind=kind, object_id=object_id,
+                       seq=len(changes) + number)
+                for number, object_id in enumerate(object_ids, 1)
+            ]
+        Change.objects.bulk_create(changes, batch_size=1000)
+        User.objects.filter(id=user_id).update(change_seq=len(changes))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_outboxevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=16)),
+                ('object_id', models.IntegerField()),
+                ('seq', models.BigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['owner', 'seq'], name='core_change_owner_i_c0c15f_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='change',
+            unique_together={('owner', 'kind', 'object_id')},
+        ),
+        migrations.RunPython(fill_change_feed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.0.7 on 2026-10-19 10:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserPurge',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.IntegerField(unique=True)),
+                ('email', models.EmailField(max_length=255)),
+                ('requested_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(null=True)),
+                ('finished_at', models.DateTimeField(null=True)),
+                ('recipes', models.PositiveIntegerField(default=0)),
+                ('tags', models.PositiveIntegerField(default=0)),
+                ('ingredients', models.PositiveIntegerField(default=0)),
+                ('images', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
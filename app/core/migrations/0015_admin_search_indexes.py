@@ -0,0 +1,41 @@
+from django.db import migrations
+
+# Trigram indexes on the expressions the icontains lookups of the admin
+# searches compare, UPPER(column::text) on PostgreSQL
+SEARCH_INDEXES = [
+    ('core_user_email_trgm', 'core_user', 'email'),
+    ('core_user_name_trgm', 'core_user', 'name'),
+    ('core_recipe_title_trgm', 'core_recipe', 'title'),
+    ('core_tag_name_trgm', 'core_tag', 'name'),
+    ('core_ingredient_name_trgm', 'core_ingredient', 'name'),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in SEARCH_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON "{table}" '
+            f'USING gin ((UPPER("{column}"::text)) gin_trgm_ops)'
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in SEARCH_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('core', '0014_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
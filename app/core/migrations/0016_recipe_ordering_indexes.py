@@ -0,0 +1,36 @@
+# Generated by Django 3.0.7 on 2026-10-19 10:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_admin_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['owner', 'id'], name='core_recipe_owner_i_e2f2c2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['owner', 'title', 'id'], name='core_recipe_owner_i_50386b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['owner', 'price', 'title', 'id'], name='core_recipe_owner_i_577536_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['owner', 'price', '-title', '-id'], name='core_recipe_owner_i_7aa68f_idx'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='owner',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.db import migrations
+
+from core.partitioning import partition_recipes
+
+
+def partition(apps, schema_editor):
+    '''Partitions the recipe tables when RECIPE_PARTITIONS is set'''
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql' or not settings.RECIPE_PARTITIONS:
+        return
+    Recipe = apps.get_model('core', 'Recipe')
+    partition_recipes(
+        connection, settings.RECIPE_PARTITIONS,
+        settings.RECIPE_PARTITION_BATCH_SIZE,
+        tables=[
+            (Recipe._meta.db_table, 'owner_id'),
+            (Recipe.tags.through._meta.db_table, 'recipe_id'),
+            (Recipe.ingredients.through._meta.db_table, 'recipe_id'),
+        ],
+    )
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('core', '0016_recipe_ordering_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.0.7 on 2026-10-19 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='outboxevent',
+            index=models.Index(fields=['owner_id', 'id'], name='core_outbox_owner_i_bd1c9b_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.7 on 2026-10-19 11:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_outbox_owner_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userpurge',
+            name='claimed_until',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.0.7 on 2026-10-19 11:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_change_seq(apps, schema_editor):
+    User = apps.get_model('core', 'User')
+    ChangeSequence = apps.get_model('core', 'ChangeSequence')
+    users = User.objects.filter(change_seq__gt=0) \
+        .values_list('id', 'change_seq')
+    ChangeSequence.objects.bulk_create(
+        (ChangeSequence(owner_id=user_id, seq=seq)
+         for user_id, seq in users.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_cachecounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeSequence',
+            fields=[
+                ('owner', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('seq', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(copy_change_seq, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='user',
+            name='change_seq',
+        ),
+    ]
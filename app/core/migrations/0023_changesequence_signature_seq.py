@@ -0,0 +1,18 @@
+# Generated by Django 3.0.7 on 2026-10-19 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_change_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changesequence',
+            name='signature_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
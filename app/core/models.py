@@ -6,6 +6,9 @@ from django.contrib.auth.models import (
     AbstractBaseUser, BaseUserManager, PermissionsMixin
 )
 from django.conf import settings
+from django.utils import timezone
+
+from core.hashers import hash_password, verify_password
 
 
 def create_image_unique_name(instance, filename):
@@ -58,6 +61,23 @@ class User(AbstractBaseUser, PermissionsMixin):
     EMAIL_FIELD = 'email'
     REQUIRED_FIELDS = ['name', ]
 
+    def set_password(self, raw_password):
+        '''Hashes the password in the password hashing pool'''
+        self.password = hash_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        '''
+        Checks the password in the password hashing pool and rehashes it
+        with the preferred hasher when the stored hash is outdated
+        '''
+        valid, outdated = verify_password(raw_password, self.password)
+        if valid and outdated:
+            self.set_password(raw_password)
+            self._password = None
+            self.save(update_fields=['password'])
+        return valid
+
 
 class Tag(models.Model):
     '''Custom user tags for food'''
@@ -66,6 +86,10 @@ class Tag(models.Model):
         on_delete=models.CASCADE,
     )
     name = models.CharField(max_length=255)
+    recipe_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=['owner', 'recipe_count'])]
 
     def __str__(self):
         return self.name
@@ -78,16 +102,25 @@ class Ingredient(models.Model):
         on_delete=models.CASCADE,
     )
     name = models.CharField(max_length=255)
+    recipe_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=['owner', 'recipe_count'])]
 
     def __str__(self):
         return self.name
 
 
 class Recipe(models.Model):
-    '''Recipe model linking the ingredients together'''
+    '''
+    Recipe model linking the ingredients together. The indexes start
+    with the owner, the (owner, id) one replacing the index of the
+    foreign key, and cover the orderings of RecipeOrderingFilter
+    '''
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False,
     )
     title = models.CharField(max_length=255)
     tags = models.ManyToManyField(Tag)
@@ -95,5 +128,183 @@ class Recipe(models.Model):
     price = models.DecimalField(max_digits=5, decimal_places=2)
     image = models.ImageField(upload_to=create_image_unique_name, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'id']),
+            models.Index(fields=['owner', 'title', 'id']),
+            models.Index(fields=['owner', 'price', 'title', 'id']),
+            models.Index(fields=['owner', 'price', '-title', '-id']),
+        ]
+
     def __str__(self):
         return self.title
+
+
+class RecipeSignature(models.Model):
+    '''MinHash signature of the tags and ingredients of a recipe'''
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+    )
+    signature = models.BinaryField()
+
+
+class ChangeSequence(models.Model):
+    '''
+    Last number of the change feed of a user, kept out of the user row so
+    that saving a user loaded earlier does not write back an old number.
+    signature_seq counts the updates of the similarity signatures, which
+    are stored after the change is committed
+    '''
+    owner = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+    )
+    seq = models.BigIntegerField(default=0)
+    signature_seq = models.BigIntegerField(default=0)
+
+
+class Change(models.Model):
+    '''
+    Latest change of a recipe, tag or ingredient in the change feed of
+    its owner, deleted objects are kept as tombstones
+    '''
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+    kind = models.CharField(max_length=16)
+    object_id = models.IntegerField()
+    seq = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = [('owner', 'kind', 'object_id')]
+        indexes = [models.Index(fields=['owner', 'seq'])]
+
+
+class UserPurge(models.Model):
+    '''
+    Deletion of a deactivated user, purged in batches by the purge_users
+    command. Kept after the user is gone as the record of the purge. The
+    runner purging it holds it until claimed_until
+    '''
+    user_id = models.IntegerField(unique=True)
+    email = models.EmailField(max_length=255)
+    requested_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True)
+    claimed_until = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+    recipes = models.PositiveIntegerField(default=0)
+    tags = models.PositiveIntegerField(default=0)
+    ingredients = models.PositiveIntegerField(default=0)
+    images = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.email
+
+
+class IdempotencyKey(models.Model):
+    '''
+    Response of the first POST request sent with an Idempotency-Key
+    header, replayed to the retries of the user. A key without a status
+    code belongs to a request still in flight
+    '''
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    body = models.BinaryField(null=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = [('user', 'key')]
+        indexes = [models.Index(fields=['expires_at'])]
+
+
+class Job(models.Model):
+    '''
+    Deferred call of a task registered in core.jobs, claimed by the
+    run_worker command. A running job whose visibility timeout passed is
+    claimed again
+    '''
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (FAILED, 'Failed')]
+
+    id = models.BigAutoField(primary_key=True)
+    task = models.CharField(max_length=100)
+    kwargs = models.TextField(default='{}')
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=8, choices=STATUSES, default=QUEUED)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    worker = models.CharField(max_length=64, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_at'])]
+
+    def __str__(self):
+        return f'{self.task} #{self.id}'
+
+
+class SlowQuery(models.Model):
+    '''Slow SQL statements aggregated by their normalized fingerprint'''
+    fingerprint = models.CharField(max_length=32, unique=True)
+    sql = models.TextField()
+    view = models.CharField(max_length=255, blank=True)
+    count = models.PositiveIntegerField(default=0)
+    total_duration = models.FloatField(default=0)
+    max_duration = models.FloatField(default=0)
+    explain = models.TextField(blank=True)
+    last_seen = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'slow queries'
+
+    def __str__(self):
+        return self.sql[:80]
+
+
+class CacheCounter(models.Model):
+    '''Cache event counter summed over all the worker processes'''
+    name = models.CharField(max_length=100, unique=True)
+    count = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return self.name
+
+
+class OutboxEvent(models.Model):
+    '''
+    Change event written in the transaction of the change and delivered
+    to the sinks by the dispatch_outbox command, at least once
+    '''
+    id = models.BigAutoField(primary_key=True)
+    topic = models.CharField(max_length=64)
+    owner_id = models.IntegerField(null=True)
+    object_id = models.IntegerField(null=True)
+    payload = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['available_at', 'id']),
+            models.Index(fields=['owner_id', 'id']),
+        ]
+
+    def __str__(self):
+        return f'{self.topic} {self.object_id}'
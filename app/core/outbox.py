@@ -0,0 +1,277 @@
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core.models import OutboxEvent
+
+# Key of the advisory lock serializing the claims of the dispatchers
+CLAIM_LOCK_ID = 0x6f7574626f78
+
+
+def make_event(topic, owner_id, object_id, payload):
+    return OutboxEvent(
+        topic=topic, owner_id=owner_id, object_id=object_id,
+        payload=json.dumps(payload, cls=DjangoJSONEncoder),
+    )
+
+
+def record(topic, owner_id, object_id, payload):
+    '''
+    Writes the change event, call it inside the transaction of the change
+    so the event exists exactly when the change is committed
+    '''
+    return make_event(topic, owner_id, object_id, payload).save()
+
+
+def record_many(events):
+    '''Writes [(topic, owner_id, object_id, payload)] with one INSERT'''
+    OutboxEvent.objects.bulk_create(make_event(*event) for event in events)
+
+
+def event_data(event):
+    return {
+        'id': event.id,
+        'topic': event.topic,
+        'owner_id': event.owner_id,
+        'object_id': event.object_id,
+        'created_at': event.created_at.isoformat(),
+        'payload': json.loads(event.payload),
+    }
+
+
+class SinkBusy(Exception):
+    '''
+    Raised by a sink that cannot take more events now, the batch is left
+    untouched and the dispatcher slows down
+    '''
+
+    def __init__(self, retry_after=None):
+        super().__init__(f'Sink busy, retry after {retry_after}')
+        self.retry_after = retry_after
+
+
+class FileSink:
+    '''Appends the events as JSON lines, synced to disk before the ack'''
+
+    def __init__(self, path):
+        self.path = path
+
+    def deliver(self, events):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        lines = ''.join(json.dumps(event) + '\n' for event in events)
+        with open(self.path, 'a') as output:
+            output.write(lines)
+            output.flush()
+            os.fsync(output.fileno())
+
+
+class WebhookSink:
+    '''
+    POSTs the batch as {"events": [...]}, any 2xx response acknowledges
+    it. 429 and 503 responses are backpressure
+    '''
+
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+
+    def deliver(self, events):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({'events': events}).encode(),
+            headers={'Content-Type': 'application/json'},
+            method='POST',
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout):
+                pass
+        except urllib.error.HTTPError as error:
+            if error.code in (429, 503):
+                retry_after = error.headers.get('Retry-After')
+                raise SinkBusy(
+                    float(retry_after) if retry_after else None
+                ) from error
+            raise
+
+
+def load_sinks():
+    return [
+        import_string(sink['BACKEND'])(**sink.get('OPTIONS', {}))
+        for sink in settings.OUTBOX_SINKS
+    ]
+
+
+def backoff(attempts):
+    return min(2 ** attempts, settings.OUTBOX_MAX_BACKOFF)
+
+
+def pending_events():
+    return OutboxEvent.objects.filter(
+        available_at__lte=timezone.now(),
+        attempts__lt=settings.OUTBOX_MAX_ATTEMPTS,
+    ).order_by('id')
+
+
+def claim_batch(batch_size):
+    '''
+    Claims the oldest pending events for OUTBOX_LEASE_TIMEOUT seconds and
+    commits the claim, so the sinks are called without holding row locks.
+    An event waiting for a retry or claimed by another dispatcher holds
+    back the later events of its owner, so the events of an owner are
+    delivered in order. The claims of the dispatchers are serialized on
+    PostgreSQL with an advisory lock, they only take a moment
+    '''
+    now = timezone.now()
+    held_back = OutboxEvent.objects.filter(
+        owner_id=OuterRef('owner_id'), id__lt=OuterRef('id'),
+        available_at__gt=now,
+    )
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT pg_advisory_xact_lock(%s)', [CLAIM_LOCK_ID]
+                )
+        events = list(
+            pending_events().filter(~Exists(held_back))
+            .select_for_update(skip_locked=True)[:batch_size]
+        )
+        lease = now + timedelta(seconds=settings.OUTBOX_LEASE_TIMEOUT)
+        for event in events:
+            event.attempts += 1
+            event.available_at = lease
+        OutboxEvent.objects.bulk_update(events, ['attempts', 'available_at'])
+    return events
+
+
+def dispatch_batch(sinks, batch_size):
+    '''
+    Delivers the oldest pending events to all the sinks and deletes them.
+    A failing batch is rescheduled with exponential backoff and keeps
+    holding back the later events of its owners, once it has used up
+    OUTBOX_MAX_ATTEMPTS it stops holding them back after the last
+    backoff. Returns the number of delivered events
+    '''
+    events = claim_batch(batch_size)
+    if not events:
+        return 0
+
+    data = [event_data(event) for event in events]
+    try:
+        for sink in sinks:
+            sink.deliver(data)
+    except SinkBusy:
+        for event in events:
+            event.attempts -= 1
+            event.available_at = timezone.now()
+        OutboxEvent.objects.bulk_update(events, ['attempts', 'available_at'])
+        raise
+    except Exception as error:
+        now = timezone.now()
+        for event in events:
+            event.available_at = now + timedelta(
+                seconds=backoff(event.attempts)
+            )
+            event.last_error = f'{type(error).__name__}: {error}'
+        OutboxEvent.objects.bulk_update(
+            events, ['available_at', 'last_error']
+        )
+        return 0
+
+    OutboxEvent.objects.filter(pk__in=[e.pk for e in events]).delete()
+    return len(events)
+
+
+class Dispatcher:
+    '''
+    Drains the outbox in batches. A busy sink halves the batch size and
+    pauses the dispatcher, successful batches grow it back
+    '''
+
+    def __init__(self, sinks, batch_size, poll_interval, sleep=time.sleep):
+        self.sinks = sinks
+        self.max_batch_size = batch_size
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.sleep = sleep
+        self.busy_delay = poll_interval
+
+    def step(self):
+        '''Dispatches one batch, returns the number of delivered events'''
+        try:
+            delivered = dispatch_batch(self.sinks, self.batch_size)
+        except SinkBusy as busy:
+            self.batch_size = max(1, self.batch_size // 2)
+            delay = busy.retry_after or self.busy_delay
+            self.busy_delay = min(delay * 2, settings.OUTBOX_MAX_BACKOFF)
+            self.sleep(min(delay, settings.OUTBOX_MAX_BACKOFF))
+            return 0
+
+        self.busy_delay = self.poll_interval
+        if delivered:
+            self.batch_size = min(self.max_batch_size, self.batch_size * 2)
+        return delivered
+
+    def run(self, once=False):
+        '''Runs until stopped, or until the outbox is empty with once'''
+        total = 0
+        while True:
+            delivered = self.step()
+            total += delivered
+            if delivered:
+                continue
+            if once and not pending_events().exists():
+                return total
+            self.sleep(self.poll_interval)
+
+
+class WebhookReceiver(BaseHTTPRequestHandler):
+    '''
+    Local stand-in for a webhook consumer, appends the received events
+    to `output` and answers 429 above `rate` events per second
+    '''
+    output = None
+    rate = None
+    lock = threading.Lock()
+    allowance = 0.0
+    checked = 0.0
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        events = json.loads(self.rfile.read(length))['events']
+
+        cls = type(self)
+        with cls.lock:
+            if cls.rate:
+                now = time.monotonic()
+                cls.allowance = min(
+                    cls.rate, cls.allowance + (now - cls.checked) * cls.rate
+                )
+                cls.checked = now
+                if cls.allowance < len(events):
+                    self.send_response(429)
+                    self.send_header('Retry-After', '1')
+                    self.end_headers()
+                    return
+                cls.allowance -= len(events)
+            for event in events:
+                cls.output.write(json.dumps(event) + '\n')
+            cls.output.flush()
+
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,90 @@
+from django.conf import settings
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, \
+                               Paginator
+from django.utils.functional import cached_property
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+
+from core.estimates import estimate_count
+from core.filters import parse_int
+
+
+class EstimatedPage(Page):
+    '''Page that knows from one extra row whether another page follows'''
+
+    def __init__(self, object_list, number, paginator, more):
+        super().__init__(object_list, number, paginator)
+        self.more = more
+
+    def has_next(self):
+        return self.more
+
+
+class EstimatedCountPaginator(Paginator):
+    '''
+    Paginator counting exactly below ESTIMATED_COUNT_THRESHOLD rows and
+    using the planner estimate above it. Estimated pages are not checked
+    against the count, they read one row more to tell if they are last
+    '''
+    estimated = False
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is None or estimate < settings.ESTIMATED_COUNT_THRESHOLD:
+            return super().count
+        self.estimated = True
+        return estimate
+
+    def validate_number(self, number):
+        if not self.count or not self.estimated:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.estimated:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('That page contains no results')
+        return EstimatedPage(
+            rows[:self.per_page], number, self, len(rows) > self.per_page
+        )
+
+
+class EstimatedPageNumberPagination(PageNumberPagination):
+    '''
+    Page number pagination used once the client asks for a page or a
+    page size, the lists stay unpaginated otherwise. The count is flagged
+    when it is an estimate
+    '''
+    django_paginator_class = EstimatedCountPaginator
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request):
+        params = request.query_params
+        if self.page_size_query_param not in params \
+                and self.page_query_param not in params:
+            return None
+        return parse_int(
+            request, self.page_size_query_param, settings.PAGE_SIZE,
+            settings.MAX_PAGE_SIZE,
+        ) or settings.PAGE_SIZE
+
+    def get_paginated_response(self, data):
+        paginator = self.page.paginator
+        return Response({
+            'count': paginator.count,
+            'count_is_estimate': paginator.estimated,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
@@ -0,0 +1,255 @@
+import logging
+import time
+
+from django.db import OperationalError, transaction
+
+logger = logging.getLogger(__name__)
+
+SUFFIX = '_partitioned'
+LOCK_TIMEOUT = '3s'
+LOCK_ATTEMPTS = 20
+# The recipes by owner and their tags and ingredients by recipe, the
+# through tables have no owner column
+RECIPE_TABLES = [
+    ('core_recipe', 'owner_id'),
+    ('core_recipe_tags', 'recipe_id'),
+    ('core_recipe_ingredients', 'recipe_id'),
+]
+
+
+def is_partitioned(cursor, table):
+    cursor.execute(
+        'SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass',
+        [table],
+    )
+    return cursor.fetchone() is not None
+
+
+def indexes(cursor, table):
+    '''Returns the names and definitions of the indexes of the table'''
+    cursor.execute(
+        'SELECT i.relname, pg_get_indexdef(i.oid), x.indisprimary '
+        'FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid '
+        'WHERE x.indrelid = %s::regclass',
+        [table],
+    )
+    return cursor.fetchall()
+
+
+def foreign_keys(cursor, table, referencing=False):
+    '''
+    Returns the foreign keys of the table, or the foreign keys of the
+    other tables referencing it, as (table, name, definition)
+    '''
+    column = 'confrelid' if referencing else 'conrelid'
+    cursor.execute(
+        'SELECT conrelid::regclass::text, conname, '
+        'pg_get_constraintdef(oid) FROM pg_constraint '
+        f'WHERE contype = %s AND {column} = %s::regclass',
+        ['f', table],
+    )
+    return cursor.fetchall()
+
+
+class TablePartitioner:
+    '''
+    Converts the table to a table hash-partitioned by key while it is in
+    use. A partitioned copy gets the indexes and foreign keys of the
+    table, a trigger mirrors the writes to the table into the copy
+    while the existing rows are copied batch by batch, then the tables
+    are swapped under a short exclusive lock. Foreign keys referencing
+    the table are dropped, their tables cannot reference a partitioned
+    table by id alone
+    '''
+
+    def __init__(self, connection, table, key, partitions, batch_size,
+                 log=logger.info):
+        self.connection = connection
+        self.table = table
+        self.key = key
+        self.partitions = partitions
+        self.batch_size = batch_size
+        self.log = log
+        self.new = table + SUFFIX
+        self.renames = []
+
+    def execute(self, sql, params=None):
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall() if cursor.description else None
+
+    def qn(self, name):
+        return self.connection.ops.quote_name(name)
+
+    def temporary_name(self, name):
+        '''Names an index of the copy until the table is swapped'''
+        temporary = f'{self.new[:40]}_i{len(self.renames)}'
+        self.renames.append((temporary, name))
+        return self.qn(temporary)
+
+    def create(self):
+        table, new, key = self.qn(self.table), self.qn(self.new), self.key
+        self.execute(
+            f'CREATE TABLE {new} (LIKE {table} INCLUDING DEFAULTS) '
+            f'PARTITION BY HASH ({self.qn(key)})'
+        )
+        for remainder in range(self.partitions):
+            self.execute(
+                f'CREATE TABLE {self.qn(f"{self.new}_{remainder}")} '
+                f'PARTITION OF {new} FOR VALUES WITH '
+                f'(MODULUS {self.partitions}, REMAINDER {remainder})'
+            )
+
+        with self.connection.cursor() as cursor:
+            table_indexes = indexes(cursor, self.table)
+            table_keys = foreign_keys(cursor, self.table)
+        for name, definition, primary in table_indexes:
+            if primary:
+                self.execute(
+                    f'ALTER TABLE {new} ADD CONSTRAINT '
+                    f'{self.temporary_name(name)} PRIMARY KEY '
+                    f'({self.qn(key)}, "id")'
+                )
+                continue
+            _, columns = definition.split(' USING ', 1)
+            unique = 'UNIQUE ' if definition.startswith('CREATE UNIQUE') \
+                else ''
+            self.execute(
+                f'CREATE {unique}INDEX {self.temporary_name(name)} '
+                f'ON {new} USING {columns}'
+            )
+        for _, name, definition in table_keys:
+            self.execute(
+                f'ALTER TABLE {new} ADD CONSTRAINT '
+                f'{self.temporary_name(name)} {definition}'
+            )
+
+    def mirror(self):
+        table, new = self.qn(self.table), self.qn(self.new)
+        function = self.qn(self.new + '_mirror')
+        key = self.qn(self.key)
+        self.execute(
+            f'CREATE FUNCTION {function}() RETURNS trigger AS $$ BEGIN '
+            f"IF TG_OP IN ('UPDATE', 'DELETE') THEN "
+            f'DELETE FROM {new} WHERE "id" = OLD."id" '
+            f'AND {key} = OLD.{key}; END IF; '
+            f"IF TG_OP IN ('INSERT', 'UPDATE') THEN "
+            f'INSERT INTO {new} VALUES (NEW.*) ON CONFLICT DO NOTHING; '
+            f'END IF; RETURN NULL; END $$ LANGUAGE plpgsql'
+        )
+        self.execute(
+            f'CREATE TRIGGER {function} AFTER INSERT OR UPDATE OR DELETE '
+            f'ON {table} FOR EACH ROW EXECUTE PROCEDURE {function}()'
+        )
+
+    def copy(self):
+        table, new = self.qn(self.table), self.qn(self.new)
+        (low, high), = self.execute(
+            f'SELECT MIN("id"), MAX("id") FROM {table}'
+        )
+        if low is None:
+            return
+        for start in range(low, high + 1, self.batch_size):
+            self.execute(
+                f'INSERT INTO {new} SELECT * FROM {table} '
+                f'WHERE "id" >= %s AND "id" < %s FOR SHARE '
+                f'ON CONFLICT DO NOTHING',
+                [start, start + self.batch_size],
+            )
+            self.log(f'{self.table}: copied ids up to '
+                     f'{min(start + self.batch_size - 1, high)} of {high}')
+
+    def swap(self):
+        '''
+        Swaps the tables, giving up the lock after LOCK_TIMEOUT so that
+        the queries queued behind it are not blocked for long
+        '''
+        for attempt in range(1, LOCK_ATTEMPTS + 1):
+            try:
+                self.swap_locked()
+                break
+            except OperationalError:
+                if attempt == LOCK_ATTEMPTS:
+                    raise
+                self.log(f'{self.table}: lock not granted, retrying')
+                time.sleep(attempt)
+        self.log(f'{self.table}: swapped')
+
+    def swap_locked(self):
+        table, new = self.qn(self.table), self.qn(self.new)
+        old = self.qn(self.table + '_unpartitioned')
+        with transaction.atomic(using=self.connection.alias):
+            self.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+            self.execute(f'LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE')
+            self.execute(
+                f'DROP TRIGGER {self.qn(self.new + "_mirror")} ON {table}'
+            )
+            self.execute(f'DROP FUNCTION {self.qn(self.new + "_mirror")}()')
+            with self.connection.cursor() as cursor:
+                referencing = foreign_keys(cursor, self.table, True)
+            for other, name, _ in referencing:
+                self.execute(
+                    f'ALTER TABLE {self.qn(other)} DROP CONSTRAINT '
+                    f'{self.qn(name)}'
+                )
+            (sequence,), = self.execute(
+                'SELECT pg_get_serial_sequence(%s, %s)', [self.table, 'id']
+            )
+            self.execute(f'ALTER TABLE {table} RENAME TO {old}')
+            self.execute(f'ALTER TABLE {new} RENAME TO {table}')
+            for remainder in range(self.partitions):
+                self.execute(
+                    f'ALTER TABLE {self.qn(f"{self.new}_{remainder}")} '
+                    f'RENAME TO {self.qn(f"{self.table}_{remainder}")}'
+                )
+            if sequence:
+                self.execute(f'ALTER SEQUENCE {sequence} OWNED BY '
+                             f'{table}."id"')
+
+    def cleanup(self):
+        '''Drops the old table and gives its names to the new indexes'''
+        self.execute(
+            f'DROP TABLE {self.qn(self.table + "_unpartitioned")}'
+        )
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT conname FROM pg_constraint WHERE conrelid = '
+                '%s::regclass', [self.table]
+            )
+            constraints = {name for name, in cursor.fetchall()}
+        for temporary, name in self.renames:
+            if temporary in constraints:
+                self.execute(
+                    f'ALTER TABLE {self.qn(self.table)} RENAME CONSTRAINT '
+                    f'{self.qn(temporary)} TO {self.qn(name)}'
+                )
+            else:
+                self.execute(
+                    f'ALTER INDEX {self.qn(temporary)} RENAME TO '
+                    f'{self.qn(name)}'
+                )
+
+    def run(self):
+        with self.connection.cursor() as cursor:
+            if is_partitioned(cursor, self.table):
+                self.log(f'{self.table}: already partitioned')
+                return
+        self.create()
+        self.mirror()
+        self.copy()
+        self.swap()
+        self.cleanup()
+
+
+def partition_recipes(connection, partitions, batch_size, log=logger.info,
+                      tables=RECIPE_TABLES):
+    '''
+    Hash-partitions the (table, key) pairs, RECIPE_TABLES by default.
+    Only runs on PostgreSQL
+    '''
+    if connection.vendor != 'postgresql':
+        raise ValueError('Partitioning needs PostgreSQL')
+    for table, key in tables:
+        TablePartitioner(
+            connection, table, key, partitions, batch_size, log
+        ).run()
@@ -0,0 +1,173 @@
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core import signing
+
+from core.utils import view_label
+
+PROFILE_HEADER = 'HTTP_X_PROFILE_TOKEN'
+PROFILE_SALT = 'core.profiling'
+
+logger = logging.getLogger(__name__)
+
+
+def make_profile_token():
+    '''Creates a signed token forcing the profiling of a request'''
+    return signing.dumps('profile', salt=PROFILE_SALT)
+
+
+def is_valid_profile_token(token):
+    '''Checks the signature and the age of the profiling token'''
+    try:
+        signing.loads(
+            token,
+            salt=PROFILE_SALT,
+            max_age=settings.PROFILING_TOKEN_MAX_AGE,
+        )
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def frame_name(frame):
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', '?')
+    return f'{module}:{code.co_name}'
+
+
+class StackSampler:
+    '''
+    Samples the stack of one thread from a background thread
+    and aggregates the samples into collapsed stacks
+    '''
+
+    def __init__(self, thread_id, interval, max_samples):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_samples = max_samples
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            stack = []
+            while frame is not None:
+                stack.append(frame_name(frame))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+            if self.samples >= self.max_samples:
+                return
+
+    def collapsed(self):
+        '''Returns the samples in the flame graph collapsed format'''
+        return ''.join(
+            f'{stack} {count}\n' for stack, count in self.stacks.items()
+        )
+
+
+def rotate_profiles(directory, max_files, max_bytes):
+    '''
+    Removes the oldest profiles of the view directory and of the whole
+    profiling directory until both limits are respected
+    '''
+    def listing(path):
+        entries = []
+        for root, _, files in os.walk(path):
+            for name in files:
+                full = os.path.join(root, name)
+                stat = os.stat(full)
+                entries.append((stat.st_mtime, stat.st_size, full))
+        return sorted(entries)
+
+    view_entries = listing(directory)
+    for _, _, path in view_entries[:max(len(view_entries) - max_files, 0)]:
+        os.remove(path)
+
+    all_entries = listing(settings.PROFILING_DIR)
+    total = sum(size for _, size, _ in all_entries)
+    for _, size, path in all_entries:
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
+
+
+class SamplingProfilerMiddleware:
+    '''
+    Profiles a fraction of the requests, or the requests carrying a valid
+    signed X-Profile-Token header, and writes collapsed stacks per view
+    '''
+    _slots = None
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if SamplingProfilerMiddleware._slots is None:
+            SamplingProfilerMiddleware._slots = threading.BoundedSemaphore(
+                settings.PROFILING_MAX_CONCURRENT
+            )
+
+    def should_profile(self, request):
+        token = request.META.get(PROFILE_HEADER)
+        if token:
+            return is_valid_profile_token(token)
+        rate = settings.PROFILING_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+        if not self._slots.acquire(blocking=False):
+            return self.get_response(request)
+
+        try:
+            sampler = StackSampler(
+                threading.get_ident(),
+                settings.PROFILING_INTERVAL,
+                settings.PROFILING_MAX_SAMPLES,
+            )
+            sampler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                sampler.stop()
+            if sampler.samples:
+                try:
+                    self.write_profile(request, sampler)
+                except OSError:
+                    logger.exception('Could not write the profile')
+        finally:
+            self._slots.release()
+        return response
+
+    def write_profile(self, request, sampler):
+        directory = os.path.join(settings.PROFILING_DIR, view_label(request))
+        os.makedirs(directory, exist_ok=True)
+
+        filename = f'{time.time_ns()}-{threading.get_ident()}.folded'
+        with open(os.path.join(directory, filename), 'w') as file:
+            file.write(sampler.collapsed())
+
+        rotate_profiles(
+            directory,
+            settings.PROFILING_MAX_FILES,
+            settings.PROFILING_MAX_BYTES,
+        )
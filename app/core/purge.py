@@ -0,0 +1,166 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from core import jobs, outbox
+from core.ingredient_index import registry as ingredient_registry
+from core.models import Change, Tag, Ingredient, Recipe, RecipeSignature, \
+                        UserPurge
+from core.similarity import registry as similarity_registry
+
+
+def request_deletion(user):
+    '''
+    Deactivates the user and revokes the tokens at once, the data is
+    purged later by a core.purge_user job or the purge_users command
+    '''
+    with transaction.atomic():
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+        Token.objects.filter(user=user).delete()
+        purge, created = UserPurge.objects.get_or_create(
+            user_id=user.pk, defaults={'email': user.email}
+        )
+        if created:
+            outbox.record('user.deleted', user.pk, user.pk, {'id': user.pk})
+            jobs.enqueue('core.purge_user', {'purge_id': purge.pk})
+    return purge
+
+
+def claim(purge_id=None):
+    '''
+    Claims the oldest unfinished purge, or the given one, that no other
+    runner holds for PURGE_LEASE_TIMEOUT seconds. The claim is a
+    conditional update, so one runner wins. Returns None if there is
+    nothing to claim
+    '''
+    now = timezone.now()
+    available = UserPurge.objects.filter(
+        Q(claimed_until__isnull=True) | Q(claimed_until__lte=now),
+        finished_at__isnull=True,
+    )
+    if purge_id is not None:
+        available = available.filter(pk=purge_id)
+    lease = now + timedelta(seconds=settings.PURGE_LEASE_TIMEOUT)
+    for pk in available.order_by('requested_at').values_list('pk', flat=True):
+        if available.filter(pk=pk).update(claimed_until=lease):
+            return UserPurge.objects.get(pk=pk)
+    return None
+
+
+def raw_delete(model, column, ids):
+    '''Deletes the rows without loading them or sending signals'''
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {qn(model._meta.db_table)} '
+            f'WHERE {qn(column)} IN ({", ".join(["%s"] * len(ids))})',
+            ids,
+        )
+
+
+def delete_images(names):
+    deleted = 0
+    for name in names:
+        try:
+            default_storage.delete(name)
+            deleted += 1
+        except OSError:
+            pass
+    return deleted
+
+
+class Purger:
+    '''
+    Purges the data of one deactivated user in short transactions of at
+    most batch_size rows, with raw set-based deletes. The images of a
+    batch are deleted once the batch is committed. Renews the claim on
+    the purge and calls progress(purge) after every batch
+    '''
+
+    def __init__(self, purge, batch_size, pause=0, progress=None):
+        self.purge = purge
+        self.batch_size = batch_size
+        self.pause = pause
+        self.progress = progress
+
+    def batches(self, queryset, *fields):
+        while True:
+            rows = list(
+                queryset.order_by('id').values_list('id', *fields)
+                [:self.batch_size]
+            )
+            if not rows:
+                return
+            yield rows
+            self.renew()
+            if self.progress is not None:
+                self.purge.refresh_from_db()
+                self.progress(self.purge)
+            time.sleep(self.pause)
+
+    def renew(self):
+        UserPurge.objects.filter(pk=self.purge.pk).update(
+            claimed_until=timezone.now()
+            + timedelta(seconds=settings.PURGE_LEASE_TIMEOUT)
+        )
+
+    def count(self, field, value):
+        UserPurge.objects.filter(pk=self.purge.pk).update(
+            **{field: F(field) + value}
+        )
+
+    def purge_recipes(self):
+        recipes = Recipe.objects.filter(owner_id=self.purge.user_id)
+        for rows in self.batches(recipes, 'image'):
+            ids = [recipe_id for recipe_id, _ in rows]
+            with transaction.atomic():
+                raw_delete(Recipe.tags.through, 'recipe_id', ids)
+                raw_delete(Recipe.ingredients.through, 'recipe_id', ids)
+                raw_delete(RecipeSignature, 'recipe_id', ids)
+                raw_delete(Recipe, 'id', ids)
+                self.count('recipes', len(ids))
+            images = delete_images([image for _, image in rows if image])
+            if images:
+                self.count('images', images)
+
+    def purge_parts(self, model, through, column, field):
+        parts = model.objects.filter(owner_id=self.purge.user_id)
+        for rows in self.batches(parts):
+            ids = [part_id for part_id, in rows]
+            with transaction.atomic():
+                raw_delete(through, column, ids)
+                raw_delete(model, 'id', ids)
+                self.count(field, len(ids))
+
+    def run(self):
+        if self.purge.started_at is None:
+            self.purge.started_at = timezone.now()
+            self.purge.save(update_fields=['started_at'])
+
+        self.purge_recipes()
+        self.purge_parts(Tag, Recipe.tags.through, 'tag_id', 'tags')
+        self.purge_parts(
+            Ingredient, Recipe.ingredients.through, 'ingredient_id',
+            'ingredients',
+        )
+        changes = Change.objects.filter(owner_id=self.purge.user_id)
+        for rows in self.batches(changes):
+            raw_delete(Change, 'id', [change_id for change_id, in rows])
+
+        with transaction.atomic():
+            get_user_model().objects.filter(pk=self.purge.user_id).delete()
+            UserPurge.objects.filter(pk=self.purge.pk).update(
+                finished_at=timezone.now(), claimed_until=None
+            )
+        ingredient_registry.invalidate(self.purge.user_id)
+        similarity_registry.invalidate(self.purge.user_id)
+        self.purge.refresh_from_db()
+        return self.purge
@@ -0,0 +1,76 @@
+from django.db import connection, transaction
+from django.dispatch import Signal
+
+from core.models import Tag, Ingredient, Recipe
+
+# Sent with the through model as sender and the owner_id, action
+# ('add' or 'remove') and links [(recipe_id, target_id)] actually changed
+links_changed = Signal()
+
+RELATIONS = {
+    'tags': (Recipe.tags.through, Tag, 'tag'),
+    'ingredients': (Recipe.ingredients.through, Ingredient, 'ingredient'),
+}
+
+
+def placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def change_links(relation, action, owner_id, recipe_ids, target_ids):
+    '''
+    Adds or removes the links between the recipes and the tags or
+    ingredients of the owner with one set-based INSERT or DELETE on the
+    through table, the recipes are never loaded. Already existing links
+    are skipped by the conflict handling and missing links are ignored.
+    Returns the list of (recipe_id, target_id) links actually changed
+    '''
+    through, target, target_field = RELATIONS[relation]
+    recipe_ids, target_ids = list(recipe_ids), list(target_ids)
+    if not recipe_ids or not target_ids:
+        return []
+
+    qn = connection.ops.quote_name
+    table = qn(through._meta.db_table)
+    recipe_column = qn(through._meta.get_field('recipe').column)
+    target_column = qn(through._meta.get_field(target_field).column)
+    recipes = (
+        f'SELECT {qn("id")} FROM {qn(Recipe._meta.db_table)} '
+        f'WHERE {qn("owner_id")} = %s '
+        f'AND {qn("id")} IN ({placeholders(recipe_ids)})'
+    )
+    targets = (
+        f'SELECT {qn("id")} FROM {qn(target._meta.db_table)} '
+        f'WHERE {qn("owner_id")} = %s '
+        f'AND {qn("id")} IN ({placeholders(target_ids)})'
+    )
+    params = [owner_id, *recipe_ids, owner_id, *target_ids]
+
+    if action == 'add':
+        sql = (
+            f'INSERT INTO {table} ({recipe_column}, {target_column}) '
+            f'SELECT r.{qn("id")}, t.{qn("id")} '
+            f'FROM ({recipes}) r CROSS JOIN ({targets}) t WHERE 1 = 1 '
+            f'ON CONFLICT DO NOTHING '
+            f'RETURNING {recipe_column}, {target_column}'
+        )
+    elif action == 'remove':
+        sql = (
+            f'DELETE FROM {table} '
+            f'WHERE {recipe_column} IN ({recipes}) '
+            f'AND {target_column} IN ({targets}) '
+            f'RETURNING {recipe_column}, {target_column}'
+        )
+    else:
+        raise ValueError(f'Unknown action {action!r}')
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            links = [tuple(row) for row in cursor.fetchall()]
+        if links:
+            links_changed.send(
+                sender=through, owner_id=owner_id, action=action,
+                links=links,
+            )
+    return links
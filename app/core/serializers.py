@@ -0,0 +1,16 @@
+from django.conf import settings
+from rest_framework import serializers
+
+
+class SubRequestSerializer(serializers.Serializer):
+    '''Read request run by the batch endpoint'''
+    method = serializers.ChoiceField(choices=['GET'], default='GET')
+    path = serializers.RegexField(r'^/', max_length=2000)
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = serializers.ListField(
+        child=SubRequestSerializer(),
+        min_length=1,
+        max_length=settings.BATCH_MAX_REQUESTS,
+    )
@@ -0,0 +1,351 @@
+import gc
+import io
+import os
+import random
+import signal
+import socket
+import sys
+import time
+from wsgiref import simple_server, util
+
+from django.apps import apps
+from django.db import OperationalError, connections
+from django.urls import URLResolver, get_resolver
+from rest_framework.serializers import BaseSerializer
+
+
+def worker_count():
+    '''
+    Two workers per core available to the process plus one, the workers
+    handle one request at a time and spend much of it on the database
+    '''
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    return cores * 2 + 1
+
+
+def warm_urls():
+    '''Compiles the patterns of all the URLs, returns their number'''
+    resolver = get_resolver()
+    resolver.reverse_dict
+    count = 0
+    resolvers = [resolver]
+    while resolvers:
+        resolver = resolvers.pop()
+        resolver.pattern.regex
+        for pattern in resolver.url_patterns:
+            if isinstance(pattern, URLResolver):
+                resolvers.append(pattern)
+            else:
+                pattern.pattern.regex
+                count += 1
+    return count
+
+
+def warm_serializers(log):
+    '''
+    Builds the fields of the serializers of the project apps once, which
+    fills the model meta caches and the lazy imports the fields use.
+    Returns the number of serializers
+    '''
+    count = 0
+    seen = set()
+    classes = [BaseSerializer]
+    while classes:
+        for cls in classes.pop().__subclasses__():
+            if cls in seen:
+                continue
+            seen.add(cls)
+            classes.append(cls)
+            config = apps.get_containing_app_config(cls.__module__)
+            if config is None or not config.path.startswith(
+                    os.path.dirname(os.path.dirname(__file__))):
+                continue
+            try:
+                cls().fields
+            except Exception as error:
+                log(f'Skipped warming {cls.__qualname__}: {error!r}')
+                continue
+            count += 1
+    return count
+
+
+def warm_requests(application, paths):
+    '''
+    Runs a GET of each path through the application, so the middleware,
+    the views and the renderers do their lazy imports and setup here
+    '''
+    for path in paths:
+        environ = {'PATH_INFO': path, 'REMOTE_ADDR': '127.0.0.1'}
+        util.setup_testing_defaults(environ)
+        result = application(environ, lambda status, headers: None)
+        for _ in result:
+            pass
+        if hasattr(result, 'close'):
+            result.close()
+    return len(paths)
+
+
+def exit_code(status):
+    '''
+    Exit code of a waitpid status, minus the signal number for a process
+    killed by a signal, as os.waitstatus_to_exitcode of Python 3.9
+    '''
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    if os.WIFEXITED(status):
+        return os.WEXITSTATUS(status)
+    return status
+
+
+def connect(log):
+    '''Opens the database connections of the worker'''
+    for connection in connections.all():
+        try:
+            connection.ensure_connection()
+        except OperationalError as error:
+            log(f'Database {connection.alias} unavailable: {error}')
+
+
+class ServerHandler(simple_server.ServerHandler):
+    '''Sends the files returned through wsgi.file_wrapper with sendfile'''
+
+    def __init__(self, *args, connection, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connection = connection
+
+    def sendfile(self):
+        try:
+            fileno = self.result.filelike.fileno()
+            offset = self.result.filelike.tell()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            return False
+        size = os.fstat(fileno).st_size
+        if not self.headers_sent:
+            self.send_headers()
+        while offset < size:
+            sent = os.sendfile(
+                self.connection.fileno(), fileno, offset, size - offset
+            )
+            if not sent:
+                break
+            offset += sent
+            self.bytes_sent += sent
+        return True
+
+
+class RequestHandler(simple_server.WSGIRequestHandler):
+    access_log = False
+
+    def log_request(self, *args, **kwargs):
+        if self.access_log:
+            super().log_request(*args, **kwargs)
+
+    def handle(self):
+        '''Handles one request, as WSGIRequestHandler with sendfile'''
+        self.raw_requestline = self.rfile.readline(65537)
+        if len(self.raw_requestline) > 65536:
+            self.send_error(414)
+            return
+        if not self.parse_request():
+            return
+
+        handler = ServerHandler(
+            self.rfile, self.wfile, self.get_stderr(), self.get_environ(),
+            multithread=False, connection=self.connection,
+        )
+        handler.request_handler = self
+        handler.run(self.server.get_app())
+
+
+class WSGIServer(simple_server.WSGIServer):
+    '''Accepts on a socket shared with the other workers'''
+
+    def __init__(self, listener, application, handler):
+        super().__init__(
+            listener.getsockname(), handler, bind_and_activate=False
+        )
+        self.socket.close()
+        self.socket = listener
+        host, port = listener.getsockname()[:2]
+        self.server_name = socket.getfqdn(host)
+        self.server_port = port
+        self.setup_environ()
+        self.set_app(application)
+        self.served = 0
+
+    def get_request(self):
+        connection, address = super().get_request()
+        connection.setblocking(True)
+        return connection, address
+
+    def process_request(self, request, client_address):
+        self.served += 1
+        super().process_request(request, client_address)
+
+
+class Worker:
+    '''
+    Serves requests from the shared socket in a forked process until it
+    is asked to stop or has served max_requests, the request in progress
+    is finished first
+    '''
+
+    def __init__(self, listener, application, max_requests, timeout,
+                 access_log=False):
+        handler = type('Handler', (RequestHandler, ), {
+            'timeout': timeout, 'access_log': access_log,
+        })
+        self.server = WSGIServer(listener, application, handler)
+        self.server.timeout = 1
+        self.max_requests = max_requests
+        self.alive = True
+
+    def stop(self, *args):
+        self.alive = False
+
+    def run(self):
+        while self.alive and (not self.max_requests
+                              or self.server.served < self.max_requests):
+            self.server.handle_request()
+        connections.close_all()
+
+
+class Arbiter:
+    '''
+    Preforking WSGI server. The application is loaded and warmed up once
+    in this process, the workers are forked from it and share its memory
+    until they write to it. A worker that exits, e.g. after serving
+    max_requests plus a random jitter, is replaced. SIGTERM and SIGINT
+    stop the workers gracefully and SIGKILL those still busy after
+    graceful_timeout, SIGHUP replaces all the workers
+    '''
+
+    def __init__(self, application, address, workers, max_requests=0,
+                 max_requests_jitter=0, timeout=30, graceful_timeout=30,
+                 backlog=2048, access_log=False, warm_up_paths=(),
+                 log=print):
+        self.application = application
+        self.address = address
+        self.workers = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.timeout = timeout
+        self.graceful_timeout = graceful_timeout
+        self.backlog = backlog
+        self.access_log = access_log
+        self.warm_up_paths = warm_up_paths
+        self.log = log
+        self.children = {}
+        self.alive = True
+
+    def listen(self):
+        host, port = self.address
+        family = socket.AF_INET6 if ':' in host else socket.AF_INET
+        listener = socket.socket(family, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind(self.address)
+        listener.listen(self.backlog)
+        listener.setblocking(False)
+        return listener
+
+    def warm_up(self):
+        start = time.perf_counter()
+        urls = warm_urls()
+        serializers = warm_serializers(self.log)
+        requests = warm_requests(self.application, self.warm_up_paths)
+        connections.close_all()
+        self.log(f'Warmed up {urls} URLs, {serializers} serializers and '
+                 f'{requests} requests in '
+                 f'{(time.perf_counter() - start) * 1000:.0f}ms')
+
+    def spawn(self, listener):
+        max_requests = self.max_requests and self.max_requests \
+            + random.randint(0, self.max_requests_jitter)
+        pid = os.fork()
+        if pid:
+            self.children[pid] = time.monotonic()
+            return
+
+        status = 0
+        try:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGHUP, signal.SIG_DFL)
+            worker = Worker(
+                listener, self.application, max_requests, self.timeout,
+                self.access_log,
+            )
+            signal.signal(signal.SIGTERM, worker.stop)
+            connect(self.log)
+            worker.run()
+        except BaseException:
+            status = 1
+            sys.excepthook(*sys.exc_info())
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(status)
+
+    def stop(self, *args):
+        self.alive = False
+
+    def reload(self, *args):
+        self.signal_children(signal.SIGTERM)
+
+    def signal_children(self, signum):
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                self.children.pop(pid, None)
+
+    def reap(self):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if not pid:
+                return
+            started = self.children.pop(pid, None)
+            code = exit_code(status)
+            if code and self.alive:
+                self.log(f'Worker {pid} exited with {code}')
+                if started is not None \
+                        and time.monotonic() - started < 1:
+                    time.sleep(1)
+
+    def run(self):
+        self.warm_up()
+        gc.collect()
+        gc.freeze()
+        listener = self.listen()
+
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGHUP, self.reload)
+        self.log(f'Serving on {self.address[0]}:{self.address[1]} '
+                 f'with {self.workers} workers')
+        try:
+            while self.alive:
+                self.reap()
+                while self.alive and len(self.children) < self.workers:
+                    self.spawn(listener)
+                time.sleep(0.2)
+        finally:
+            self.shutdown()
+            listener.close()
+
+    def shutdown(self):
+        self.signal_children(signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.children and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        self.signal_children(signal.SIGKILL)
+        while self.children:
+            self.reap()
+            time.sleep(0.01)
@@ -0,0 +1,239 @@
+from collections import Counter
+
+from django.db import transaction
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, pre_delete, post_delete, \
+                                     post_save
+from django.dispatch import receiver
+
+from core.changes import KINDS, record_changes
+from core.counters import apply_count_changes, linked_counts
+from core.ingredient_index import registry
+from core.models import Tag, Ingredient, Recipe, Change, ChangeSequence
+from core.relations import links_changed
+from core.similarity import schedule_signature_update, \
+                            registry as similarity_registry
+
+COUNTED_RELATIONS = {
+    Recipe.tags.through: (Tag, 'tag_id'),
+    Recipe.ingredients.through: (Ingredient, 'ingredient_id'),
+}
+
+
+@receiver(m2m_changed)
+def update_recipe_counts(sender, instance, action, reverse, pk_set,
+                         **kwargs):
+    '''
+    Keeps recipe_count of tags and ingredients in sync with the
+    recipe relations, in the transaction of the relation change
+    '''
+    if sender not in COUNTED_RELATIONS:
+        return
+    model, column = COUNTED_RELATIONS[sender]
+    own, other = (column, 'recipe_id') if reverse else ('recipe_id', column)
+
+    if action == 'post_add' and pk_set:
+        if reverse:
+            changes = {instance.pk: len(pk_set)}
+        else:
+            changes = dict.fromkeys(pk_set, 1)
+        apply_count_changes(model, changes)
+
+    elif action in ('pre_remove', 'pre_clear'):
+        filters = {own: instance.pk}
+        if action == 'pre_remove':
+            filters[f'{other}__in'] = pk_set
+        removed = getattr(instance, '_removed_recipe_links', {})
+        removed[sender] = linked_counts(sender, column, **filters)
+        instance._removed_recipe_links = removed
+
+    elif action in ('post_remove', 'post_clear'):
+        removed = instance._removed_recipe_links.pop(sender, Counter())
+        apply_count_changes(
+            model, {pk: -count for pk, count in removed.items()}
+        )
+
+
+@receiver(links_changed)
+def update_linked_counts(sender, action, links, **kwargs):
+    '''Applies the counts of the links changed by the set-based operations'''
+    model, _ = COUNTED_RELATIONS[sender]
+    delta = 1 if action == 'add' else -1
+    changes = Counter(target_id for _, target_id in links)
+    apply_count_changes(
+        model, {pk: count * delta for pk, count in changes.items()}
+    )
+
+
+@receiver(pre_delete, sender=Recipe)
+def release_recipe_counts(sender, instance, **kwargs):
+    '''Decrements the counts of the tags and ingredients of the recipe'''
+    for through, (model, column) in COUNTED_RELATIONS.items():
+        removed = linked_counts(through, column, recipe_id=instance.pk)
+        apply_count_changes(
+            model, {pk: -count for pk, count in removed.items()}
+        )
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_ingredient_index(sender, instance, action, reverse, pk_set,
+                            **kwargs):
+    '''Applies the committed ingredient changes to the loaded index'''
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    owner_id = instance.owner_id
+
+    def apply():
+        index = registry.loaded(owner_id)
+        if index is None:
+            return
+        if reverse:
+            registry.invalidate(owner_id)
+        elif action == 'post_add':
+            index.add(instance.pk, pk_set)
+        elif action == 'post_remove':
+            index.remove(instance.pk, pk_set)
+        else:
+            index.remove(instance.pk)
+
+    transaction.on_commit(apply)
+
+
+@receiver(links_changed, sender=Recipe.ingredients.through)
+def update_linked_ingredient_index(sender, owner_id, action, links,
+                                   **kwargs):
+    by_recipe = {}
+    for recipe_id, ingredient_id in links:
+        by_recipe.setdefault(recipe_id, []).append(ingredient_id)
+
+    def apply():
+        index = registry.loaded(owner_id)
+        if index is None:
+            return
+        for recipe_id, ingredient_ids in by_recipe.items():
+            if action == 'add':
+                index.add(recipe_id, ingredient_ids)
+            else:
+                index.remove(recipe_id, ingredient_ids)
+
+    transaction.on_commit(apply)
+
+
+@receiver(post_delete, sender=Recipe)
+def discard_from_ingredient_index(sender, instance, **kwargs):
+    recipe_id, owner_id = instance.pk, instance.owner_id
+
+    def apply():
+        index = registry.loaded(owner_id)
+        if index is not None:
+            index.discard_recipe(recipe_id)
+
+    transaction.on_commit(apply)
+
+
+@receiver(m2m_changed)
+def update_similarity_signatures(sender, instance, action, reverse, pk_set,
+                                 **kwargs):
+    '''Schedules the MinHash signature update of the changed recipes'''
+    if sender not in COUNTED_RELATIONS:
+        return
+    _, column = COUNTED_RELATIONS[sender]
+
+    if action == 'pre_clear' and reverse:
+        instance._cleared_recipe_ids = list(
+            sender.objects.filter(**{column: instance.pk})
+            .values_list('recipe_id', flat=True)
+        )
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        recipe_ids = [instance.pk]
+    elif pk_set is not None:
+        recipe_ids = pk_set
+    else:
+        recipe_ids = instance.__dict__.pop('_cleared_recipe_ids', [])
+    schedule_signature_update(instance.owner_id, recipe_ids)
+
+
+@receiver(links_changed)
+def update_linked_signatures(sender, owner_id, links, **kwargs):
+    schedule_signature_update(
+        owner_id, {recipe_id for recipe_id, _ in links}
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def discard_from_similarity_index(sender, instance, **kwargs):
+    recipe_id, owner_id = instance.pk, instance.owner_id
+
+    def apply():
+        index = similarity_registry.loaded(owner_id)
+        if index is not None:
+            index.update(recipe_id, None)
+
+    transaction.on_commit(apply)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def record_saved(sender, instance, **kwargs):
+    record_changes(instance.owner_id, KINDS[sender], [instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def record_deleted(sender, instance, **kwargs):
+    record_changes(
+        instance.owner_id, KINDS[sender], [instance.pk], deleted=True
+    )
+
+
+@receiver(m2m_changed)
+def record_relations_changed(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    '''Records the recipes whose tags or ingredients changed'''
+    if sender not in COUNTED_RELATIONS:
+        return
+    _, column = COUNTED_RELATIONS[sender]
+
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            record_changes(instance.owner_id, 'recipe', [instance.pk])
+    elif action == 'pre_clear':
+        record_changes(instance.owner_id, 'recipe', (
+            sender.objects.filter(**{column: instance.pk})
+            .values_list('recipe_id', flat=True)
+        ))
+    elif action in ('post_add', 'post_remove'):
+        record_changes(instance.owner_id, 'recipe', pk_set)
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def record_unlinked(sender, instance, **kwargs):
+    '''Records the recipes losing the deleted tag or ingredient'''
+    through = Recipe.tags.through if sender is Tag \
+        else Recipe.ingredients.through
+    _, column = COUNTED_RELATIONS[through]
+    record_changes(instance.owner_id, 'recipe', (
+        through.objects.filter(**{column: instance.pk})
+        .values_list('recipe_id', flat=True)
+    ))
+
+
+@receiver(links_changed)
+def record_links_changed(sender, owner_id, links, **kwargs):
+    record_changes(owner_id, 'recipe', [recipe_id for recipe_id, _ in links])
+
+
+@receiver(post_delete, sender=get_user_model())
+def drop_change_feed(sender, instance, **kwargs):
+    '''
+    Drops the tombstones and the sequence written while the objects of
+    the user were deleted along with the user
+    '''
+    Change.objects.filter(owner_id=instance.pk).delete()
+    ChangeSequence.objects.filter(owner_id=instance.pk).delete()
@@ -0,0 +1,264 @@
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from core.models import ChangeSequence, Recipe, RecipeSignature
+from core.utils import IndexRegistry
+
+PERMUTATIONS = 128
+BANDS = 32
+ROWS = PERMUTATIONS // BANDS
+SEED = 20200616
+
+_random = np.random.RandomState(SEED)
+HASH_A = _random.randint(0, 2 ** 64, PERMUTATIONS, dtype=np.uint64) | 1
+HASH_B = _random.randint(0, 2 ** 64, PERMUTATIONS, dtype=np.uint64)
+BAND_MIX = _random.randint(0, 2 ** 64, ROWS, dtype=np.uint64) | 1
+CHUNK_FEATURES = 1 << 16
+
+
+def recipe_features(recipe_ids):
+    '''
+    Returns {recipe_id: np.array of features}, tags and ingredients are
+    mapped to distinct integer features
+    '''
+    features = {}
+    tags = Recipe.tags.through.objects.filter(recipe_id__in=recipe_ids)
+    for recipe_id, tag_id in tags.values_list('recipe_id', 'tag_id'):
+        features.setdefault(recipe_id, []).append(tag_id * 2)
+    ingredients = Recipe.ingredients.through.objects.filter(
+        recipe_id__in=recipe_ids
+    )
+    for recipe_id, ingredient_id in ingredients.values_list(
+            'recipe_id', 'ingredient_id'):
+        features.setdefault(recipe_id, []).append(ingredient_id * 2 + 1)
+    return {
+        recipe_id: np.array(values, dtype=np.uint64)
+        for recipe_id, values in features.items()
+    }
+
+
+def mix(values):
+    '''splitmix64 finalizer, spreads the small integer ids over 64 bits'''
+    values = values + np.uint64(0x9E3779B97F4A7C15)
+    values = (values ^ (values >> np.uint64(30))) \
+        * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) \
+        * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def minhash(feature_sets):
+    '''
+    Computes the MinHash signatures of the non-empty feature arrays with
+    multiply-shift hashing of the mixed features, returns
+    a (len(feature_sets), PERMUTATIONS) uint32 array
+    '''
+    signatures = np.empty((len(feature_sets), PERMUTATIONS), dtype=np.uint32)
+    start = 0
+    while start < len(feature_sets):
+        end, size = start, 0
+        while end < len(feature_sets) and (
+                end == start or size + len(feature_sets[end])
+                <= CHUNK_FEATURES):
+            size += len(feature_sets[end])
+            end += 1
+
+        chunk = feature_sets[start:end]
+        values = mix(np.concatenate(chunk))
+        offsets = np.cumsum([0] + [len(f) for f in chunk[:-1]])
+        hashes = (HASH_A[:, None] * values[None, :] + HASH_B[:, None]) \
+            >> np.uint64(32)
+        signatures[start:end] = \
+            np.minimum.reduceat(hashes, offsets, axis=1).T.astype(np.uint32)
+        start = end
+    return signatures
+
+
+def band_keys(signatures):
+    '''Hashes each band of ROWS values into one uint64 per band'''
+    bands = signatures.reshape(len(signatures), BANDS, ROWS)
+    return (bands.astype(np.uint64) * BAND_MIX).sum(axis=2)
+
+
+class MinHashLSHIndex:
+    '''
+    LSH index over MinHash signatures of the recipes of one user.
+    The band keys are kept sorted per band so the candidates of a band
+    are found with a binary search. Recipes changed after the build are
+    kept aside and scored directly until the next compaction
+    '''
+
+    def __init__(self, recipe_ids, signatures):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self._build(
+            np.asarray(recipe_ids, dtype=np.int64),
+            np.asarray(signatures, dtype=np.uint32)
+            .reshape(len(recipe_ids), PERMUTATIONS),
+        )
+
+    def _build(self, recipe_ids, signatures):
+        self.recipe_ids = recipe_ids
+        self.signatures = signatures
+        self.alive = np.ones(len(recipe_ids), dtype=bool)
+        self.rows = {int(r): row for row, r in enumerate(recipe_ids)}
+        keys = band_keys(signatures).T
+        self.order = np.argsort(keys, axis=1, kind='stable')
+        self.sorted_keys = np.take_along_axis(keys, self.order, axis=1)
+
+    def _compact(self):
+        keep = self.alive.copy()
+        for recipe_id in self.pending:
+            row = self.rows.get(recipe_id)
+            if row is not None:
+                keep[row] = False
+        recipe_ids = np.concatenate([
+            self.recipe_ids[keep],
+            np.fromiter(self.pending, dtype=np.int64, count=len(self.pending)),
+        ])
+        signatures = np.concatenate([
+            self.signatures[keep],
+            np.array(list(self.pending.values()), dtype=np.uint32)
+            .reshape(len(self.pending), PERMUTATIONS),
+        ])
+        self.pending = {}
+        self._build(recipe_ids, signatures)
+
+    def update(self, recipe_id, signature):
+        '''Replaces the signature of the recipe, None removes the recipe'''
+        with self.lock:
+            row = self.rows.get(recipe_id)
+            if row is not None:
+                self.alive[row] = False
+            if signature is None:
+                self.pending.pop(recipe_id, None)
+            else:
+                self.pending[recipe_id] = signature
+            if len(self.pending) > settings.SIMILARITY_PENDING_LIMIT:
+                self._compact()
+
+    def signature(self, recipe_id):
+        if recipe_id in self.pending:
+            return self.pending[recipe_id]
+        row = self.rows.get(recipe_id)
+        if row is None or not self.alive[row]:
+            return None
+        return self.signatures[row]
+
+    def similar(self, recipe_id, k):
+        '''
+        Returns up to k [(recipe_id, similarity)] sharing at least one band
+        with the recipe, by the estimated Jaccard similarity
+        '''
+        with self.lock:
+            signature = self.signature(recipe_id)
+            if signature is None:
+                return []
+            keys = band_keys(signature[None, :])[0]
+
+            rows = []
+            for band, key in enumerate(keys):
+                sorted_keys = self.sorted_keys[band]
+                low = np.searchsorted(sorted_keys, key, 'left')
+                high = np.searchsorted(sorted_keys, key, 'right')
+                rows.append(self.order[band, low:high])
+            rows = np.unique(np.concatenate(rows))
+            rows = rows[self.alive[rows]]
+            candidates = self.recipe_ids[rows]
+            scores = (self.signatures[rows] == signature).mean(axis=1)
+
+            if self.pending:
+                pending_ids = np.fromiter(self.pending, dtype=np.int64)
+                pending = np.array(list(self.pending.values()))
+                shared = (band_keys(pending) == keys).any(axis=1)
+                candidates = np.concatenate(
+                    [candidates, pending_ids[shared]]
+                )
+                scores = np.concatenate(
+                    [scores, (pending[shared] == signature).mean(axis=1)]
+                )
+
+        other = candidates != recipe_id
+        candidates, scores = candidates[other], scores[other]
+        top = np.lexsort((-candidates, -scores))[:k]
+        return [
+            (int(candidates[i]), float(scores[i])) for i in top
+        ]
+
+
+def compute_signatures(recipe_ids):
+    '''Returns {recipe_id: signature} of the recipes with any features'''
+    features = recipe_features(recipe_ids)
+    ids = list(features)
+    signatures = minhash([features[i] for i in ids])
+    return dict(zip(ids, signatures))
+
+
+def store_signatures(recipe_ids):
+    '''
+    Recomputes and stores the signatures of the recipes, the recipes
+    without tags and ingredients lose their signature. Moves the
+    signature_seq of the owners so the other processes rebuild their index
+    '''
+    signatures = compute_signatures(recipe_ids)
+    with transaction.atomic():
+        RecipeSignature.objects.filter(recipe_id__in=recipe_ids).delete()
+        RecipeSignature.objects.bulk_create(
+            RecipeSignature(recipe_id=recipe_id, signature=sig.tobytes())
+            for recipe_id, sig in signatures.items()
+        )
+        ChangeSequence.objects.filter(owner_id__in=Recipe.objects.filter(
+            pk__in=recipe_ids
+        ).values('owner_id')).update(signature_seq=F('signature_seq') + 1)
+    return signatures
+
+
+_local = threading.local()
+
+
+def schedule_signature_update(owner_id, recipe_ids):
+    '''
+    Recomputes the signatures of the recipes once the transaction commits,
+    the recipes changed several times in a transaction are computed once
+    '''
+    pending = _local.__dict__.setdefault('pending', {})
+    pending.setdefault(owner_id, set()).update(recipe_ids)
+    transaction.on_commit(flush_signature_updates)
+
+
+def flush_signature_updates():
+    pending = _local.__dict__.get('pending', {})
+    while pending:
+        owner_id, recipe_ids = pending.popitem()
+        signatures = store_signatures(list(recipe_ids))
+        index = registry.loaded(owner_id)
+        if index is not None:
+            for recipe_id in recipe_ids:
+                index.update(recipe_id, signatures.get(recipe_id))
+
+
+def build_index(owner_id):
+    rows = RecipeSignature.objects.filter(recipe__owner_id=owner_id) \
+        .values_list('recipe_id', 'signature')
+    recipe_ids, signatures = [], []
+    for recipe_id, signature in rows.iterator():
+        recipe_ids.append(recipe_id)
+        signatures.append(np.frombuffer(signature, dtype=np.uint32))
+    return MinHashLSHIndex(recipe_ids, signatures)
+
+
+def index_version(owner_id):
+    '''
+    The change feed number of the owner, which moves when a recipe is
+    deleted, and the number of signature updates, which move after the
+    changes of the tags and ingredients are committed
+    '''
+    return ChangeSequence.objects.filter(owner_id=owner_id) \
+        .values_list('seq', 'signature_seq').first()
+
+
+registry = IndexRegistry(build_index, index_version)
@@ -0,0 +1,160 @@
+import logging
+import math
+import random
+import threading
+import time
+from collections import Counter
+
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import F
+
+from core.models import CacheCounter
+
+logger = logging.getLogger(__name__)
+
+
+class Call:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    '''
+    Runs one computation per key at a time in this process, concurrent
+    callers of the same key wait for it and share its result
+    '''
+
+    def __init__(self, metrics=None):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.metrics = metrics
+
+    def do(self, key, compute):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = Call()
+
+        if not leader:
+            if self.metrics is not None:
+                self.metrics.record('coalesced')
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = compute()
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result
+
+
+class Metrics:
+    '''
+    Counts the cache events of this process and adds them to the
+    CacheCounter rows every interval seconds, so that the counts of all
+    the workers can be read from the database
+    '''
+
+    def __init__(self, prefix, interval):
+        self.prefix = prefix
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.local = Counter()
+        self.pending = Counter()
+        self.flushed = time.monotonic()
+
+    def record(self, name):
+        with self.lock:
+            self.local[name] += 1
+            self.pending[name] += 1
+            if time.monotonic() - self.flushed < self.interval:
+                return
+            pending, self.pending = self.pending, Counter()
+            self.flushed = time.monotonic()
+        self.flush(pending)
+
+    def flush(self, pending):
+        try:
+            with transaction.atomic():
+                for name, count in pending.items():
+                    self.add(f'{self.prefix}:{name}', count)
+        except DatabaseError:
+            logger.exception('Could not save the cache counters')
+
+    def add(self, name, count):
+        counters = CacheCounter.objects.filter(name=name)
+        if counters.update(count=F('count') + count):
+            return
+        try:
+            with transaction.atomic():
+                CacheCounter.objects.create(name=name, count=count)
+        except IntegrityError:
+            counters.update(count=F('count') + count)
+
+    def totals(self, names):
+        '''Returns the counters of all the workers from the database'''
+        counts = dict(CacheCounter.objects.filter(
+            name__in=[f'{self.prefix}:{name}' for name in names]
+        ).values_list('name', 'count'))
+        return {
+            name: counts.get(f'{self.prefix}:{name}', 0) for name in names
+        }
+
+
+def entry(value, timeout, delta):
+    '''Wraps the value with its freshness for cached()'''
+    return value, time.time() + timeout, delta
+
+
+def cached(cache, key, compute, timeout, stale_timeout, flight, metrics,
+           beta=1.0, flight_key=None):
+    '''
+    Returns the value cached under key, computing it with compute() on a
+    miss. Misses of this process are coalesced by flight, per flight_key
+    when the computation depends on more than the key. An entry is
+    refreshed early with a probability growing towards its expiry, in
+    proportion to how long it took to compute, and is served for
+    stale_timeout more seconds while one request refreshes it
+    '''
+    flight_key = flight_key or key
+
+    def refresh():
+        start = time.monotonic()
+        value = compute()
+        cache.set(
+            key, entry(value, timeout, time.monotonic() - start),
+            timeout + stale_timeout,
+        )
+        return value
+
+    found = cache.get(key)
+    if found is None:
+        metrics.record('misses')
+        return flight.do(flight_key, refresh)
+
+    value, fresh_until, delta = found
+    now = time.time()
+    if now - delta * beta * math.log(1 - random.random()) < fresh_until:
+        metrics.record('hits')
+        return value
+
+    lock = f'{key}:refresh'
+    if not cache.add(lock, 1, max(1, math.ceil(delta * 10))):
+        metrics.record('stale' if now >= fresh_until else 'hits')
+        return value
+    metrics.record('refreshes' if now >= fresh_until else 'early_refreshes')
+    try:
+        return flight.do(flight_key, refresh)
+    finally:
+        cache.delete(lock)
@@ -0,0 +1,119 @@
+import hashlib
+import random
+import re
+import time
+
+from django.conf import settings
+from django.db import connection, transaction, DatabaseError, IntegrityError
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from core.models import SlowQuery
+from core.utils import view_label
+
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+PLACEHOLDER_LISTS = re.compile(r'\?(?:\s*,\s*\?)+')
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    '''Replaces the literals and placeholder lists of the statement with ?'''
+    sql = LITERALS.sub('?', sql.replace('%s', '?'))
+    sql = PLACEHOLDER_LISTS.sub('?, ...', sql)
+    return WHITESPACE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.md5(normalized_sql.encode()).hexdigest()
+
+
+def explain(sql, params):
+    '''Runs EXPLAIN (ANALYZE, BUFFERS) for the statement on PostgreSQL'''
+    if connection.vendor != 'postgresql':
+        return ''
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (ANALYZE, BUFFERS) {sql}', params)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+            transaction.set_rollback(True)
+    except DatabaseError:
+        return ''
+    return plan
+
+
+class SlowQueryRecorder:
+    '''
+    Execute wrapper collecting the statements slower than
+    SLOW_QUERY_THRESHOLD_MS during a request
+    '''
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            if duration >= settings.SLOW_QUERY_THRESHOLD_MS:
+                self.queries.append((sql, params, many, duration))
+
+    def flush(self, view):
+        '''Aggregates the recorded statements per fingerprint'''
+        for sql, params, many, duration in self.queries:
+            normalized = normalize_sql(sql)
+            key = fingerprint(normalized)
+
+            plan = ''
+            sampled = random.random() < settings.SLOW_QUERY_EXPLAIN_RATE
+            if sampled and not many and sql.lstrip()[:6].upper() == 'SELECT':
+                plan = explain(sql, params)
+
+            record_slow_query(key, normalized, view, duration, plan)
+        self.queries = []
+
+
+def record_slow_query(key, normalized, view, duration, plan):
+    changes = {
+        'count': F('count') + 1,
+        'total_duration': F('total_duration') + duration,
+        'max_duration': Greatest('max_duration', duration),
+        'view': view,
+        'last_seen': timezone.now(),
+    }
+    if plan:
+        changes['explain'] = plan
+
+    if SlowQuery.objects.filter(fingerprint=key).update(**changes):
+        return
+
+    try:
+        with transaction.atomic():
+            SlowQuery.objects.create(
+                fingerprint=key,
+                sql=normalized,
+                view=view,
+                count=1,
+                total_duration=duration,
+                max_duration=duration,
+                explain=plan,
+            )
+    except IntegrityError:
+        record_slow_query(key, normalized, view, duration, plan)
+
+
+class SlowQueryLogMiddleware:
+    '''Records the slow statements executed while handling each request'''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = SlowQueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        if recorder.queries:
+            recorder.flush(view_label(request))
+        return response
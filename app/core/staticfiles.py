@@ -0,0 +1,188 @@
+import json
+import mimetypes
+import os
+import threading
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date
+
+from core.compression import CODECS, negotiate
+
+EXTENSIONS = {'br': '.br', 'gzip': '.gz'}
+
+
+def compressible(name):
+    content_type, _ = mimetypes.guess_type(name)
+    return content_type in settings.STATIC_COMPRESS_TYPES
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    '''
+    Stores the static files under names with the hash of their content
+    and writes a .br and a .gz variant next to every compressible file
+    at collectstatic time. A variant is only kept when it is smaller
+    than STATIC_COMPRESS_RATIO of the file
+    '''
+
+    def stored_name(self, name):
+        # Before collectstatic, e.g. in development and in the tests,
+        # there is no manifest and the files keep their names
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(self.hashed_files) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if not compressible(name) or not self.exists(name):
+                continue
+            for variant in self.compress(name):
+                yield name, variant, True
+
+    def compress(self, name):
+        '''Writes the missing or outdated variants of the file'''
+        path = self.path(name)
+        modified = os.stat(path).st_mtime
+        data = None
+        for encoding, level in settings.STATIC_COMPRESSION_LEVELS.items():
+            if encoding not in CODECS:
+                continue
+            variant = path + EXTENSIONS[encoding]
+            if os.path.exists(variant) \
+                    and os.stat(variant).st_mtime >= modified:
+                continue
+            if data is None:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            compressed = CODECS[encoding].compress(data, level)
+            if len(compressed) > len(data) * settings.STATIC_COMPRESS_RATIO:
+                if os.path.exists(variant):
+                    os.remove(variant)
+                continue
+            with open(variant, 'wb') as f:
+                f.write(compressed)
+            yield name + EXTENSIONS[encoding]
+
+
+class StaticFile:
+
+    def __init__(self, name, path, immutable):
+        self.name = name
+        self.content_type, _ = mimetypes.guess_type(name)
+        self.immutable = immutable
+        self.variants = {None: self.stat(path)}
+        for encoding, extension in EXTENSIONS.items():
+            if os.path.exists(path + extension):
+                self.variants[encoding] = self.stat(path + extension)
+        self.encodings = tuple(
+            encoding for encoding in settings.STATIC_COMPRESSION_LEVELS
+            if encoding in self.variants
+        )
+
+    def stat(self, path):
+        stat = os.stat(path)
+        etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+        return path, stat.st_size, http_date(stat.st_mtime), etag
+
+
+def index(root):
+    '''
+    Maps the names of the files under root to their variants, the files
+    listed with their hashed names in the manifest are immutable
+    '''
+    hashed = set()
+    manifest = os.path.join(root, 'staticfiles.json')
+    if os.path.exists(manifest):
+        with open(manifest) as f:
+            hashed = set(json.load(f).get('paths', {}).values())
+
+    files = {}
+    for directory, _, names in os.walk(root):
+        for filename in names:
+            path = os.path.join(directory, filename)
+            base, extension = os.path.splitext(path)
+            if extension in EXTENSIONS.values() and os.path.exists(base):
+                continue
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            files[name] = StaticFile(name, path, name in hashed)
+    return files
+
+
+class StaticFilesMiddleware:
+    '''
+    Serves the files collected into STATIC_ROOT under STATIC_URL with
+    the precompressed variant accepted by the client, nothing is
+    compressed per request. Hashed files are cached by the clients for
+    good, the others for STATIC_MAX_AGE seconds. With
+    STATIC_SENDFILE_HEADER the file is sent by the server in front of
+    the app, otherwise through the wsgi.file_wrapper of the server. The
+    files are indexed on the first request, so a worker has to be
+    restarted after collectstatic
+    '''
+
+    def __init__(self, get_response):
+        if not settings.STATIC_ROOT or not settings.STATIC_URL \
+                or not settings.STATIC_URL.startswith('/'):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL
+        self.files = None
+        self.lock = threading.Lock()
+
+    def __call__(self, request):
+        if request.method not in ('GET', 'HEAD') \
+                or not request.path_info.startswith(self.prefix):
+            return self.get_response(request)
+        if self.files is None:
+            with self.lock:
+                if self.files is None:
+                    self.files = index(settings.STATIC_ROOT)
+        static = self.files.get(request.path_info[len(self.prefix):])
+        if static is None:
+            return self.get_response(request)
+        return self.serve(request, static)
+
+    def serve(self, request, static):
+        encoding = negotiate(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''), static.encodings
+        )
+        path, size, modified, etag = static.variants[encoding]
+        if encoding is not None:
+            etag = f'{etag[:-1]}-{encoding}"'
+
+        if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+            response = HttpResponseNotModified()
+        elif settings.STATIC_SENDFILE_HEADER:
+            response = HttpResponse(content_type=static.content_type)
+            response[settings.STATIC_SENDFILE_HEADER] = \
+                settings.STATIC_SENDFILE_PREFIX \
+                + os.path.relpath(path, settings.STATIC_ROOT)
+        elif request.method == 'HEAD':
+            response = HttpResponse(content_type=static.content_type)
+            response['Content-Length'] = str(size)
+        else:
+            response = FileResponse(
+                open(path, 'rb'), content_type=static.content_type
+            )
+            response['Content-Length'] = str(size)
+
+        if encoding is not None:
+            response['Content-Encoding'] = encoding
+        if len(static.variants) > 1:
+            response['Vary'] = 'Accept-Encoding'
+        if static.immutable:
+            response['Cache-Control'] = \
+                f'public, max-age={settings.STATIC_IMMUTABLE_MAX_AGE}, ' \
+                f'immutable'
+        else:
+            response['Cache-Control'] = \
+                f'public, max-age={settings.STATIC_MAX_AGE}'
+        response['ETag'] = etag
+        response['Last-Modified'] = modified
+        return response
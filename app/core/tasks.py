@@ -0,0 +1,35 @@
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.utils import timezone
+
+from core.jobs import task
+from core.models import IdempotencyKey
+from core.purge import Purger, claim
+
+
+@task('core.purge_user', priority=-10, timeout=60 * 60)
+def purge_user(purge_id):
+    purge = claim(purge_id)
+    if purge is not None:
+        Purger(
+            purge, settings.PURGE_BATCH_SIZE, settings.PURGE_BATCH_PAUSE
+        ).run()
+
+
+@task('core.repair_recipe_counts', priority=-5)
+def repair_recipe_counts():
+    call_command('repair_recipe_counts', stdout=StringIO())
+
+
+@task('core.rebuild_similarity_index', priority=-5, timeout=60 * 60)
+def rebuild_similarity_index(user_id=None):
+    call_command(
+        'rebuild_similarity_index', user=user_id, stdout=StringIO()
+    )
+
+
+@task('core.purge_idempotency_keys', priority=-5)
+def purge_idempotency_keys():
+    IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
@@ -1,7 +1,12 @@
+from unittest.mock import patch
+
 from django.test import TestCase, Client
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
+from core.pagination import EstimatedCountPaginator
+from core.models import Recipe, Tag
+
 
 class AdminTest(TestCase):
 
@@ -43,3 +48,48 @@ class AdminTest(TestCase):
         url = reverse('admin:core_user_add')
 
         self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_user_search(self):
+        '''Tests if the users are searched by email and name'''
+        url = reverse('admin:core_user_changelist')
+
+        res = self.client.get(url, {'q': 'testmail@'})
+
+        self.assertEqual(
+            list(res.context['cl'].result_list), [self.user]
+        )
+
+    def test_recipe_changelist(self):
+        '''Tests if the recipes are listed without a query per owner'''
+        url = reverse('admin:core_recipe_changelist')
+        for owner in (self.user, self.superuser):
+            for i in range(5):
+                Recipe.objects.create(owner=owner, title=f'Stew {i}', price=1)
+        self.client.get(url)
+
+        with self.assertNumQueries(4):
+            res = self.client.get(url, {'q': 'stew'})
+
+        self.assertContains(res, 'Stew 4')
+        self.assertContains(res, self.user.email)
+
+    def test_recipe_change_page(self):
+        '''Tests if the recipe page uses autocomplete widgets'''
+        recipe = Recipe.objects.create(owner=self.user, title='Stew', price=1)
+        Tag.objects.create(owner=self.user, name='Dinner')
+        url = reverse('admin:core_recipe_change', args=[recipe.id])
+
+        res = self.client.get(url)
+
+        self.assertContains(res, 'admin-autocomplete')
+        self.assertNotContains(res, 'Dinner')
+
+    def test_estimated_count(self):
+        '''Tests if large changelists use the estimate as their count'''
+        queryset = get_user_model().objects.order_by('id')
+        with patch('core.pagination.estimate_count', return_value=10 ** 7):
+            self.assertEqual(
+                EstimatedCountPaginator(queryset, 100).count, 10 ** 7
+            )
+        with patch('core.pagination.estimate_count', return_value=10):
+            self.assertEqual(EstimatedCountPaginator(queryset, 100).count, 2)
@@ -0,0 +1,67 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+BATCH_URL = reverse('batch')
+
+
+class BatchTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'batch@gmail.com', 'batch', 'testpassword'
+        )
+        self.client = APIClient()
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.recipe = Recipe.objects.create(
+            owner=self.user, title='Soup', price=2
+        )
+        Tag.objects.create(owner=self.user, name='Dinner')
+
+    def test_sub_requests(self):
+        '''Tests if the sub-requests run as the user in one round trip'''
+        other = get_user_model().objects.create_user(
+            'other@gmail.com', 'other', 'testpassword'
+        )
+        hidden = Recipe.objects.create(owner=other, title='Hidden', price=1)
+
+        res = self.client.post(BATCH_URL, {'requests': [
+            {'path': reverse('recipe:recipes-detail', args=[self.recipe.pk])},
+            {'path': reverse('recipe:tags-list') + '?assigned=0'},
+            {'path': reverse('user:view_user')},
+            {'path': reverse('recipe:recipes-detail', args=[hidden.pk])},
+            {'path': '/nowhere/'},
+            {'path': BATCH_URL},
+        ]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        codes = [sub['status'] for sub in res.data['responses']]
+        self.assertEqual(codes, [200, 200, 200, 404, 404, 404])
+        bodies = [sub['body'] for sub in res.data['responses']]
+        self.assertEqual(bodies[0]['title'], 'Soup')
+        self.assertEqual(bodies[1][0]['name'], 'Dinner')
+        self.assertEqual(bodies[2]['email'], 'batch@gmail.com')
+
+    def test_only_reads(self):
+        '''Tests if only GET sub-requests are accepted'''
+        res = self.client.post(BATCH_URL, {'requests': [
+            {'method': 'DELETE', 'path': reverse('user:view_user')},
+        ]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(get_user_model().objects.get().is_active)
+
+    def test_authentication_required(self):
+        '''Tests if the batch needs an authenticated user'''
+        res = APIClient().post(BATCH_URL, {'requests': [
+            {'path': reverse('user:view_user')},
+        ]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,128 @@
+import gzip
+import json
+from unittest.mock import patch
+
+import brotli
+import zstandard
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.compression import CODECS, negotiate
+from core.models import Recipe
+
+RECIPE_URL = reverse('recipe:recipes-list')
+EXPORT_URL = reverse('recipe:recipes-export')
+PREFERENCE = ('br', 'zstd', 'gzip')
+
+
+class NegotiationTests(TestCase):
+
+    def test_preference_and_quality(self):
+        '''Tests if the q-values win over the server preference'''
+        self.assertEqual(negotiate('gzip, br', PREFERENCE), 'br')
+        self.assertEqual(negotiate('gzip, br;q=0.5', PREFERENCE), 'gzip')
+        self.assertEqual(negotiate('*', PREFERENCE), 'br')
+        self.assertEqual(negotiate('*, br;q=0', PREFERENCE), 'zstd')
+        self.assertIsNone(negotiate('identity', PREFERENCE))
+        self.assertIsNone(negotiate('', PREFERENCE))
+
+
+class CompressionMiddlewareTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        caches['compression'].clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'compress@gmail.com', 'compress', 'testpassword'
+        )
+        self.client.force_authenticate(self.user)
+        for i in range(50):
+            Recipe.objects.create(
+                owner=self.user, title=f'Recipe number {i}', price=5
+            )
+
+    def tearDown(self):
+        cache.clear()
+        caches['compression'].clear()
+
+    def test_list_compressed(self):
+        '''Tests if the recipe list is sent with the negotiated encoding'''
+        plain = self.client.get(RECIPE_URL)
+
+        res = self.client.get(RECIPE_URL, HTTP_ACCEPT_ENCODING='gzip, br')
+
+        self.assertEqual(res['Content-Encoding'], 'br')
+        self.assertIn('Accept-Encoding', res['Vary'])
+        self.assertEqual(brotli.decompress(res.content), plain.content)
+        self.assertLess(len(res.content), len(plain.content) / 5)
+
+    def test_small_body_not_compressed(self):
+        '''Tests if bodies under the threshold are sent as they are'''
+        Recipe.objects.all().delete()
+
+        res = self.client.get(RECIPE_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+
+    @override_settings(COMPRESSION_LEVELS={'application/json': {'gzip': 1}})
+    def test_levels_per_content_type(self):
+        '''Tests if only the encodings configured for the type are used'''
+        res = self.client.get(RECIPE_URL, HTTP_ACCEPT_ENCODING='br, gzip')
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+
+        res = self.client.get(
+            RECIPE_URL, HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_ACCEPT='application/msgpack',
+        )
+        self.assertFalse(res.has_header('Content-Encoding'))
+
+    def test_html_not_compressed(self):
+        '''Tests if the browsable API pages are sent uncompressed'''
+        res = self.client.get(
+            RECIPE_URL, {'q': 'x'}, HTTP_ACCEPT='text/html',
+            HTTP_ACCEPT_ENCODING='gzip, br',
+        )
+
+        self.assertTrue(res['Content-Type'].startswith('text/html'))
+        self.assertFalse(res.has_header('Content-Encoding'))
+
+    def test_cached_compressed_body(self):
+        '''Tests if an identical body is compressed only once'''
+        codec = CODECS['gzip']
+        with patch.object(codec, 'compress', wraps=codec.compress) as spy:
+            first = self.client.get(RECIPE_URL, HTTP_ACCEPT_ENCODING='gzip')
+            second = self.client.get(RECIPE_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(spy.call_count, 1)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(
+            json.loads(gzip.decompress(second.content))[0]['title'],
+            'Recipe number 49'
+        )
+
+    @override_settings(COMPRESSION_CACHE_MAX_SIZE=1024)
+    def test_large_body_not_cached(self):
+        '''Tests if bodies over the cache limit are not kept'''
+        self.client.get(RECIPE_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertFalse(caches['compression']._cache)
+        self.assertFalse([key for key in cache._cache if 'compressed' in key])
+
+    @override_settings(EXPORT_BATCH_SIZE=20)
+    def test_streamed_export_compressed(self):
+        '''Tests if the export is compressed chunk by chunk'''
+        res = self.client.get(EXPORT_URL, HTTP_ACCEPT_ENCODING='zstd')
+        chunks = list(res.streaming_content)
+
+        self.assertEqual(res['Content-Encoding'], 'zstd')
+        self.assertGreater(len(chunks), 3)
+        body = zstandard.ZstdDecompressor().decompressobj() \
+            .decompress(b''.join(chunks))
+        lines = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(lines), 50)
+        self.assertEqual(lines[0]['title'], 'Recipe number 49')
@@ -0,0 +1,93 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from core.models import Tag, Ingredient, Recipe
+
+
+class RecipeCountTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'counters@gmail.com', 'counter', 'testpassword'
+        )
+        self.tag = Tag.objects.create(owner=self.user, name='Vegan')
+        self.ingredient = Ingredient.objects.create(
+            owner=self.user, name='Salt'
+        )
+        self.recipes = [
+            Recipe.objects.create(owner=self.user, title=str(i), price=5)
+            for i in range(3)
+        ]
+
+    def count(self, obj):
+        obj.refresh_from_db()
+        return obj.recipe_count
+
+    def test_add_and_duplicate_add(self):
+        '''Tests if adding an already linked tag keeps the count'''
+        self.recipes[0].tags.add(self.tag)
+        self.recipes[0].tags.add(self.tag)
+        self.recipes[1].tags.add(self.tag)
+
+        self.assertEqual(self.count(self.tag), 2)
+
+    def test_remove_only_linked(self):
+        '''Tests if removing a tag which is not linked keeps the count'''
+        other = Tag.objects.create(owner=self.user, name='Other')
+        self.recipes[0].tags.add(self.tag)
+
+        self.recipes[1].tags.remove(self.tag)
+        self.recipes[0].tags.remove(self.tag, other)
+
+        self.assertEqual(self.count(self.tag), 0)
+        self.assertEqual(self.count(other), 0)
+
+    def test_reverse_relation(self):
+        '''Tests if the count follows the changes of the reverse side'''
+        self.ingredient.recipe_set.add(*self.recipes)
+        self.assertEqual(self.count(self.ingredient), 3)
+
+        self.ingredient.recipe_set.remove(self.recipes[0])
+        self.assertEqual(self.count(self.ingredient), 2)
+
+        self.ingredient.recipe_set.clear()
+        self.assertEqual(self.count(self.ingredient), 0)
+
+    def test_set_and_clear(self):
+        '''Tests if set and clear keep the count right'''
+        other = Ingredient.objects.create(owner=self.user, name='Pepper')
+        recipe = self.recipes[0]
+        recipe.ingredients.set([self.ingredient])
+        recipe.ingredients.set([other])
+
+        self.assertEqual(self.count(self.ingredient), 0)
+        self.assertEqual(self.count(other), 1)
+
+        recipe.ingredients.clear()
+        self.assertEqual(self.count(other), 0)
+
+    def test_recipe_deleted(self):
+        '''Tests if deleting recipes decrements the counts'''
+        for recipe in self.recipes:
+            recipe.tags.add(self.tag)
+            recipe.ingredients.add(self.ingredient)
+
+        self.recipes[0].delete()
+        Recipe.objects.filter(pk=self.recipes[1].pk).delete()
+
+        self.assertEqual(self.count(self.tag), 1)
+        self.assertEqual(self.count(self.ingredient), 1)
+
+    def test_repair_command(self):
+        '''Tests if the repair command recomputes broken counts'''
+        self.recipes[0].tags.add(self.tag)
+        Tag.objects.update(recipe_count=42)
+        Ingredient.objects.update(recipe_count=7)
+
+        call_command('repair_recipe_counts', stdout=StringIO())
+
+        self.assertEqual(self.count(self.tag), 1)
+        self.assertEqual(self.count(self.ingredient), 0)
@@ -0,0 +1,103 @@
+import os
+import signal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.hashers import ScryptPasswordHasher, PasswordHashingBusy, \
+                         hash_password, pool
+from core.throttling import local_store
+
+USER_DATA = {
+    'email': 'hashing@gmail.com',
+    'password': 'testpassword',
+    'name': 'Hasher',
+}
+
+
+class ScryptHasherTests(TestCase):
+
+    def test_encode_and_verify(self):
+        '''Tests if the scrypt hasher verifies only the right password'''
+        hasher = ScryptPasswordHasher()
+        encoded = hasher.encode('secret', hasher.salt())
+
+        self.assertTrue(encoded.startswith('scrypt$'))
+        self.assertTrue(hasher.verify('secret', encoded))
+        self.assertFalse(hasher.verify('Secret', encoded))
+        self.assertFalse(hasher.must_update(encoded))
+
+    def test_must_update_on_new_work_factor(self):
+        '''Tests if the hash is outdated when the work factor changes'''
+        hasher = ScryptPasswordHasher()
+        encoded = hasher.encode('secret', hasher.salt(), n=2 ** 12)
+
+        self.assertTrue(hasher.must_update(encoded))
+
+
+class PasswordPoolTests(TestCase):
+
+    def setUp(self):
+        local_store.buckets.clear()
+        self.client = APIClient()
+
+    def test_user_password_hashed_in_pool(self):
+        '''Tests if the created user gets a scrypt password'''
+        user = get_user_model().objects.create_user(**USER_DATA)
+
+        self.assertTrue(user.password.startswith('scrypt$'))
+        self.assertTrue(user.check_password(USER_DATA['password']))
+
+    def test_rehash_on_login(self):
+        '''Tests if an outdated hash is upgraded on the login'''
+        user = get_user_model().objects.create_user(**USER_DATA)
+        user.password = make_password(
+            USER_DATA['password'], hasher='pbkdf2_sha256'
+        )
+        user.save()
+
+        res = self.client.post(reverse('user:get_token'), USER_DATA)
+        user.refresh_from_db()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(user.password.startswith('scrypt$'))
+
+    @override_settings(PASSWORD_HASHING_WORKERS=1, PASSWORD_HASHING_QUEUE=0)
+    def test_rejects_when_saturated(self):
+        '''Tests if hashing is rejected when all the slots are taken'''
+        _, slots = pool._configure()
+        slots.acquire()
+        try:
+            with self.assertRaises(PasswordHashingBusy):
+                hash_password('testpassword')
+
+            res = self.client.post(reverse('user:create_user'), USER_DATA)
+        finally:
+            slots.release()
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertTrue(hash_password('testpassword').startswith('scrypt$'))
+
+    def test_pool_processes_spawned(self):
+        '''Tests if the pool processes are spawned rather than forked'''
+        executor, _ = pool._configure()
+
+        self.assertEqual(executor._mp_context.get_start_method(), 'spawn')
+
+    @override_settings(PASSWORD_HASHING_WORKERS=1)
+    def test_recovers_from_killed_worker(self):
+        '''Tests if a pool with a killed worker is replaced'''
+        hash_password('testpassword')
+        executor, _ = pool._configure()
+        for pid in list(executor._processes):
+            os.kill(pid, signal.SIGKILL)
+
+        encoded = hash_password('testpassword')
+
+        self.assertTrue(encoded.startswith('scrypt$'))
+        self.assertIsNot(pool._configure()[0], executor)
@@ -0,0 +1,132 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.parsers import MultiPartParser
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.idempotency import fingerprint
+from core.models import IdempotencyKey, Recipe, Tag
+
+RECIPE_URL = reverse('recipe:recipes-list')
+TAG_URL = reverse('recipe:tags-list')
+PAYLOAD = {'title': 'Soup', 'price': '2.50', 'tags': [], 'ingredients': []}
+
+
+class IdempotencyTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'retry@gmail.com', 'retry', 'testpassword'
+        )
+        self.client.force_authenticate(self.user)
+
+    def post(self, url, payload, key='abc'):
+        return self.client.post(
+            url, payload, format='json', HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_replayed(self):
+        '''Tests if a retry gets the first response without a new recipe'''
+        first = self.post(RECIPE_URL, PAYLOAD)
+
+        with self.assertNumQueries(1):
+            retry = self.post(RECIPE_URL, PAYLOAD)
+
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Recipe.objects.count(), 1)
+        self.post(RECIPE_URL, PAYLOAD, key='other')
+        self.assertEqual(Recipe.objects.count(), 2)
+
+    def test_keys_per_user(self):
+        '''Tests if the same key of another user is a new request'''
+        self.post(TAG_URL, {'name': 'Dinner'})
+        other = get_user_model().objects.create_user(
+            'other@gmail.com', 'other', 'testpassword'
+        )
+        self.client.force_authenticate(other)
+
+        res = self.post(TAG_URL, {'name': 'Dinner'})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Tag.objects.count(), 2)
+
+    def test_reused_for_another_request(self):
+        '''Tests if a key cannot be reused for another request'''
+        self.post(TAG_URL, {'name': 'Dinner'})
+
+        res = self.post(RECIPE_URL, PAYLOAD)
+
+        self.assertEqual(
+            res.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_reused_with_another_body(self):
+        '''Tests if a key cannot be reused for a body of the same length'''
+        self.post(TAG_URL, {'name': 'Dinner'})
+
+        res = self.post(TAG_URL, {'name': 'Brunch'})
+
+        self.assertEqual(
+            res.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+        self.assertEqual(Tag.objects.count(), 1)
+
+    def test_upload_fingerprint(self):
+        '''Tests if uploads of the same size are told apart'''
+        def upload(content):
+            request = APIRequestFactory().post('/', {
+                'image': SimpleUploadedFile('photo.jpg', content),
+            }, format='multipart')
+            return fingerprint(Request(request, parsers=[MultiPartParser()]))
+
+        self.assertEqual(upload(b'jpeg one'), upload(b'jpeg one'))
+        self.assertNotEqual(upload(b'jpeg one'), upload(b'jpeg two'))
+
+    @override_settings(IDEMPOTENCY_WAIT_TIMEOUT=0.2)
+    def test_in_flight(self):
+        '''Tests if a duplicate of a request in flight waits and gives up'''
+        self.post(RECIPE_URL, PAYLOAD)
+        IdempotencyKey.objects.update(status_code=None, body=None)
+
+        res = self.post(RECIPE_URL, PAYLOAD)
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_server_error_released(self):
+        '''Tests if a failed request can be retried with its key'''
+        with patch('recipe.views.RecipeViewSet.perform_create',
+                   side_effect=RuntimeError):
+            self.client.raise_request_exception = False
+            res = self.post(RECIPE_URL, PAYLOAD)
+            self.client.raise_request_exception = True
+        self.assertEqual(res.status_code, 500)
+
+        res = self.post(RECIPE_URL, PAYLOAD)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_expired(self):
+        '''Tests if an expired key runs the request again'''
+        self.post(RECIPE_URL, PAYLOAD)
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+
+        self.post(RECIPE_URL, PAYLOAD)
+
+        self.assertEqual(Recipe.objects.count(), 2)
+        self.assertGreater(
+            IdempotencyKey.objects.get().expires_at,
+            timezone.now() + timedelta(hours=23)
+        )
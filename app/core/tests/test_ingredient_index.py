@@ -0,0 +1,124 @@
+import random
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase
+
+from core.changes import record_changes
+from core.ingredient_index import IngredientBitmapIndex, registry
+from core.models import Ingredient, Recipe
+
+
+def brute_force(recipes, have, max_missing):
+    results = []
+    for recipe_id, ingredients in recipes.items():
+        covered = len(ingredients & have)
+        if ingredients and len(ingredients) - covered <= max_missing:
+            results.append((recipe_id, covered, len(ingredients)))
+    results.sort(key=lambda r: (-r[1] / r[2], r[2] - r[1], -r[0]))
+    return results
+
+
+class BitmapIndexTests(TestCase):
+
+    def setUp(self):
+        self.index = IngredientBitmapIndex([
+            (1, 10), (1, 11),
+            (2, 10), (2, 12),
+            (3, 10), (3, 11), (3, 12), (3, 13),
+        ])
+
+    def test_full_coverage(self):
+        '''Tests if only the fully covered recipes are returned'''
+        self.assertEqual(self.index.search([10, 11]), [(1, 2, 2)])
+
+    def test_missing_ranked_by_coverage(self):
+        '''Tests if recipes missing ingredients are ranked by coverage'''
+        self.assertEqual(
+            self.index.search([10, 11], max_missing=2),
+            [(1, 2, 2), (2, 1, 2), (3, 2, 4)]
+        )
+
+    def test_incremental_updates(self):
+        '''Tests if the index follows added, removed and deleted links'''
+        self.index.add(4, [20])
+        self.index.remove(1, [11])
+        self.index.discard_recipe(2)
+
+        self.assertEqual(self.index.search([10, 20]), [(4, 1, 1), (1, 1, 1)])
+
+    def test_matches_brute_force(self):
+        '''Tests the index against the exact computation on random data'''
+        rng = random.Random(7)
+        recipes = {
+            recipe_id: set(rng.sample(range(40), rng.randint(0, 12)))
+            for recipe_id in range(1, 300)
+        }
+        index = IngredientBitmapIndex(
+            (recipe_id, ingredient_id)
+            for recipe_id, ingredients in recipes.items()
+            for ingredient_id in ingredients
+        )
+        for recipe_id in range(1, 300, 7):
+            added = set(rng.sample(range(40), 3))
+            removed = set(rng.sample(range(40), 3))
+            index.add(recipe_id, added)
+            index.remove(recipe_id, removed)
+            recipes[recipe_id] = (recipes[recipe_id] | added) - removed
+
+        for max_missing in range(4):
+            have = set(rng.sample(range(40), 20))
+            self.assertEqual(
+                index.search(have, max_missing),
+                brute_force(recipes, have, max_missing)
+            )
+
+
+class IndexMaintenanceTests(TransactionTestCase):
+
+    def setUp(self):
+        registry.clear()
+        self.user = get_user_model().objects.create_user(
+            'index@gmail.com', 'index', 'testpassword'
+        )
+        self.salt = Ingredient.objects.create(owner=self.user, name='Salt')
+        self.egg = Ingredient.objects.create(owner=self.user, name='Egg')
+        self.recipe = Recipe.objects.create(
+            owner=self.user, title='Omelette', price=3
+        )
+
+    def tearDown(self):
+        registry.clear()
+
+    def test_committed_changes_applied(self):
+        '''Tests if the loaded index follows the committed changes'''
+        index = registry.get(self.user.pk)
+        self.recipe.ingredients.add(self.salt, self.egg)
+
+        self.assertEqual(
+            index.search([self.salt.pk, self.egg.pk]),
+            [(self.recipe.pk, 2, 2)]
+        )
+
+        self.recipe.ingredients.remove(self.egg)
+        self.assertEqual(
+            index.search([self.salt.pk]), [(self.recipe.pk, 1, 1)]
+        )
+
+        self.recipe.delete()
+        self.assertEqual(index.search([self.salt.pk]), [])
+
+    def test_change_in_other_process_rebuilds(self):
+        '''Tests if a change committed by another worker is picked up'''
+        self.assertEqual(registry.get(self.user.pk).search([self.salt.pk]), [])
+
+        Recipe.ingredients.through.objects.bulk_create([
+            Recipe.ingredients.through(
+                recipe_id=self.recipe.pk, ingredient_id=self.salt.pk
+            ),
+        ])
+        record_changes(self.user.pk, 'recipe', [self.recipe.pk])
+
+        self.assertEqual(
+            registry.get(self.user.pk).search([self.salt.pk]),
+            [(self.recipe.pk, 1, 1)]
+        )
@@ -0,0 +1,138 @@
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from core import jobs
+from core.jobs import Worker, claim, enqueue, execute, task
+from core.models import Job, Recipe
+from core.purge import request_deletion
+
+calls = []
+
+
+@task('tests.record')
+def record(value):
+    calls.append(value)
+
+
+@task('tests.fail', max_attempts=2)
+def fail():
+    raise ValueError('broken')
+
+
+@task('tests.sleep')
+def sleep(seconds):
+    time.sleep(seconds)
+
+
+class JobTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_claim_by_priority(self):
+        '''Tests if the jobs of higher priority are claimed first'''
+        enqueue('tests.record', {'value': 'low'})
+        enqueue('tests.record', {'value': 'high'}, priority=5)
+        enqueue('tests.record', {'value': 'later'}, priority=9, delay=60)
+
+        jobs = claim('worker', 1)
+
+        self.assertEqual(len(jobs), 1)
+        job = Job.objects.get(pk=jobs[0].pk)
+        self.assertEqual(job.kwargs, '{"value": "high"}')
+        self.assertEqual((job.status, job.attempts), (Job.RUNNING, 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertEqual(len(claim('worker', 5)), 1)
+
+    def test_execute(self):
+        '''Tests if a job is run with its arguments and then deleted'''
+        record.delay(value=3)
+
+        for job in claim('worker', 5):
+            self.assertTrue(execute(job))
+
+        self.assertEqual(calls, [3])
+        self.assertFalse(Job.objects.exists())
+
+    def test_retry_then_fail(self):
+        '''Tests if a failed job is retried later until it has no attempts'''
+        job = enqueue('tests.fail')
+
+        self.assertFalse(execute(claim('worker', 1)[0]))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('ValueError: broken', job.last_error)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertEqual(claim('worker', 1), [])
+
+        Job.objects.update(run_at=timezone.now())
+        execute(claim('worker', 1)[0])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_visibility_timeout(self):
+        '''Tests if a job of a lost worker is claimed again'''
+        enqueue('tests.record', {'value': 1})
+        lost = claim('lost', 1)[0]
+        self.assertEqual(claim('other', 1), [])
+
+        Job.objects.update(run_at=timezone.now() - timedelta(seconds=1))
+        job = claim('other', 1)[0]
+        execute(lost)
+
+        self.assertTrue(Job.objects.filter(pk=job.pk).exists())
+        execute(job)
+        self.assertFalse(Job.objects.exists())
+        self.assertEqual(calls, [1, 1])
+
+    def test_unknown_task_failed(self):
+        '''Tests if a job of an unknown task fails without blocking others'''
+        renamed = Job.objects.create(
+            task='tests.renamed', kwargs='{}', max_attempts=1
+        )
+        enqueue('tests.record', {'value': 1})
+
+        jobs = claim('worker', 2)
+
+        self.assertEqual([job.task for job in jobs], ['tests.record'])
+        renamed.refresh_from_db()
+        self.assertEqual(renamed.status, Job.FAILED)
+        self.assertEqual(renamed.last_error, 'Unknown task tests.renamed')
+
+
+class WorkerTests(TransactionTestCase):
+
+    def test_run_worker_purges(self):
+        '''Tests if the worker runs the purge queued by account deletion'''
+        user = get_user_model().objects.create_user(
+            'leaving@gmail.com', 'name', 'testpassword'
+        )
+        Recipe.objects.create(owner=user, title='Soup', price=2)
+        request_deletion(user)
+        output = StringIO()
+
+        call_command(
+            'run_worker', '--burst', '--concurrency', '1', stdout=output
+        )
+
+        self.assertIn('stopped after 1 jobs', output.getvalue())
+        self.assertFalse(get_user_model().objects.exists())
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(Job.objects.exists())
+
+    def test_saturated_worker_waits(self):
+        '''Tests if a worker with no free slot blocks instead of polling'''
+        enqueue('tests.sleep', {'seconds': 0.5})
+        worker = Worker(1, poll_interval=0.1)
+
+        with patch('core.jobs.wait', wraps=jobs.wait) as wait:
+            self.assertEqual(worker.run(burst=True), 1)
+
+        self.assertLess(wait.call_count, 10)
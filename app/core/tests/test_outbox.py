@@ -0,0 +1,216 @@
+import io
+import json
+import os
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import OutboxEvent, Recipe, Tag
+from core.outbox import Dispatcher, FileSink, SinkBusy, WebhookReceiver, \
+                        WebhookSink, claim_batch, dispatch_batch, record
+
+
+class RecordingSink:
+
+    def __init__(self, error=None):
+        self.batches = []
+        self.error = error
+
+    def deliver(self, events):
+        if self.error is not None:
+            raise self.error
+        self.batches.append(events)
+
+
+class OutboxRecordTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'outbox@gmail.com', 'outbox', 'testpassword'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_recipe_writes_recorded(self):
+        '''Tests if creating, updating and deleting a recipe record events'''
+        tag = Tag.objects.create(owner=self.user, name='Quick')
+        res = self.client.post(
+            reverse('recipe:recipes-list'),
+            {'title': 'Toast', 'price': 2, 'tags': [tag.pk],
+             'ingredients': []},
+            format='json'
+        )
+        detail = reverse('recipe:recipes-detail', args=[res.data['id']])
+        self.client.patch(detail, {'title': 'French toast'})
+        self.client.delete(detail)
+
+        events = OutboxEvent.objects.order_by('id')
+        self.assertEqual(
+            [event.topic for event in events],
+            ['recipe.created', 'recipe.updated', 'recipe.deleted']
+        )
+        self.assertEqual(
+            json.loads(events[0].payload)['tags'], [tag.pk]
+        )
+        self.assertEqual(events[2].object_id, res.data['id'])
+
+    def test_invalid_write_not_recorded(self):
+        '''Tests if a rejected write does not record an event'''
+        res = self.client.post(
+            reverse('recipe:recipes-list'), {'title': 'Nothing'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_links_recorded_per_recipe(self):
+        '''Tests if a bulk link change records one event per recipe'''
+        tag = Tag.objects.create(owner=self.user, name='Quick')
+        recipes = [
+            Recipe.objects.create(owner=self.user, title=str(i), price=1)
+            for i in range(3)
+        ]
+
+        self.client.post(
+            reverse('recipe:recipes-bulk-links', args=['tags', 'add']),
+            {'recipes': [r.pk for r in recipes], 'ids': [tag.pk]},
+            format='json'
+        )
+
+        events = OutboxEvent.objects.filter(topic='recipe.tags_added')
+        self.assertCountEqual(
+            [event.object_id for event in events], [r.pk for r in recipes]
+        )
+
+
+class DispatchTests(TestCase):
+
+    def setUp(self):
+        for i in range(5):
+            record('recipe.created', 1, i, {'id': i})
+
+    def test_delivered_in_order_and_deleted(self):
+        '''Tests if the events reach every sink in order and are deleted'''
+        first, second = RecordingSink(), RecordingSink()
+
+        self.assertEqual(dispatch_batch([first, second], 3), 3)
+        self.assertEqual(dispatch_batch([first, second], 3), 2)
+
+        delivered = [e['object_id'] for batch in first.batches for e in batch]
+        self.assertEqual(delivered, [0, 1, 2, 3, 4])
+        self.assertEqual(first.batches, second.batches)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_failed_batch_rescheduled(self):
+        '''Tests if a failing batch is kept and retried later'''
+        sink = RecordingSink(error=OSError('disk full'))
+
+        self.assertEqual(dispatch_batch([sink], 10), 0)
+
+        self.assertEqual(OutboxEvent.objects.filter(attempts=1).count(), 5)
+        self.assertIn('disk full', OutboxEvent.objects.first().last_error)
+        self.assertEqual(dispatch_batch([RecordingSink()], 10), 0)
+
+    def test_failed_event_holds_back_its_owner(self):
+        '''Tests if the later events of an owner wait for a failed one'''
+        dispatch_batch([RecordingSink(error=OSError('down'))], 1)
+        record('recipe.created', 2, 10, {'id': 10})
+        sink = RecordingSink()
+
+        self.assertEqual(dispatch_batch([sink], 10), 1)
+
+        self.assertEqual(sink.batches[0][0]['owner_id'], 2)
+        self.assertEqual(OutboxEvent.objects.count(), 5)
+
+    def test_claimed_event_holds_back_its_owner(self):
+        '''Tests if a dispatcher skips the owner of a claimed batch'''
+        claimed = claim_batch(2)
+        sink = RecordingSink()
+
+        self.assertEqual([e.object_id for e in claimed], [0, 1])
+        self.assertEqual(dispatch_batch([sink], 10), 0)
+
+    def test_busy_sink_slows_down(self):
+        '''Tests if backpressure keeps the events and halves the batch'''
+        sleeps = []
+        sink = RecordingSink(error=SinkBusy(retry_after=3))
+        dispatcher = Dispatcher([sink], 4, 1, sleep=sleeps.append)
+
+        self.assertEqual(dispatcher.step(), 0)
+
+        self.assertEqual(sleeps, [3])
+        self.assertEqual(dispatcher.batch_size, 2)
+        self.assertEqual(OutboxEvent.objects.filter(attempts=0).count(), 5)
+
+        sink.error = None
+        self.assertEqual(dispatcher.run(once=True), 5)
+        self.assertEqual([len(b) for b in sink.batches], [2, 3])
+
+    def test_file_sink(self):
+        '''Tests if the file sink appends the events as JSON lines'''
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'outbox', 'events.jsonl')
+            dispatch_batch([FileSink(path)], 10)
+
+            with open(path) as events:
+                lines = [json.loads(line) for line in events]
+
+        self.assertEqual([e['payload']['id'] for e in lines], list(range(5)))
+
+
+class DispatchTransactionTests(TransactionTestCase):
+
+    def test_sinks_called_outside_transaction(self):
+        '''Tests if no row locks are held while the sinks deliver'''
+        record('recipe.created', 1, 1, {'id': 1})
+        in_transaction = []
+
+        class Sink:
+            def deliver(self, events):
+                in_transaction.append(connection.in_atomic_block)
+
+        self.assertEqual(dispatch_batch([Sink()], 10), 1)
+        self.assertEqual(in_transaction, [False])
+
+
+class WebhookTests(TestCase):
+
+    def start_receiver(self, rate=None):
+        output = io.StringIO()
+        handler = type('Receiver', (WebhookReceiver, ), {
+            'output': output, 'rate': rate, 'allowance': rate or 0,
+        })
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return f'http://127.0.0.1:{server.server_port}/', output
+
+    def test_delivered_to_receiver(self):
+        '''Tests if the webhook sink posts the events to the receiver'''
+        url, output = self.start_receiver()
+
+        WebhookSink(url).deliver([{'id': 1}, {'id': 2}])
+
+        self.assertEqual(
+            [json.loads(line) for line in output.getvalue().splitlines()],
+            [{'id': 1}, {'id': 2}]
+        )
+
+    def test_rate_limited_receiver(self):
+        '''Tests if a 429 from the receiver is raised as backpressure'''
+        url, output = self.start_receiver(rate=1)
+
+        with self.assertRaises(SinkBusy) as busy:
+            WebhookSink(url).deliver([{'id': 1}, {'id': 2}])
+
+        self.assertEqual(busy.exception.retry_after, 1)
+        self.assertEqual(output.getvalue(), '')
@@ -0,0 +1,70 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.paginator import EmptyPage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.pagination import EstimatedCountPaginator
+
+RECIPE_URL = reverse('recipe:recipes-list')
+
+
+class EstimatedPaginationTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'pages@gmail.com', 'pages', 'testpassword'
+        )
+        self.client.force_authenticate(self.user)
+        for i in range(7):
+            Recipe.objects.create(owner=self.user, title=str(i), price=1)
+
+    def test_unpaginated_by_default(self):
+        '''Tests if the list stays a plain list without page parameters'''
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(len(res.data), 7)
+
+    def test_exact_count(self):
+        '''Tests if small result sets are counted exactly'''
+        res = self.client.get(RECIPE_URL, {'page_size': 3, 'page': 3})
+
+        self.assertEqual(res.data['count'], 7)
+        self.assertFalse(res.data['count_is_estimate'])
+        self.assertEqual([r['title'] for r in res.data['results']], ['0'])
+        self.assertIsNone(res.data['next'])
+
+    @override_settings(PAGE_SIZE=4)
+    def test_estimated_count(self):
+        '''Tests if large result sets use the estimate and no COUNT(*)'''
+        with patch('core.pagination.estimate_count', return_value=10 ** 6):
+            first = self.client.get(RECIPE_URL, {'page': 1})
+            last = self.client.get(RECIPE_URL, {'page': 2})
+            beyond = self.client.get(RECIPE_URL, {'page': 3})
+
+        self.assertEqual(first.data['count'], 10 ** 6)
+        self.assertTrue(first.data['count_is_estimate'])
+        self.assertEqual(len(first.data['results']), 4)
+        self.assertIn('page=2', first.data['next'])
+        self.assertEqual(len(last.data['results']), 3)
+        self.assertIsNone(last.data['next'])
+        self.assertEqual(beyond.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_paginator_pages(self):
+        '''Tests if estimated pages read one extra row to find the end'''
+        queryset = Recipe.objects.order_by('id')
+        with patch('core.pagination.estimate_count', return_value=10 ** 6):
+            paginator = EstimatedCountPaginator(queryset, 5)
+            with self.assertNumQueries(1):
+                page = paginator.page(2)
+
+        self.assertEqual(len(page), 2)
+        self.assertFalse(page.has_next())
+        with self.assertRaises(EmptyPage):
+            paginator.page(0)
@@ -0,0 +1,98 @@
+from contextlib import contextmanager
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase
+
+from core.models import Recipe
+from core.partitioning import RECIPE_TABLES, TablePartitioner, \
+    partition_recipes
+
+INDEXES = [
+    ('core_recipe_pkey', 'CREATE UNIQUE INDEX core_recipe_pkey '
+     'ON public.core_recipe USING btree (id)', True),
+    ('core_recipe_owner_i_577536_idx', 'CREATE INDEX '
+     'core_recipe_owner_i_577536_idx ON public.core_recipe '
+     'USING btree (owner_id, price, title, id)', False),
+]
+FOREIGN_KEYS = [
+    ('core_recipe', 'core_recipe_owner_id_fk_core_user_id',
+     'FOREIGN KEY (owner_id) REFERENCES core_user(id) '
+     'DEFERRABLE INITIALLY DEFERRED'),
+]
+
+
+class FakeCursor:
+
+    def __init__(self, statements):
+        self.statements = statements
+        self.description = None
+        self.rows = []
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+        self.description = None
+        if 'pg_get_indexdef' in sql:
+            self.rows, self.description = INDEXES, True
+        elif 'pg_get_constraintdef' in sql:
+            self.rows, self.description = FOREIGN_KEYS, True
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeConnection:
+    vendor = 'postgresql'
+    ops = connection.ops
+
+    def __init__(self):
+        self.statements = []
+
+    @contextmanager
+    def cursor(self):
+        yield FakeCursor(self.statements)
+
+
+class PartitioningTests(SimpleTestCase):
+
+    def test_partitioned_copy(self):
+        '''Tests if the copy is partitioned with the indexes of the table'''
+        fake = FakeConnection()
+        partitioner = TablePartitioner(fake, 'core_recipe', 'owner_id', 4,
+                                       1000)
+
+        partitioner.create()
+
+        statements = '\n'.join(fake.statements)
+        self.assertIn('PARTITION BY HASH ("owner_id")', statements)
+        self.assertEqual(statements.count('FOR VALUES WITH (MODULUS 4'), 4)
+        self.assertIn('PRIMARY KEY ("owner_id", "id")', statements)
+        self.assertIn(
+            'ON "core_recipe_partitioned" USING btree '
+            '(owner_id, price, title, id)', statements
+        )
+        self.assertIn('REFERENCES core_user(id)', statements)
+        self.assertEqual(
+            [name for _, name in partitioner.renames],
+            ['core_recipe_pkey', 'core_recipe_owner_i_577536_idx',
+             'core_recipe_owner_id_fk_core_user_id']
+        )
+
+    def test_command_needs_postgresql(self):
+        '''Tests if the command refuses to run on other databases'''
+        with self.assertRaises(CommandError):
+            call_command('partition_recipes')
+
+    def test_needs_postgresql(self):
+        '''Tests if other databases are rejected with a ValueError'''
+        with self.assertRaises(ValueError):
+            partition_recipes(connection, 4, 1000)
+
+    def test_recipe_tables(self):
+        '''Tests if the table names match the current models'''
+        self.assertEqual([table for table, _ in RECIPE_TABLES], [
+            Recipe._meta.db_table,
+            Recipe.tags.through._meta.db_table,
+            Recipe.ingredients.through._meta.db_table,
+        ])
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import time
+from unittest.mock import patch
+
+from django.http import HttpResponse
+from django.test import TestCase, RequestFactory, override_settings
+from django.urls import ResolverMatch
+
+from core.profiling import SamplingProfilerMiddleware, make_profile_token, \
+                           rotate_profiles
+
+
+def busy_view(request):
+    end = time.monotonic() + 0.05
+    while time.monotonic() < end:
+        pass
+    return HttpResponse('ok')
+
+
+class ProfilingTests(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.factory = RequestFactory()
+        self.middleware = SamplingProfilerMiddleware(busy_view)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_request(self, **headers):
+        request = self.factory.get('/', **headers)
+        with override_settings(PROFILING_DIR=self.tmp.name,
+                               PROFILING_INTERVAL=0.001):
+            request.resolver_match = ResolverMatch(busy_view, (), {})
+            return self.middleware(request)
+
+    def test_signed_header_profiles_request(self):
+        '''Tests if a request with a signed token writes collapsed stacks'''
+        res = self.run_request(HTTP_X_PROFILE_TOKEN=make_profile_token())
+
+        directory = os.path.join(self.tmp.name, 'busy_view')
+        files = os.listdir(directory)
+        with open(os.path.join(directory, files[0])) as file:
+            line = file.readline()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(files), 1)
+        self.assertIn('busy_view', line)
+        self.assertTrue(line.rsplit(' ', 1)[1].strip().isdigit())
+
+    def test_write_error_keeps_response(self):
+        '''Tests if a profile that cannot be written is only logged'''
+        with patch('core.profiling.os.makedirs', side_effect=PermissionError):
+            with self.assertLogs('core.profiling', 'ERROR'):
+                res = self.run_request(
+                    HTTP_X_PROFILE_TOKEN=make_profile_token()
+                )
+
+        self.assertEqual(res.status_code, 200)
+
+    def test_forged_header_not_profiled(self):
+        '''Tests that a request with a forged token is not profiled'''
+        self.run_request(HTTP_X_PROFILE_TOKEN='profile:forged:token')
+
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_rotation_keeps_newest_files(self):
+        '''Tests if the rotation removes the oldest profiles'''
+        for i in range(5):
+            path = os.path.join(self.tmp.name, f'{i}.folded')
+            with open(path, 'w') as file:
+                file.write('a;b 1\n')
+            os.utime(path, (i, i))
+
+        with override_settings(PROFILING_DIR=self.tmp.name):
+            rotate_profiles(self.tmp.name, 3, 1024)
+
+        self.assertEqual(
+            sorted(os.listdir(self.tmp.name)),
+            ['2.folded', '3.folded', '4.folded']
+        )
@@ -0,0 +1,121 @@
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Change, Tag, Ingredient, Recipe, OutboxEvent, \
+                        UserPurge
+from core.purge import Purger, claim, request_deletion
+
+PROFILE_URL = reverse('user:view_user')
+
+
+def create_user(email):
+    return get_user_model().objects.create_user(email, 'name', 'testpassword')
+
+
+class AccountDeletionTests(TestCase):
+
+    def test_delete_deactivates(self):
+        '''Tests if deleting the account deactivates it at once'''
+        user = create_user('leaving@gmail.com')
+        token = Token.objects.create(user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        res = client.delete(PROFILE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        user.refresh_from_db()
+        self.assertFalse(user.is_active)
+        self.assertFalse(Token.objects.exists())
+        self.assertEqual(UserPurge.objects.get().user_id, user.pk)
+        self.assertTrue(OutboxEvent.objects.filter(topic='user.deleted'))
+        res = client.get(PROFILE_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PurgeTests(TestCase):
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        override = override_settings(MEDIA_ROOT=self.media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(self.media.cleanup)
+
+        self.user = create_user('purged@gmail.com')
+        self.other = create_user('staying@gmail.com')
+        for owner in (self.user, self.other):
+            tags = [
+                Tag.objects.create(owner=owner, name=str(i))
+                for i in range(3)
+            ]
+            salt = Ingredient.objects.create(owner=owner, name='Salt')
+            for i in range(5):
+                recipe = Recipe.objects.create(
+                    owner=owner, title=str(i), price=2
+                )
+                recipe.tags.add(*tags)
+                recipe.ingredients.add(salt)
+        self.recipe = Recipe.objects.filter(owner=self.user).first()
+        self.recipe.image.save('photo.jpg', ContentFile(b'jpeg'))
+
+    def test_purged_in_batches(self):
+        '''Tests if all the data of the user is deleted batch by batch'''
+        image = self.recipe.image.name
+        reports = []
+        purge = request_deletion(self.user)
+
+        purge = Purger(purge, 2, progress=reports.append).run()
+
+        self.assertFalse(
+            get_user_model().objects.filter(pk=self.user.pk).exists()
+        )
+        for model in (Recipe, Tag, Ingredient, Change):
+            self.assertFalse(model.objects.filter(owner=self.user.pk))
+            self.assertTrue(model.objects.filter(owner=self.other))
+        self.assertEqual(
+            Recipe.tags.through.objects.count(), 15
+        )
+        self.assertFalse(default_storage.exists(image))
+        self.assertEqual(
+            (purge.recipes, purge.tags, purge.ingredients, purge.images),
+            (5, 3, 1, 1)
+        )
+        self.assertIsNotNone(purge.finished_at)
+        self.assertGreater(len(reports), 5)
+
+    def test_command(self):
+        '''Tests if the command purges the pending users'''
+        request_deletion(self.user)
+        output = StringIO()
+
+        call_command('purge_users', '--once', '--pause', '0', stdout=output)
+
+        self.assertIn('Purged purged@gmail.com', output.getvalue())
+        self.assertEqual(get_user_model().objects.count(), 1)
+
+    def test_claimed_once(self):
+        '''Tests if a purge held by one runner is skipped by the others'''
+        purge = request_deletion(self.user)
+
+        self.assertEqual(claim(purge.pk), purge)
+        self.assertIsNone(claim(purge.pk))
+        self.assertIsNone(claim())
+        output = StringIO()
+        call_command('purge_users', '--once', stdout=output)
+        self.assertEqual(output.getvalue(), '')
+
+        UserPurge.objects.update(claimed_until=timezone.now())
+        self.assertEqual(claim(), purge)
@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase
+
+from core.ingredient_index import registry
+from core.models import Tag, Ingredient, Recipe
+from core.relations import change_links
+from core.similarity import registry as similarity_registry
+
+
+class ChangeLinksTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'links@gmail.com', 'links', 'testpassword'
+        )
+        self.other = get_user_model().objects.create_user(
+            'other@gmail.com', 'other', 'testpassword'
+        )
+        self.recipe = Recipe.objects.create(
+            owner=self.user, title='Soup', price=4
+        )
+        self.tag = Tag.objects.create(owner=self.user, name='Warm')
+
+    def test_returns_changed_links(self):
+        '''Tests if only the inserted and deleted links are returned'''
+        links = change_links(
+            'tags', 'add', self.user.pk, [self.recipe.pk], [self.tag.pk]
+        )
+        self.assertEqual(links, [(self.recipe.pk, self.tag.pk)])
+        self.assertEqual(change_links(
+            'tags', 'add', self.user.pk, [self.recipe.pk], [self.tag.pk]
+        ), [])
+
+        links = change_links(
+            'tags', 'remove', self.user.pk, [self.recipe.pk], [self.tag.pk]
+        )
+        self.assertEqual(links, [(self.recipe.pk, self.tag.pk)])
+        self.assertFalse(self.recipe.tags.exists())
+
+    def test_other_owner_ignored(self):
+        '''Tests if the rows of another owner are never linked'''
+        foreign = Tag.objects.create(owner=self.other, name='Cold')
+
+        links = change_links(
+            'tags', 'add', self.user.pk, [self.recipe.pk], [foreign.pk]
+        )
+
+        self.assertEqual(links, [])
+        self.assertFalse(self.recipe.tags.exists())
+
+
+class LinksIndexMaintenanceTests(TransactionTestCase):
+
+    def setUp(self):
+        registry.clear()
+        similarity_registry.clear()
+        self.user = get_user_model().objects.create_user(
+            'links@gmail.com', 'links', 'testpassword'
+        )
+        self.salt = Ingredient.objects.create(owner=self.user, name='Salt')
+        self.recipes = [
+            Recipe.objects.create(owner=self.user, title=str(i), price=2)
+            for i in range(3)
+        ]
+        self.recipe_ids = [recipe.pk for recipe in self.recipes]
+
+    def tearDown(self):
+        registry.clear()
+        similarity_registry.clear()
+
+    def test_loaded_indexes_follow(self):
+        '''Tests if the loaded indexes follow the set-based changes'''
+        index = registry.get(self.user.pk)
+        similar = similarity_registry.get(self.user.pk)
+
+        change_links(
+            'ingredients', 'add', self.user.pk, self.recipe_ids,
+            [self.salt.pk]
+        )
+        self.assertEqual(len(index.search([self.salt.pk])), 3)
+        self.assertEqual(len(similar.similar(self.recipe_ids[0], 5)), 2)
+
+        change_links(
+            'ingredients', 'remove', self.user.pk, self.recipe_ids[1:],
+            [self.salt.pk]
+        )
+        self.assertEqual(
+            index.search([self.salt.pk]), [(self.recipe_ids[0], 1, 1)]
+        )
+        self.assertEqual(similar.similar(self.recipe_ids[0], 5), [])
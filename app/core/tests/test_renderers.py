@@ -0,0 +1,108 @@
+import datetime
+import io
+import json
+import uuid
+from decimal import Decimal
+
+import msgpack
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from core.parsers import ORJSONParser, MessagePackParser
+from core.renderers import ORJSONRenderer
+
+RECIPE_URL = reverse('recipe:recipes-list')
+
+PAYLOAD = {
+    'id': 1,
+    'title': 'Cr\u00e8me br\u00fbl\u00e9e \u2028 \u2029 "quoted" </script>',
+    'price': Decimal('12.50'),
+    'coverage': 2 / 3,
+    'ratio': 0.0,
+    'created': timezone.make_aware(
+        datetime.datetime(2020, 6, 16, 12, 30, 15, 123456),
+        timezone.utc,
+    ),
+    'day': datetime.date(2020, 6, 16),
+    'uuid': uuid.UUID('12345678123456781234567812345678'),
+    'tags': (1, 2, 3),
+    'nested': [{'empty': None, 'flag': True}, []],
+    7: 'int key',
+}
+
+
+class ORJSONTests(TestCase):
+
+    def test_same_bytes_as_drf(self):
+        '''Tests if the output is byte-identical to the DRF renderer'''
+        self.assertEqual(
+            ORJSONRenderer().render(PAYLOAD), JSONRenderer().render(PAYLOAD)
+        )
+
+    def test_indent_rendered_by_drf(self):
+        '''Tests if indented output is still supported'''
+        media_type = 'application/json; indent=2'
+        self.assertEqual(
+            ORJSONRenderer().render(PAYLOAD, media_type),
+            JSONRenderer().render(PAYLOAD, media_type)
+        )
+
+    def test_parser_same_data(self):
+        '''Tests if the parser returns the same data as the DRF parser'''
+        body = JSONRenderer().render(PAYLOAD)
+
+        self.assertEqual(
+            ORJSONParser().parse(io.BytesIO(body)),
+            JSONParser().parse(io.BytesIO(body))
+        )
+
+    def test_parser_rejects_invalid(self):
+        '''Tests if invalid JSON and NaN raise a parse error'''
+        for body in (b'{"price": NaN}', b'{"price": '):
+            with self.assertRaises(ParseError):
+                ORJSONParser().parse(io.BytesIO(body))
+
+    def test_msgpack_parser_rejects_invalid(self):
+        with self.assertRaises(ParseError):
+            MessagePackParser().parse(io.BytesIO(b'\xc1'))
+
+
+class ContentNegotiationTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'msgpack@gmail.com', 'msgpack', 'testpassword'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(owner=self.user, name='Dinner')
+
+    def test_msgpack_round_trip(self):
+        '''Tests if recipes are created and listed as MessagePack'''
+        body = msgpack.packb({
+            'title': 'Risotto', 'price': '9.99',
+            'tags': [self.tag.pk], 'ingredients': [],
+        })
+
+        res = self.client.post(
+            RECIPE_URL, body, content_type='application/msgpack',
+            HTTP_ACCEPT='application/msgpack',
+        )
+
+        self.assertEqual(res['Content-Type'], 'application/msgpack')
+        created = msgpack.unpackb(res.content)
+        self.assertEqual(created['price'], '9.99')
+        self.assertEqual(Recipe.objects.get().price, Decimal('9.99'))
+
+        res = self.client.get(RECIPE_URL, HTTP_ACCEPT='application/msgpack')
+        listed = msgpack.unpackb(res.content)
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(listed, json.loads(res.content))
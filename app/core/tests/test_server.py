@@ -0,0 +1,114 @@
+import http.client
+import os
+import signal
+import socket
+import tempfile
+import threading
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+
+from core.server import Arbiter, Worker, warm_serializers, warm_urls, \
+    worker_count
+
+
+def listen():
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(8)
+    listener.setblocking(False)
+    return listener
+
+
+def get(listener, path='/'):
+    connection = http.client.HTTPConnection(*listener.getsockname())
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+class ServerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.listener = listen()
+
+    def tearDown(self):
+        self.listener.close()
+
+    def serve(self, application, max_requests):
+        worker = Worker(self.listener, application, max_requests, 5)
+        thread = threading.Thread(target=worker.run)
+        thread.start()
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(worker.stop)
+        return worker, thread
+
+    def test_worker_stops_after_max_requests(self):
+        '''Tests if a worker exits once it served max_requests'''
+        def application(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [environ['PATH_INFO'].encode()]
+
+        worker, thread = self.serve(application, 2)
+
+        self.assertEqual(get(self.listener, '/one'), (200, b'/one'))
+        self.assertEqual(get(self.listener, '/two'), (200, b'/two'))
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(worker.server.served, 2)
+
+    def test_file_sent_with_sendfile(self):
+        '''Tests if a wrapped file is sent whole'''
+        body = b'0123456789' * 100000
+        with tempfile.TemporaryFile() as f:
+            f.write(body)
+            f.seek(0)
+
+            def application(environ, start_response):
+                start_response('200 OK', [
+                    ('Content-Length', str(len(body))),
+                ])
+                return environ['wsgi.file_wrapper'](f)
+
+            self.serve(application, 1)
+
+            self.assertEqual(get(self.listener), (200, body))
+
+    def test_warm_up(self):
+        '''Tests if the URLs and the serializers of the apps are warmed'''
+        errors = []
+
+        self.assertGreater(warm_urls(), 0)
+        self.assertGreater(warm_serializers(errors.append), 0)
+        self.assertEqual(errors, [])
+        self.assertGreaterEqual(worker_count(), 3)
+
+    def test_invalid_bind(self):
+        '''Tests if serve rejects an address without a port'''
+        with self.assertRaises(CommandError):
+            call_command('serve', '--bind', 'localhost')
+
+    def test_reap(self):
+        '''Tests if exited and killed workers are reaped with their codes'''
+        messages = []
+        arbiter = Arbiter(None, ('127.0.0.1', 0), 2, log=messages.append)
+        exited = os.fork()
+        if not exited:
+            os._exit(3)
+        killed = os.fork()
+        if not killed:
+            signal.pause()
+            os._exit(0)
+        arbiter.children = {exited: 0, killed: 0}
+        os.kill(killed, signal.SIGKILL)
+
+        while arbiter.children:
+            arbiter.reap()
+
+        self.assertEqual(sorted(messages), sorted([
+            f'Worker {exited} exited with 3',
+            f'Worker {killed} exited with -{int(signal.SIGKILL)}',
+        ]))
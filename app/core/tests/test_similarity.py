@@ -0,0 +1,130 @@
+from io import StringIO
+
+import numpy as np
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase
+
+from core.models import Tag, Ingredient, Recipe, RecipeSignature
+from core.similarity import MinHashLSHIndex, minhash, registry, \
+    store_signatures
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b)
+
+
+class MinHashTests(TestCase):
+
+    def test_estimates_jaccard(self):
+        '''Tests if the signature agreement estimates the Jaccard index'''
+        a = set(range(0, 100))
+        b = set(range(50, 150))
+        signatures = minhash([
+            np.array(sorted(a), dtype=np.uint64),
+            np.array(sorted(b), dtype=np.uint64),
+        ])
+
+        estimate = (signatures[0] == signatures[1]).mean()
+
+        self.assertAlmostEqual(estimate, jaccard(a, b), delta=0.1)
+
+    def test_index_ranks_similar(self):
+        '''Tests if the index returns the most similar recipes first'''
+        sets = {
+            1: set(range(20)),
+            2: set(range(19)) | {100},
+            3: set(range(15)) | {101, 102, 103, 104, 105},
+            4: set(range(200, 220)),
+        }
+        signatures = minhash([
+            np.array(sorted(s), dtype=np.uint64) for s in sets.values()
+        ])
+        index = MinHashLSHIndex(list(sets), signatures)
+
+        result = index.similar(1, 10)
+
+        self.assertEqual([r for r, _ in result], [2, 3])
+        self.assertGreater(result[0][1], result[1][1])
+
+    def test_updates_and_compaction(self):
+        '''Tests if changed recipes are found before and after compaction'''
+        base = np.array(range(20), dtype=np.uint64)
+        index = MinHashLSHIndex([1, 2], minhash([base, base + 500]))
+        index.update(2, minhash([base])[0])
+        index.update(3, minhash([base])[0])
+
+        self.assertEqual([r for r, _ in index.similar(1, 5)], [3, 2])
+
+        index._compact()
+        index.update(3, None)
+        self.assertEqual(index.similar(1, 5), [(2, 1.0)])
+
+
+class SignatureMaintenanceTests(TransactionTestCase):
+
+    def setUp(self):
+        registry.clear()
+        self.user = get_user_model().objects.create_user(
+            'similar@gmail.com', 'similar', 'testpassword'
+        )
+        self.tags = [
+            Tag.objects.create(owner=self.user, name=str(i))
+            for i in range(4)
+        ]
+        self.salt = Ingredient.objects.create(owner=self.user, name='Salt')
+        self.recipes = [
+            Recipe.objects.create(owner=self.user, title=str(i), price=5)
+            for i in range(3)
+        ]
+
+    def tearDown(self):
+        registry.clear()
+
+    def test_signatures_follow_relations(self):
+        '''Tests if signatures and the loaded index follow the changes'''
+        first, second, third = self.recipes
+        index = registry.get(self.user.pk)
+        first.tags.add(*self.tags)
+        second.tags.add(*self.tags[:3])
+        third.ingredients.add(self.salt)
+
+        self.assertEqual(RecipeSignature.objects.count(), 3)
+        self.assertEqual(index.similar(first.pk, 5)[0][0], second.pk)
+
+        second.tags.clear()
+        self.assertEqual(index.similar(first.pk, 5), [])
+        self.assertFalse(
+            RecipeSignature.objects.filter(recipe=second).exists()
+        )
+
+    def test_signatures_of_other_process_rebuild(self):
+        '''Tests if signatures stored by another worker are picked up'''
+        first, second, _ = self.recipes
+        self.assertEqual(registry.get(self.user.pk).similar(first.pk, 5), [])
+
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(recipe_id=recipe.pk, tag_id=self.tags[0].pk)
+            for recipe in (first, second)
+        ])
+        store_signatures([first.pk, second.pk])
+
+        self.assertEqual(
+            registry.get(self.user.pk).similar(first.pk, 5),
+            [(second.pk, 1.0)]
+        )
+
+    def test_rebuild_command(self):
+        '''Tests if the rebuild command recomputes lost signatures'''
+        self.recipes[0].tags.add(self.tags[0])
+        self.recipes[1].tags.add(self.tags[0])
+        RecipeSignature.objects.all().delete()
+
+        call_command('rebuild_similarity_index', '--batch-size', '2',
+                     stdout=StringIO())
+
+        self.assertEqual(RecipeSignature.objects.count(), 2)
+        self.assertEqual(
+            registry.get(self.user.pk).similar(self.recipes[0].pk, 5),
+            [(self.recipes[1].pk, 1.0)]
+        )
@@ -0,0 +1,127 @@
+import threading
+import time
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.models import CacheCounter
+from core.singleflight import Metrics, SingleFlight, cached, entry
+
+
+class SingleFlightTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.metrics = Metrics('test', 60)
+        self.flight = SingleFlight(self.metrics)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_concurrent_misses_coalesced(self):
+        '''Tests if concurrent callers of a key share one computation'''
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'value'
+
+        results = []
+        leader = threading.Thread(
+            target=lambda: results.append(self.flight.do('key', compute))
+        )
+        leader.start()
+        started.wait(5)
+        followers = [
+            threading.Thread(
+                target=lambda: results.append(self.flight.do('key', compute))
+            )
+            for _ in range(3)
+        ]
+        for thread in followers:
+            thread.start()
+        while self.metrics.local['coalesced'] < 3:
+            time.sleep(0.01)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 4)
+        self.assertEqual(self.flight.calls, {})
+
+    def test_error_shared_and_not_cached(self):
+        '''Tests if a failed computation raises and is run again'''
+        def fail():
+            raise ValueError('boom')
+
+        with self.assertRaises(ValueError):
+            self.flight.do('key', fail)
+
+        self.assertEqual(self.flight.do('key', lambda: 'value'), 'value')
+
+    def test_stale_served_while_refreshing(self):
+        '''Tests if an expired entry is served while the lock is taken'''
+        cache.set('key', entry('old', -1, 0.1))
+        cache.add('key:refresh', 1)
+
+        value = cached(cache, 'key', lambda: 'new', 60, 60,
+                       self.flight, self.metrics)
+
+        self.assertEqual(value, 'old')
+        self.assertEqual(self.metrics.local['stale'], 1)
+
+    def test_expired_entry_refreshed(self):
+        '''Tests if one request refreshes an expired entry'''
+        cache.set('key', entry('old', -1, 0.1))
+
+        value = cached(cache, 'key', lambda: 'new', 60, 60,
+                       self.flight, self.metrics)
+
+        self.assertEqual(value, 'new')
+        self.assertEqual(cache.get('key')[0], 'new')
+        self.assertIsNone(cache.get('key:refresh'))
+        self.assertEqual(self.metrics.local['refreshes'], 1)
+
+    def test_refreshed_early_near_expiry(self):
+        '''Tests if a fresh entry is refreshed early by an unlucky draw'''
+        cache.set('key', entry('old', 1, 10))
+
+        with mock.patch('core.singleflight.random.random',
+                        return_value=0.99):
+            value = cached(cache, 'key', lambda: 'new', 60, 60,
+                           self.flight, self.metrics)
+
+        self.assertEqual(value, 'new')
+        self.assertEqual(self.metrics.local['early_refreshes'], 1)
+
+    def test_metrics_aggregated_in_database(self):
+        '''Tests if the counts of the workers add up in the database'''
+        self.metrics = Metrics('test', 0)
+        other = Metrics('test', 0)
+
+        self.metrics.record('hits')
+        other.record('hits')
+        other.record('misses')
+
+        self.assertEqual(
+            self.metrics.totals(['hits', 'misses', 'stale']),
+            {'hits': 2, 'misses': 1, 'stale': 0},
+        )
+
+    def test_cache_stats_reads_other_processes(self):
+        '''Tests if cache_stats shows the counts flushed by the workers'''
+        CacheCounter.objects.create(name='recipe:hits', count=3)
+        CacheCounter.objects.create(name='recipe:misses', count=1)
+        output = StringIO()
+
+        call_command('cache_stats', stdout=output)
+
+        self.assertIn('hits          3   75.0%', output.getvalue())
@@ -0,0 +1,76 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import SlowQuery
+from core.slow_queries import normalize_sql, fingerprint
+
+
+class NormalizationTests(TestCase):
+
+    def test_literals_replaced(self):
+        '''Tests if literals and placeholder lists are normalized'''
+        sql = normalize_sql(
+            "SELECT * FROM t WHERE a = 'x''y' AND b = 12.5 "
+            "AND c IN (%s, %s,   %s)"
+        )
+
+        self.assertEqual(
+            sql, 'SELECT * FROM t WHERE a = ? AND b = ? AND c IN (?, ...)'
+        )
+
+    def test_same_fingerprint_for_different_lists(self):
+        '''Tests if IN lists of different length share the fingerprint'''
+        one = normalize_sql('SELECT 1 FROM t WHERE id IN (%s, %s)')
+        two = normalize_sql('SELECT 1 FROM t WHERE id IN (%s, %s, %s, %s)')
+
+        self.assertEqual(fingerprint(one), fingerprint(two))
+
+
+@override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+class SlowQueryLogTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'slowquery@gmail.com', 'slow', 'testpassword'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_queries_aggregated_per_view(self):
+        '''Tests if repeated requests are aggregated by fingerprint'''
+        url = reverse('recipe:recipes-list')
+        self.client.get(url)
+        # The second response would be served from the list cache
+        cache.clear()
+        self.client.get(url)
+
+        query = SlowQuery.objects.get(sql__contains='core_recipe')
+
+        self.assertEqual(query.count, 2)
+        self.assertEqual(query.view, 'RecipeViewSet.list')
+        self.assertGreaterEqual(query.total_duration, query.max_duration)
+
+    def test_command_lists_queries(self):
+        '''Tests if the management command prints the collected queries'''
+        self.client.get(reverse('recipe:recipes-list'))
+        out = StringIO()
+
+        call_command('slow_queries', stdout=out)
+
+        self.assertIn('RecipeViewSet.list', out.getvalue())
+
+    def test_command_resets_log(self):
+        '''Tests if the management command clears the collected queries'''
+        self.client.get(reverse('recipe:recipes-list'))
+
+        call_command('slow_queries', '--reset', stdout=StringIO())
+
+        self.assertFalse(SlowQuery.objects.exists())
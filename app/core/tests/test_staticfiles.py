@@ -0,0 +1,97 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+import brotli
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+CSS = b'body { color: #333; margin: 0; padding: 0; }\n' * 200
+
+
+class StaticFilesTests(SimpleTestCase):
+
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.root = tempfile.mkdtemp()
+        with open(os.path.join(self.source, 'site.css'), 'wb') as f:
+            f.write(CSS)
+        with open(os.path.join(self.source, 'logo.png'), 'wb') as f:
+            f.write(os.urandom(2048))
+        self.settings = override_settings(
+            STATIC_ROOT=self.root, STATICFILES_DIRS=[self.source],
+            INSTALLED_APPS=['django.contrib.staticfiles'],
+        )
+        self.settings.enable()
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.hashed = staticfiles_storage.stored_name('site.css')
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.source)
+        shutil.rmtree(self.root)
+
+    def test_variants_written(self):
+        '''Tests if collectstatic writes the compressed variants'''
+        path = os.path.join(self.root, self.hashed)
+
+        with open(path + '.br', 'rb') as f:
+            self.assertEqual(brotli.decompress(f.read()), CSS)
+        with gzip.open(path + '.gz') as f:
+            self.assertEqual(f.read(), CSS)
+        self.assertFalse(
+            os.path.exists(os.path.join(self.root, 'logo.png.gz'))
+        )
+
+    def test_hashed_file_served_precompressed(self):
+        '''Tests if a hashed file is sent precompressed for good'''
+        res = self.client.get(
+            '/static/' + self.hashed, HTTP_ACCEPT_ENCODING='gzip, br'
+        )
+
+        self.assertEqual(res['Content-Encoding'], 'br')
+        self.assertEqual(res['Vary'], 'Accept-Encoding')
+        self.assertIn('immutable', res['Cache-Control'])
+        self.assertEqual(
+            brotli.decompress(b''.join(res.streaming_content)), CSS
+        )
+
+    def test_identity_and_unhashed_names(self):
+        '''Tests if the plain file is sent with a short max-age'''
+        res = self.client.get('/static/site.css')
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertEqual(res['Cache-Control'], 'public, max-age=60')
+        self.assertEqual(b''.join(res.streaming_content), CSS)
+
+    def test_not_modified(self):
+        '''Tests if a matching If-None-Match gets a 304'''
+        url = '/static/' + self.hashed
+        etag = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')['ETag']
+
+        res = self.client.get(
+            url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(res.status_code, 304)
+
+    @override_settings(STATIC_SENDFILE_HEADER='X-Accel-Redirect')
+    def test_sendfile(self):
+        '''Tests if the file is left to the front server'''
+        res = self.client.get(
+            '/static/' + self.hashed, HTTP_ACCEPT_ENCODING='gzip'
+        )
+
+        self.assertEqual(
+            res['X-Accel-Redirect'], f'/protected-static/{self.hashed}.gz'
+        )
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(res.content, b'')
+
+    def test_missing_file_passed_on(self):
+        '''Tests if unknown static paths reach the app'''
+        res = self.client.get('/static/missing.css')
+
+        self.assertEqual(res.status_code, 404)
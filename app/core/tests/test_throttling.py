@@ -0,0 +1,214 @@
+import threading
+from unittest.mock import patch
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import TestCase, RequestFactory, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.throttling import ReadWriteThrottle, LoginThrottle, local_store, \
+                            CacheBucketStore
+
+RATES = {
+    'REST_FRAMEWORK': {
+        'DEFAULT_THROTTLE_RATES': {
+            'read': '10/s',
+            'write': '2/min',
+            'upload': '1/min',
+            'login': '3/min',
+        },
+    },
+}
+
+
+class User:
+    is_authenticated = True
+
+    def __init__(self, pk):
+        self.pk = pk
+
+
+class View:
+    action = 'list'
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@override_settings(**RATES)
+class TokenBucketTests(TestCase):
+
+    def setUp(self):
+        local_store.buckets.clear()
+        cache.clear()
+        self.clock = Clock()
+        self.factory = RequestFactory()
+
+    def request(self, user, method='get'):
+        request = getattr(self.factory, method)('/')
+        request.user = user
+        return request
+
+    def throttle(self, cls=ReadWriteThrottle):
+        throttle = cls()
+        throttle.timer = self.clock
+        return throttle
+
+    def allow(self, user, method='get', cls=ReadWriteThrottle):
+        return self.throttle(cls).allow_request(
+            self.request(user, method), View()
+        )
+
+    def test_burst_then_refill(self):
+        '''Tests if the bucket allows a burst and refills over time'''
+        user = User(1)
+        allowed = [self.allow(user) for _ in range(12)]
+
+        self.assertEqual(allowed, [True] * 10 + [False] * 2)
+
+        self.clock.now += 0.1
+        self.assertTrue(self.allow(user))
+        self.assertFalse(self.allow(user))
+
+    def test_accurate_wait(self):
+        '''Tests if wait returns the time until the next token'''
+        user = User(1)
+        self.allow(user, 'post')
+        self.allow(user, 'post')
+        throttle = self.throttle()
+
+        self.clock.now += 15
+        self.assertFalse(throttle.allow_request(
+            self.request(user, 'post'), View()
+        ))
+        self.assertAlmostEqual(throttle.wait(), 15)
+
+    def test_scopes_are_separate(self):
+        '''Tests if exhausted writes do not limit the reads'''
+        user = User(1)
+        for _ in range(3):
+            self.allow(user, 'post')
+
+        self.assertFalse(self.allow(user, 'post'))
+        self.assertTrue(self.allow(user, 'get'))
+
+    def test_fair_under_abuse(self):
+        '''
+        Tests if a client hammering the API for 10 seconds gets only its
+        own rate while a well-behaved client is never throttled
+        '''
+        abuser, regular = User(1), User(2)
+        abuser_allowed = regular_allowed = 0
+
+        for tick in range(10000):
+            self.clock.now += 0.001
+            abuser_allowed += self.allow(abuser)
+            if tick % 200 == 0:
+                regular_allowed += self.allow(regular)
+
+        self.assertEqual(regular_allowed, 50)
+        self.assertLessEqual(abuser_allowed, 10 + 10 * 10)
+        self.assertGreaterEqual(abuser_allowed, 10 * 10)
+
+    @override_settings(THROTTLE_CACHE='shared')
+    def test_shared_cache_store(self):
+        '''Tests if the buckets can be kept in the shared database cache'''
+        user = User(1)
+        for _ in range(10):
+            self.allow(user)
+
+        self.assertFalse(self.allow(user))
+        self.assertFalse(local_store.buckets)
+
+    def test_busy_lock_lets_request_through(self):
+        '''Tests if a request that cannot take the lock is not throttled'''
+        store = CacheBucketStore(cache)
+        store.take('key', 1, 60, 1000.0)
+
+        with patch.object(cache, 'add', return_value=False):
+            self.assertIsNone(store.take('key', 1, 60, 1000.0))
+        self.assertIsNotNone(store.take('key', 1, 60, 1000.0))
+
+    def test_login_keyed_by_address(self):
+        '''Tests if the login throttle is shared by the same address'''
+        for _ in range(3):
+            self.assertTrue(self.allow(AnonymousUser(), 'post', LoginThrottle))
+
+        self.assertFalse(self.allow(AnonymousUser(), 'post', LoginThrottle))
+
+    def test_forwarded_for_ignored_without_proxies(self):
+        '''Tests if a rotated X-Forwarded-For does not mint new buckets'''
+        rates = dict(RATES['REST_FRAMEWORK'], NUM_PROXIES=0)
+        allowed = []
+        with override_settings(REST_FRAMEWORK=rates):
+            for i in range(5):
+                request = self.factory.post(
+                    '/', HTTP_X_FORWARDED_FOR=f'10.0.0.{i}'
+                )
+                request.user = AnonymousUser()
+                allowed.append(
+                    self.throttle(LoginThrottle).allow_request(request, View())
+                )
+
+        self.assertEqual(allowed, [True] * 3 + [False] * 2)
+
+    def test_least_recently_used_evicted(self):
+        '''Tests if the oldest bucket is dropped beyond max_keys'''
+        with patch.object(local_store, 'max_keys', 2):
+            self.allow(User(1))
+            self.allow(User(2))
+            self.allow(User(1))
+            self.allow(User(3))
+
+        self.assertEqual(
+            [key[-1] for key in local_store.buckets], ['1', '3']
+        )
+
+    def test_concurrent_takes_do_not_overshoot(self):
+        '''Tests if concurrent requests get exactly the capacity'''
+        for store in (local_store, CacheBucketStore(cache)):
+            results = []
+
+            def take():
+                results.append(store.take('key', 10, 60, 1000.0) is None)
+
+            threads = [threading.Thread(target=take) for _ in range(30)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(results.count(True), 10)
+
+
+@override_settings(**RATES)
+class ThrottledApiTests(TestCase):
+
+    def setUp(self):
+        local_store.buckets.clear()
+        cache.clear()
+        self.client = APIClient()
+
+    def tearDown(self):
+        local_store.buckets.clear()
+
+    def test_login_returns_retry_after(self):
+        '''Tests if the throttled login responds 429 with Retry-After'''
+        url = reverse('user:get_token')
+        payload = {'email': 'nobody@gmail.com', 'password': 'wrongpass'}
+        for _ in range(3):
+            self.client.post(url, payload)
+
+        res = self.client.post(url, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn(res['Retry-After'], ('20', '21'))
@@ -0,0 +1,170 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+_local = threading.local()
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    '''Parses the rate like 100/min into (capacity, seconds)'''
+    num, period = rate.split('/')
+    return int(num), DURATIONS[period[0]]
+
+
+def refill_bucket(bucket, capacity, period, now):
+    '''
+    Takes a token from the bucket (tokens, stamp), returns the new bucket
+    and the seconds until the next token, None when a token was taken
+    '''
+    refill = capacity / period
+    tokens, stamp = bucket or (capacity, now)
+    tokens = min(capacity, tokens + (now - stamp) * refill)
+    if tokens >= 1:
+        return (tokens - 1, now), None
+    return (tokens, now), (1 - tokens) / refill
+
+
+class LocalBucketStore:
+    '''
+    Process local bucket storage, used when THROTTLE_CACHE is None.
+    The limits are then enforced per worker process, the least recently
+    used buckets are dropped beyond max_keys
+    '''
+    max_keys = 100000
+
+    def __init__(self):
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, key, capacity, period, now):
+        with self.lock:
+            bucket, wait = refill_bucket(
+                self.buckets.get(key), capacity, period, now
+            )
+            self.buckets[key] = bucket
+            self.buckets.move_to_end(key)
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        return wait
+
+
+class CacheBucketStore:
+    '''
+    Bucket storage in a django cache shared by the workers. The read and
+    write of a bucket are serialized with a lock taken with cache.add, a
+    request which cannot take it within lock_attempts tries is let
+    through without taking a token
+    '''
+    lock_timeout = 1
+    lock_attempts = 20
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def take(self, key, capacity, period, now):
+        lock = f'{key}:lock'
+        for _ in range(self.lock_attempts):
+            if self.cache.add(lock, 1, self.lock_timeout):
+                break
+            time.sleep(0.001)
+        else:
+            return None
+        try:
+            bucket, wait = refill_bucket(
+                self.cache.get(key), capacity, period, now
+            )
+            self.cache.set(key, bucket, period)
+        finally:
+            self.cache.delete(lock)
+        return wait
+
+
+local_store = LocalBucketStore()
+
+
+def get_store():
+    '''
+    Returns the bucket storage. Django caches are kept per thread as the
+    lookup through django.core.cache.caches costs more than the
+    throttling itself
+    '''
+    alias = settings.THROTTLE_CACHE
+    if alias is None:
+        return local_store
+    if getattr(_local, 'alias', None) != alias:
+        _local.alias = alias
+        _local.store = CacheBucketStore(caches[alias])
+    return _local.store
+
+
+class TokenBucketThrottle(BaseThrottle):
+    '''
+    Token bucket throttle, the bucket holds up to `num` tokens of the
+    `num/period` rate of the scope and refills continuously
+    '''
+    scope = None
+    timer = time.time
+    cache_format = 'throttle_bucket_%(scope)s_%(ident)s'
+
+    def __init__(self):
+        self.wait_time = None
+
+    def get_scope(self, request, view):
+        return self.scope
+
+    def get_cache_key(self, request, scope):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': scope, 'ident': ident}
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(request, view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return True
+
+        capacity, period = parse_rate(rate)
+        self.wait_time = get_store().take(
+            self.get_cache_key(request, scope), capacity, period,
+            self.timer(),
+        )
+        return self.wait_time is None
+
+    def wait(self):
+        return self.wait_time
+
+
+class ReadWriteThrottle(TokenBucketThrottle):
+    '''Uses the read, write or upload scope depending on the request'''
+    upload_actions = ('upload_image', )
+
+    def get_scope(self, request, view):
+        if getattr(view, 'action', None) in self.upload_actions:
+            return 'upload'
+        if request.method in SAFE_METHODS:
+            return 'read'
+        return 'write'
+
+
+class LoginThrottle(TokenBucketThrottle):
+    '''Limits the login attempts per client address'''
+    scope = 'login'
+
+    def get_cache_key(self, request, scope):
+        return self.cache_format % {
+            'scope': scope,
+            'ident': self.get_ident(request),
+        }
@@ -0,0 +1,74 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+def view_label(request):
+    '''
+    Returns a readable name of the view that handled the request,
+    e.g. RecipeViewSet.list
+    '''
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None:
+        return match.func.__qualname__
+
+    method = request.method.lower()
+    actions = getattr(match.func, 'actions', None) or {}
+    return f'{view_class.__name__}.{actions.get(method, method)}'
+
+
+class IndexRegistry:
+    '''
+    Keeps the in-memory indexes of the most recently used users of this
+    process. An index is built along with version(owner_id), a number
+    read from the database that moves with the data of the index, and is
+    rebuilt once the number moved, e.g. after a change made through
+    another process, or once it is older than RECIPE_INDEX_TTL. Without
+    version an index is only rebuilt after RECIPE_INDEX_TTL
+    '''
+
+    def __init__(self, build, version=None):
+        self.build = build
+        self.version = version
+        self.lock = threading.Lock()
+        self.indexes = OrderedDict()
+
+    def get(self, owner_id):
+        version = self.version and self.version(owner_id)
+        with self.lock:
+            entry = self.indexes.get(owner_id)
+            if entry is not None:
+                index, built, created = entry
+                if built == version and time.monotonic() - created \
+                        < settings.RECIPE_INDEX_TTL:
+                    self.indexes.move_to_end(owner_id)
+                    return index
+
+        index = self.build(owner_id)
+
+        with self.lock:
+            self.indexes[owner_id] = (index, version, time.monotonic())
+            self.indexes.move_to_end(owner_id)
+            while len(self.indexes) > settings.RECIPE_INDEX_MAX_USERS:
+                self.indexes.popitem(last=False)
+        return index
+
+    def loaded(self, owner_id):
+        '''Returns the index of the user only if it is already built'''
+        with self.lock:
+            entry = self.indexes.get(owner_id)
+        return entry and entry[0]
+
+    def invalidate(self, owner_id):
+        with self.lock:
+            self.indexes.pop(owner_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.indexes.clear()
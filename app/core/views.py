@@ -0,0 +1,65 @@
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.core.handlers.wsgi import WSGIRequest
+from django.http import Http404
+from django.urls import resolve
+from rest_framework import status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.serializers import BatchSerializer
+from core.throttling import ReadWriteThrottle
+
+
+class BatchView(APIView):
+    '''
+    Runs several read requests of the API in one round trip. The
+    sub-requests run one after another in this process, authenticated as
+    the batch request and on its database connection
+    '''
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [ReadWriteThrottle]
+
+    def sub_request(self, request, path):
+        url = urlsplit(path)
+        environ = dict(
+            request._request.META,
+            REQUEST_METHOD='GET',
+            PATH_INFO=url.path,
+            QUERY_STRING=url.query,
+            CONTENT_LENGTH='0',
+        )
+        environ['wsgi.input'] = BytesIO()
+        sub = WSGIRequest(environ)
+        sub._force_auth_user = request.user
+        sub._force_auth_token = request.auth
+        return sub
+
+    def run(self, request, path):
+        try:
+            match = resolve(urlsplit(path).path)
+        except Http404:
+            return status.HTTP_404_NOT_FOUND, {'detail': 'Not found.'}
+        view_class = getattr(match.func, 'cls', None)
+        if view_class is None or not issubclass(view_class, APIView) \
+                or issubclass(view_class, BatchView):
+            return status.HTTP_404_NOT_FOUND, {'detail': 'Not found.'}
+
+        response = match.func(
+            self.sub_request(request, path), *match.args, **match.kwargs
+        )
+        return response.status_code, getattr(response, 'data', None)
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        responses = []
+        for sub in serializer.validated_data['requests']:
+            code, data = self.run(request, sub['path'])
+            responses.append({'status': code, 'body': data})
+        return Response({'responses': responses})
@@ -0,0 +1,147 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import OuterRef, Subquery
+
+from core.models import Change, Recipe
+from core.singleflight import Metrics, SingleFlight, cached, entry
+
+KEY_FORMAT = 'recipe:v3:%s:%s:%s'
+RESULTS_FORMAT = 'recipe:v3:results:%s:%s:%s'
+DETAIL = 'detail'
+LIST = 'list'
+METRICS = ['hits', 'misses', 'coalesced', 'stale', 'refreshes',
+           'early_refreshes']
+
+
+def get_cache():
+    return caches[settings.RECIPE_CACHE]
+
+
+metrics = Metrics('recipe', settings.RECIPE_CACHE_METRICS_INTERVAL)
+flight = SingleFlight(metrics)
+
+
+def linked_seq(through, column, owner_id):
+    '''
+    Subquery of the sequence number of the latest change of the tags or
+    ingredients linked to the recipe of the outer change row
+    '''
+    return Change.objects.filter(
+        owner_id=owner_id, kind=column[:-len('_id')],
+        object_id__in=through.objects.filter(
+            recipe_id=OuterRef(OuterRef('object_id'))
+        ).values(column),
+    ).order_by('-seq').values('seq')[:1]
+
+
+def versions(owner_id, recipe_ids, detailed=False):
+    '''
+    Returns the versions of the owner's recipes with one query, the
+    sequence number of the latest change of the recipe in the change
+    feed. The detailed versions also hold the latest change of the tags
+    and ingredients linked to the recipe, whose names the details show.
+    Deleted recipes and the recipes of other owners have no version
+    '''
+    rows = Change.objects.filter(
+        owner_id=owner_id, kind='recipe', object_id__in=recipe_ids,
+        deleted=False,
+    )
+    if not detailed:
+        return dict(rows.values_list('object_id', 'seq'))
+    rows = rows.annotate(
+        tags=Subquery(linked_seq(Recipe.tags.through, 'tag_id', owner_id)),
+        ingredients=Subquery(linked_seq(
+            Recipe.ingredients.through, 'ingredient_id', owner_id
+        )),
+    ).values_list('object_id', 'seq', 'tags', 'ingredients')
+    return {
+        pk: f'{seq}.{tags or 0}.{ingredients or 0}'
+        for pk, seq, tags, ingredients in rows
+    }
+
+
+def fetch_detail(recipe_id, owner_id, compute):
+    '''
+    Returns the cached detail representation of the owner's recipe,
+    computed with compute() when it is missing or due for a refresh
+    '''
+    version = versions(owner_id, [recipe_id], True).get(recipe_id)
+    if version is None:
+        return compute()
+    return cached(
+        get_cache(), KEY_FORMAT % (DETAIL, recipe_id, version), compute,
+        settings.RECIPE_CACHE_TIMEOUT, settings.RECIPE_CACHE_STALE_TIMEOUT,
+        flight, metrics, settings.RECIPE_CACHE_EARLY_BETA,
+    )
+
+
+def fetch_results(owner_id, change_seq, request_key, compute):
+    '''
+    Returns the cached response data of the owner's list request. The
+    key holds the change sequence of the owner, so any change to the
+    recipes, tags or ingredients of the owner moves the list to a new key
+    '''
+    return cached(
+        get_cache(), RESULTS_FORMAT % (owner_id, change_seq, request_key),
+        compute, settings.RECIPE_LIST_CACHE_TIMEOUT,
+        settings.RECIPE_CACHE_STALE_TIMEOUT, flight, metrics,
+        settings.RECIPE_CACHE_EARLY_BETA,
+    )
+
+
+def representations(kind, recipe_ids, owner_id, serialize, timeout,
+                    wrap=lambda data: data, unwrap=lambda data: data):
+    '''
+    Returns the representations of the owner's recipes in the order of
+    recipe_ids with one version query and one cache multi-get. The
+    missing ones are loaded in one prefetched query and serialized with
+    serialize(recipes), recipes deleted meanwhile are skipped. The keys
+    hold the versions, so a change made through any worker moves the
+    recipe to a new key
+    '''
+    cache = get_cache()
+    recipe_versions = versions(owner_id, recipe_ids, kind == DETAIL)
+    keys = {
+        pk: KEY_FORMAT % (kind, pk, version)
+        for pk, version in recipe_versions.items()
+    }
+    found = {
+        key: unwrap(value)
+        for key, value in cache.get_many(keys.values()).items()
+    }
+
+    missing = {pk for pk, key in keys.items() if key not in found}
+    if missing:
+        recipes = Recipe.objects.filter(owner_id=owner_id, pk__in=missing) \
+            .prefetch_related('tags', 'ingredients')
+        fresh = {
+            keys[data['id']]: data for data in serialize(list(recipes))
+        }
+        cache.set_many(
+            {key: wrap(data) for key, data in fresh.items()}, timeout
+        )
+        found.update(fresh)
+
+    return [found[keys[pk]] for pk in recipe_ids
+            if pk in keys and keys[pk] in found]
+
+
+def detail_representations(recipe_ids, owner_id, serialize):
+    '''Returns the detail representations of the owner's recipes'''
+    return representations(
+        DETAIL, recipe_ids, owner_id, serialize,
+        settings.RECIPE_CACHE_TIMEOUT + settings.RECIPE_CACHE_STALE_TIMEOUT,
+        wrap=lambda data: entry(data, settings.RECIPE_CACHE_TIMEOUT, 0),
+        unwrap=lambda value: value[0],
+    )
+
+
+def list_representations(recipe_ids, serialize, owner_id):
+    '''
+    Returns the list representations of the owner's recipes, the owner
+    also keeps the query of the missing ones to the partition of the
+    owner when the recipes are partitioned
+    '''
+    return representations(
+        LIST, recipe_ids, owner_id, serialize, settings.RECIPE_CACHE_TIMEOUT
+    )
@@ -0,0 +1,80 @@
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+
+class OwnedManyRelatedField(serializers.ManyRelatedField):
+    '''
+    Resolves the whole list of primary keys with one query limited to the
+    objects of the request user and reports all the invalid keys together
+    '''
+    default_error_messages = {
+        'does_not_exist': _('Invalid pk(s) {pk_values} - '
+                            'objects do not exist.'),
+        'incorrect_type': _('Incorrect type. Expected pk values, '
+                            'received {data_type}.'),
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        pks = {}
+        for item in data:
+            try:
+                pks[int(item)] = None
+            except (TypeError, ValueError):
+                self.fail('incorrect_type', data_type=type(item).__name__)
+
+        queryset = self.child_relation.get_queryset()
+        request = self.context.get('request')
+        if request is not None:
+            queryset = queryset.filter(
+                **{self.child_relation.owner_field: request.user}
+            )
+        found = queryset.in_bulk(pks)
+
+        missing = [pk for pk in pks if pk not in found]
+        if missing:
+            self.fail('does_not_exist', pk_values=missing)
+        return [found[pk] for pk in pks]
+
+
+class OwnedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    '''Primary key field only accepting the objects of the request user'''
+
+    def __init__(self, owner_field='owner', **kwargs):
+        self.owner_field = owner_field
+        super().__init__(**kwargs)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return OwnedManyRelatedField(**list_kwargs)
+
+
+def apply_relation_diff(manager, objects, created=False):
+    '''
+    Sets the many-to-many relation by removing and adding only the
+    changed links, the links of a just created object are not read
+    '''
+    new = {obj.pk for obj in objects}
+    current = set()
+    if not created:
+        current = set(
+            manager.through.objects
+            .filter(**{manager.source_field_name: manager.instance.pk})
+            .values_list(f'{manager.target_field_name}_id', flat=True)
+        )
+    removed = current - new
+    added = new - current
+    if removed:
+        manager.remove(*removed)
+    if added:
+        manager.add(*added)
@@ -1,29 +1,59 @@
+from django.conf import settings
+from django.db import transaction
+
 from rest_framework import serializers
 
 from core.models import Tag, Ingredient, Recipe
+from recipe.fields import OwnedPrimaryKeyRelatedField, apply_relation_diff
 
 
 class TagSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Tag
-        fields = ('name', )
+        fields = ('name', 'recipe_count')
+        read_only_fields = ('recipe_count', )
 
 
 class IngredientSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Ingredient
+        fields = ('name', 'recipe_count')
+        read_only_fields = ('recipe_count', )
+
+
+class NestedTagSerializer(TagSerializer):
+
+    class Meta(TagSerializer.Meta):
+        fields = ('name', )
+
+
+class NestedIngredientSerializer(IngredientSerializer):
+
+    class Meta(IngredientSerializer.Meta):
         fields = ('name', )
 
 
+class SyncTagSerializer(TagSerializer):
+
+    class Meta(TagSerializer.Meta):
+        fields = ('id', 'name')
+
+
+class SyncIngredientSerializer(IngredientSerializer):
+
+    class Meta(IngredientSerializer.Meta):
+        fields = ('id', 'name')
+
+
 class RecipeSerializer(serializers.ModelSerializer):
 
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = OwnedPrimaryKeyRelatedField(
         many=True,
         queryset=Tag.objects.all()
     )
-    ingredients = serializers.PrimaryKeyRelatedField(
+    ingredients = OwnedPrimaryKeyRelatedField(
         many=True,
         queryset=Ingredient.objects.all()
     )
@@ -33,11 +63,52 @@ class RecipeSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'price', 'tags', 'ingredients']
         read_only_fields = ['id', ]
 
+    relation_fields = ('tags', 'ingredients')
+
+    def pop_relations(self, validated_data):
+        return {
+            name: validated_data.pop(name)
+            for name in self.relation_fields if name in validated_data
+        }
+
+    @transaction.atomic
+    def create(self, validated_data):
+        relations = self.pop_relations(validated_data)
+        recipe = super().create(validated_data)
+        for name, objects in relations.items():
+            apply_relation_diff(getattr(recipe, name), objects, created=True)
+        return recipe
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        relations = self.pop_relations(validated_data)
+        recipe = super().update(instance, validated_data)
+        for name, objects in relations.items():
+            apply_relation_diff(getattr(recipe, name), objects)
+        return recipe
+
 
 class RecipeDetailSerializer(RecipeSerializer):
 
-    tags = TagSerializer(many=True, read_only=True)
-    ingredients = IngredientSerializer(many=True, read_only=True)
+    tags = NestedTagSerializer(many=True, read_only=True)
+    ingredients = NestedIngredientSerializer(many=True, read_only=True)
+
+
+class CookableRecipeSerializer(RecipeSerializer):
+
+    missing = serializers.IntegerField(read_only=True)
+    coverage = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ['missing', 'coverage']
+
+
+class SimilarRecipeSerializer(RecipeSerializer):
+
+    similarity = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ['similarity']
 
 
 class RecipeImageSerializer(serializers.ModelSerializer):
@@ -46,3 +117,44 @@ class RecipeImageSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = ['id', 'image', ]
         read_only_fields = ['id', ]
+
+
+class RecipeLinksSerializer(serializers.Serializer):
+    '''Ids of the tags or ingredients to add to or remove from a recipe'''
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.RECIPE_LINKS_MAX_IDS,
+    )
+
+    def owned_missing(self, model, pks):
+        request = self.context['request']
+        found = set(
+            model.objects.filter(owner=request.user, pk__in=pks)
+            .values_list('pk', flat=True)
+        )
+        missing = [pk for pk in dict.fromkeys(pks) if pk not in found]
+        if missing:
+            raise serializers.ValidationError(
+                f'Invalid pk(s) {missing} - objects do not exist.'
+            )
+        return pks
+
+    def validate_ids(self, value):
+        model = Recipe._meta.get_field(self.context['relation'])\
+            .related_model
+        return self.owned_missing(model, value)
+
+
+class BulkRecipeLinksSerializer(RecipeLinksSerializer):
+    '''Adds or removes the same tags or ingredients on many recipes'''
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.RECIPE_LINKS_MAX_IDS,
+    )
+
+    def validate_recipes(self, value):
+        return self.owned_missing(Recipe, value)
@@ -0,0 +1,163 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+RECIPE_URL = reverse('recipe:recipes-list')
+
+
+def detail_url(pk):
+    return reverse('recipe:recipes-detail', args=[pk])
+
+
+class RecipeCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'cache@gmail.com', 'cache', 'testpassword'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(owner=self.user, name='Vegan')
+        self.ingredient = Ingredient.objects.create(
+            owner=self.user, name='Tofu'
+        )
+        self.recipe = Recipe.objects.create(
+            owner=self.user, title='Stir fry', price=5
+        )
+        self.recipe.tags.add(self.tag)
+        self.recipe.ingredients.add(self.ingredient)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_detail_served_from_cache(self):
+        '''Tests if the second detail request only reads the version'''
+        first = self.client.get(detail_url(self.recipe.pk))
+
+        with self.assertNumQueries(1):
+            second = self.client.get(detail_url(self.recipe.pk))
+
+        self.assertEqual(first.data, second.data)
+
+    def test_cached_detail_not_shared(self):
+        '''Tests if a cached recipe is not served to another user'''
+        self.client.get(detail_url(self.recipe.pk))
+        other = get_user_model().objects.create_user(
+            'other@gmail.com', 'other', 'testpassword'
+        )
+        self.client.force_authenticate(other)
+
+        res = self.client.get(detail_url(self.recipe.pk))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalidated_by_recipe_update(self):
+        '''Tests if updating the recipe invalidates its representations'''
+        self.client.get(detail_url(self.recipe.pk))
+        self.client.get(RECIPE_URL)
+
+        self.client.patch(detail_url(self.recipe.pk), {'title': 'Curry'})
+
+        self.assertEqual(
+            self.client.get(detail_url(self.recipe.pk)).data['title'], 'Curry'
+        )
+        self.assertEqual(self.client.get(RECIPE_URL).data[0]['title'], 'Curry')
+
+    def test_change_in_other_worker_not_stale(self):
+        '''Tests if a change missing from this cache gets a new key'''
+        self.client.get(detail_url(self.recipe.pk))
+        self.client.get(RECIPE_URL)
+        stale = dict(cache._cache)
+
+        self.client.patch(detail_url(self.recipe.pk), {'title': 'Curry'})
+        cache._cache.update(stale)
+
+        self.assertEqual(
+            self.client.get(detail_url(self.recipe.pk)).data['title'], 'Curry'
+        )
+        self.assertEqual(self.client.get(RECIPE_URL).data[0]['title'], 'Curry')
+
+    def test_invalidated_by_relations(self):
+        '''Tests if changing the tags from either side invalidates'''
+        self.client.get(detail_url(self.recipe.pk))
+        spicy = Tag.objects.create(owner=self.user, name='Spicy')
+
+        spicy.recipe_set.add(self.recipe)
+        res = self.client.get(detail_url(self.recipe.pk))
+        self.assertEqual(len(res.data['tags']), 2)
+
+        self.tag.recipe_set.clear()
+        res = self.client.get(detail_url(self.recipe.pk))
+        self.assertEqual(res.data['tags'], [{'name': 'Spicy'}])
+
+    def test_invalidated_by_rename_and_delete(self):
+        '''Tests if renaming or deleting a linked ingredient invalidates'''
+        self.client.get(detail_url(self.recipe.pk))
+
+        self.ingredient.name = 'Tempeh'
+        self.ingredient.save()
+        res = self.client.get(detail_url(self.recipe.pk))
+        self.assertEqual(res.data['ingredients'], [{'name': 'Tempeh'}])
+
+        self.ingredient.delete()
+        res = self.client.get(detail_url(self.recipe.pk))
+        self.assertEqual(res.data['ingredients'], [])
+
+    def test_unrelated_attributes_keep_fragments(self):
+        '''Tests if only the linked tags and ingredients invalidate'''
+        def fragments():
+            self.client.get(detail_url(self.recipe.pk))
+            self.client.get(RECIPE_URL)
+            return {
+                key for key in cache._cache
+                if ':detail:' in key or ':list:' in key
+            }
+        cached = fragments()
+
+        Tag.objects.create(owner=self.user, name='Unused')
+        Ingredient.objects.create(owner=self.user, name='Unused')
+        self.assertEqual(fragments(), cached)
+
+        self.tag.name = 'Plant based'
+        self.tag.save()
+        added = fragments() - cached
+        self.assertEqual(len(added), 1)
+        self.assertIn(':detail:', added.pop())
+
+    def test_list_assembled_from_cache(self):
+        '''Tests if the cached list fragments are fetched with one query'''
+        Recipe.objects.create(owner=self.user, title='Salad', price=3)
+        first = self.client.get(RECIPE_URL)
+
+        with self.assertNumQueries(1):
+            second = self.client.get(RECIPE_URL)
+
+        self.assertEqual(first.data, second.data)
+        self.assertEqual([r['title'] for r in second.data],
+                         ['Salad', 'Stir fry'])
+
+    def test_list_response_cached(self):
+        '''Tests if a repeated list request only reads the change sequence'''
+        first = self.client.get(RECIPE_URL, {'ordering': 'price'})
+
+        with self.assertNumQueries(1):
+            second = self.client.get(RECIPE_URL, {'ordering': 'price'})
+
+        self.assertEqual(first.data, second.data)
+
+    def test_list_response_invalidated_by_change(self):
+        '''Tests if a change of the user moves the list to a new key'''
+        self.client.get(RECIPE_URL)
+
+        Recipe.objects.create(owner=self.user, title='Salad', price=3)
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual([r['title'] for r in res.data],
+                         ['Salad', 'Stir fry'])
@@ -0,0 +1,124 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Change, Recipe, Tag, Ingredient
+
+CHANGES_URL = reverse('recipe:changes')
+
+
+class ChangeFeedTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'sync@gmail.com', 'sync', 'testpassword'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(owner=self.user, name='Dessert')
+        self.ingredient = Ingredient.objects.create(
+            owner=self.user, name='Sugar'
+        )
+        self.recipe = Recipe.objects.create(
+            owner=self.user, title='Fudge', price=4
+        )
+        self.recipe.tags.add(self.tag)
+
+    def tearDown(self):
+        cache.clear()
+
+    def sync(self, since=None, **params):
+        if since is not None:
+            params['since'] = since
+        return self.client.get(CHANGES_URL, params).data
+
+    def test_full_sync(self):
+        '''Tests if the first sync returns every object once'''
+        data = self.sync()
+
+        self.assertEqual(
+            [(c['type'], c['id']) for c in data['changes']],
+            [('tag', self.tag.pk), ('ingredient', self.ingredient.pk),
+             ('recipe', self.recipe.pk)]
+        )
+        self.assertEqual(data['changes'][2]['data']['tags'], [self.tag.pk])
+        self.assertFalse(data['has_more'])
+
+    def test_no_changes_one_query(self):
+        '''Tests if a sync without changes costs a single query'''
+        token = self.sync()['next']
+
+        with self.assertNumQueries(1):
+            data = self.sync(token)
+
+        self.assertEqual(data['changes'], [])
+        self.assertEqual(data['next'], token)
+
+    def test_stale_user_save_keeps_sequence(self):
+        '''Tests if saving a user loaded earlier does not reuse numbers'''
+        token = self.sync()['next']
+        stale = get_user_model().objects.get(pk=self.user.pk)
+        first = Recipe.objects.create(owner=self.user, title='Tart', price=3)
+
+        stale.name = 'renamed'
+        stale.save()
+        second = Recipe.objects.create(owner=self.user, title='Pie', price=5)
+
+        data = self.sync(token)
+        self.assertEqual(
+            [(c['type'], c['id']) for c in data['changes']],
+            [('recipe', first.pk), ('recipe', second.pk)]
+        )
+        seqs = Change.objects.filter(object_id__in=[first.pk, second.pk],
+                                     kind='recipe').values_list('seq',
+                                                                flat=True)
+        self.assertEqual(len(set(seqs)), 2)
+
+    def test_changes_and_tombstones(self):
+        '''Tests if only the changed objects and tombstones are returned'''
+        token = self.sync()['next']
+        self.ingredient.name = 'Honey'
+        self.ingredient.save()
+        tag_id = self.tag.pk
+        self.tag.delete()
+
+        data = self.sync(token)
+
+        self.assertEqual(data['changes'], [
+            {'type': 'ingredient', 'id': self.ingredient.pk,
+             'deleted': False,
+             'data': {'id': self.ingredient.pk, 'name': 'Honey'}},
+            {'type': 'recipe', 'id': self.recipe.pk, 'deleted': False,
+             'data': {'id': self.recipe.pk, 'title': 'Fudge',
+                      'price': '4.00', 'tags': [], 'ingredients': []}},
+            {'type': 'tag', 'id': tag_id, 'deleted': True},
+        ])
+
+    def test_paginated(self):
+        '''Tests if the feed is read page by page with the next token'''
+        first = self.sync(limit=2)
+        second = self.sync(first['next'], limit=2)
+
+        self.assertTrue(first['has_more'])
+        self.assertFalse(second['has_more'])
+        self.assertEqual(len(first['changes']) + len(second['changes']), 3)
+
+    def test_other_users_not_visible(self):
+        '''Tests if the changes of other users are not returned'''
+        other = get_user_model().objects.create_user(
+            'other@gmail.com', 'other', 'testpassword'
+        )
+        token = self.sync()['next']
+        Recipe.objects.create(owner=other, title='Secret', price=1)
+
+        self.assertEqual(self.sync(token)['changes'], [])
+
+    def test_user_deletion_drops_feed(self):
+        '''Tests if no change rows outlive their deleted user'''
+        self.user.delete()
+
+        self.assertFalse(Change.objects.exists())
@@ -118,6 +118,8 @@ class PrivateInteraction(TestCase):
 
         recipe = create_recipe(self.user)
         recipe.ingredients.add(ingredient_1, ingredient_2)
+        ingredient_1.refresh_from_db()
+        ingredient_2.refresh_from_db()
         serializer_1 = IngredientSerializer(
             [ingredient_2, ingredient_1],
             many=True
@@ -1,8 +1,11 @@
 import tempfile
 import os
+from io import StringIO
 
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
 from django.shortcuts import reverse
 
 from rest_framework import status
@@ -10,11 +13,14 @@ from rest_framework.test import APIClient
 
 from PIL import Image
 
+from core.ingredient_index import registry
 from core.models import Recipe, Tag, Ingredient
+from core.similarity import registry as similarity_registry
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
 
 
 RECIPE_URL = reverse('recipe:recipes-list')
+COOKABLE_URL = reverse('recipe:recipes-cookable')
 
 
 def create_user_model(**kwargs):
@@ -53,6 +59,18 @@ def create_detail_link(pk):
     return reverse('recipe:recipes-detail', args=[pk])
 
 
+def create_similar_link(pk):
+    return reverse('recipe:recipes-similar', args=[pk])
+
+
+def create_links_link(pk, relation, operation):
+    return reverse('recipe:recipes-links', args=[pk, relation, operation])
+
+
+def create_bulk_links_link(relation, operation):
+    return reverse('recipe:recipes-bulk-links', args=[relation, operation])
+
+
 def create_upload_link(pk):
     return reverse('recipe:recipes-upload-image', args=[pk])
 
@@ -84,6 +102,8 @@ class PrivateInteraction(TestCase):
     '''Tests all authorized user interactions with the api'''
 
     def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
         self.client = APIClient()
         self.user = create_user_model()
         self.client.force_authenticate(self.user)
@@ -225,6 +245,364 @@ class PrivateInteraction(TestCase):
         self.assertNotIn(serializer_2.data, res.data)
 
 
+class RecipeRelationsWriteTests(TestCase):
+    '''Tests the validation and the writes of the recipe relations'''
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user_model()
+        self.client.force_authenticate(self.user)
+        self.ingredients = [
+            create_ingredient(f'Ingr_{i}', self.user) for i in range(50)
+        ]
+
+    def test_foreign_and_missing_ids_reported(self):
+        '''Tests if all foreign and missing ids are reported together'''
+        other = create_user_model(email='other@gmail.com')
+        foreign = create_tag('Foreign', other)
+        own = create_tag('Own', self.user)
+
+        res = self.client.post(RECIPE_URL, {
+            'title': 'Soup',
+            'price': 5,
+            'tags': [own.pk, foreign.pk, 99999],
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(str(foreign.pk), str(res.data['tags']))
+        self.assertIn('99999', str(res.data['tags']))
+        self.assertNotIn(str(own.pk) + ',', str(res.data['tags']))
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_create_with_many_ingredients(self):
+        '''Tests if 50 ingredients are validated and linked in bulk'''
+        payload = {
+            'title': 'Stew',
+            'price': 5,
+            'ingredients': [i.pk for i in self.ingredients],
+        }
+
+        with self.assertNumQueries(16):
+            res = self.client.post(RECIPE_URL, payload)
+
+        recipe = Recipe.objects.get(pk=res.data['id'])
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(recipe.ingredients.count(), 50)
+
+    def test_update_applies_diff(self):
+        '''Tests if the update only removes and adds the changed links'''
+        recipe = create_recipe(self.user)
+        recipe.ingredients.add(*self.ingredients[:49])
+        ids = [i.pk for i in self.ingredients[1:]]
+
+        with self.assertNumQueries(23):
+            res = self.client.patch(
+                create_detail_link(recipe.pk), {'ingredients': ids}
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(recipe.ingredients.values_list('id', flat=True)),
+            sorted(ids)
+        )
+
+    def test_invalid_id_type(self):
+        '''Tests if non numeric ids are rejected'''
+        res = self.client.post(
+            RECIPE_URL, {'title': 'Soup', 'price': 5, 'tags': ['abc']}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipePriceOrderingTests(TestCase):
+    '''Tests the price and title filters and the ordering'''
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user_model()
+        self.client.force_authenticate(self.user)
+        for title, price in [('Soup', 3), ('Bread', 2), ('Steak', 20),
+                             ('Salad', 3), ('Cake', 8)]:
+            create_recipe(self.user, title=title, price=price)
+
+    def titles(self, params):
+        res = self.client.get(RECIPE_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['title'] for recipe in res.data]
+
+    def test_price_range(self):
+        '''Tests if min_price and max_price are both inclusive'''
+        self.assertEqual(
+            self.titles({'min_price': '3', 'max_price': '8'}),
+            ['Cake', 'Salad', 'Soup']
+        )
+
+        res = self.client.get(RECIPE_URL, {'min_price': 'cheap'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_title_range(self):
+        '''Tests if title_from is inclusive and title_to exclusive'''
+        self.assertEqual(
+            self.titles({'title_from': 'S', 'title_to': 'Sp'}),
+            ['Salad', 'Soup']
+        )
+
+    def test_ordering(self):
+        '''Tests if equal prices are ordered by title and then by id'''
+        create_recipe(self.user, title='Salad', price=3)
+        salads = list(
+            Recipe.objects.filter(title='Salad').order_by('id')
+            .values_list('id', flat=True)
+        )
+
+        self.assertEqual(
+            self.titles({'ordering': 'price', 'max_price': '3'}),
+            ['Bread', 'Salad', 'Salad', 'Soup']
+        )
+        self.assertEqual(
+            self.titles({'ordering': 'price,-title', 'max_price': '3'}),
+            ['Bread', 'Soup', 'Salad', 'Salad']
+        )
+        self.assertEqual(
+            self.titles({'ordering': '-price', 'min_price': '8'}),
+            ['Steak', 'Cake']
+        )
+        res = self.client.get(
+            RECIPE_URL, {'ordering': 'title', 'title_to': 'Sb'}
+        )
+        self.assertEqual(
+            [r['id'] for r in res.data if r['title'] == 'Salad'], salads
+        )
+        self.assertEqual(len(self.titles({'ordering': 'image'})), 6)
+
+
+class RecipeMultiGetTests(TestCase):
+    '''Tests fetching several recipes with ?ids'''
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+        self.user = create_user_model()
+        self.client.force_authenticate(self.user)
+        self.recipes = [
+            create_recipe(self.user, title=str(i)) for i in range(3)
+        ]
+        tag = create_tag('Dinner', self.user)
+        for recipe in self.recipes:
+            recipe.tags.add(tag)
+
+    def test_multi_get(self):
+        '''Tests if the details are returned in the order of the ids'''
+        other = create_recipe(create_user_model(email='other@gmail.com'))
+        ids = [self.recipes[2].pk, other.pk, self.recipes[0].pk, 999]
+
+        with self.assertNumQueries(4):
+            res = self.client.get(
+                RECIPE_URL, {'ids': ','.join(map(str, ids))}
+            )
+        with self.assertNumQueries(1):
+            cached = self.client.get(
+                RECIPE_URL, {'ids': f'{ids[0]},{ids[2]}'}
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['title'] for r in res.data], ['2', '0'])
+        self.assertEqual(res.data[0]['tags'][0]['name'], 'Dinner')
+        self.assertEqual(cached.data, res.data)
+        detail = self.client.get(create_detail_link(self.recipes[2].pk))
+        self.assertEqual(detail.data, res.data[0])
+
+    def test_multi_get_limit(self):
+        '''Tests if too many or malformed ids are rejected'''
+        ids = ','.join(str(i) for i in range(1, 102))
+
+        res = self.client.get(RECIPE_URL, {'ids': ids})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(RECIPE_URL, {'ids': '1,x'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CookableRecipesTests(TestCase):
+
+    def setUp(self):
+        registry.clear()
+        self.client = APIClient()
+        self.user = create_user_model()
+        self.client.force_authenticate(self.user)
+
+    def test_cookable_ranked(self):
+        '''Tests if the recipes coverable with the ingredients are ranked'''
+        salt = create_ingredient('Salt', self.user)
+        egg = create_ingredient('Egg', self.user)
+        milk = create_ingredient('Milk', self.user)
+        omelette = create_recipe(self.user, title='Omelette')
+        pancakes = create_recipe(self.user, title='Pancakes')
+        omelette.ingredients.add(salt, egg)
+        pancakes.ingredients.add(egg, milk)
+
+        exact = self.client.get(
+            COOKABLE_URL, {'ingredients': f'{salt.pk},{egg.pk}'}
+        )
+        relaxed = self.client.get(
+            COOKABLE_URL,
+            {'ingredients': f'{salt.pk},{egg.pk}', 'missing': 1}
+        )
+
+        self.assertEqual(exact.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in exact.data], [omelette.pk])
+        self.assertEqual(
+            [(r['id'], r['missing']) for r in relaxed.data],
+            [(omelette.pk, 0), (pancakes.pk, 1)]
+        )
+        self.assertEqual(relaxed.data[1]['coverage'], 0.5)
+
+    def test_cookable_only_own_recipes(self):
+        '''Tests if the recipes of the other users are not returned'''
+        other = create_user_model(email='other@gmail.com')
+        salt = create_ingredient('Salt', other)
+        create_recipe(other).ingredients.add(salt)
+
+        res = self.client.get(COOKABLE_URL, {'ingredients': f'{salt.pk}'})
+
+        self.assertEqual(res.data, [])
+
+    def test_cookable_invalid_ids(self):
+        '''Tests if invalid ingredient ids are rejected'''
+        res = self.client.get(COOKABLE_URL, {'ingredients': 'salt'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SimilarRecipesTests(TestCase):
+
+    def setUp(self):
+        similarity_registry.clear()
+        self.client = APIClient()
+        self.user = create_user_model()
+        self.client.force_authenticate(self.user)
+
+    def test_similar_recipes(self):
+        '''Tests if the recipes sharing tags and ingredients are listed'''
+        tag = create_tag('Breakfast', self.user)
+        egg = create_ingredient('Egg', self.user)
+        omelette = create_recipe(self.user, title='Omelette')
+        scrambled = create_recipe(self.user, title='Scrambled eggs')
+        soup = create_recipe(self.user, title='Soup')
+        for recipe in (omelette, scrambled):
+            recipe.tags.add(tag)
+            recipe.ingredients.add(egg)
+        soup.ingredients.add(create_ingredient('Water', self.user))
+        call_command('rebuild_similarity_index', stdout=StringIO())
+
+        res = self.client.get(create_similar_link(omelette.pk))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+        self.assertEqual(res.data[0]['id'], scrambled.pk)
+        self.assertEqual(res.data[0]['similarity'], 1.0)
+
+    def test_similar_other_user_recipe(self):
+        '''Tests that the similar recipes of other users are not found'''
+        recipe = create_recipe(create_user_model(email='other@gmail.com'))
+
+        res = self.client.get(create_similar_link(recipe.pk))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RecipeLinksTests(TestCase):
+    '''Tests the set-based add and remove of recipe tags and ingredients'''
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user_model()
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(self.user)
+        self.vegan = create_tag('Vegan', self.user)
+        self.spicy = create_tag('Spicy', self.user)
+        self.recipe.tags.add(self.vegan)
+
+    def test_add_keeps_existing(self):
+        '''Tests if adding skips the existing links and keeps the others'''
+        url = create_links_link(self.recipe.pk, 'tags', 'add')
+
+        res = self.client.post(
+            url, {'ids': [self.vegan.pk, self.spicy.pk]}, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'added': 1})
+        self.assertCountEqual(self.recipe.tags.all(), [self.vegan, self.spicy])
+        self.vegan.refresh_from_db()
+        self.spicy.refresh_from_db()
+        self.assertEqual(self.vegan.recipe_count, 1)
+        self.assertEqual(self.spicy.recipe_count, 1)
+
+    def test_remove(self):
+        '''Tests if removing deletes only the given links'''
+        ingredient = create_ingredient('Salt', self.user)
+        self.recipe.ingredients.add(ingredient)
+        url = create_links_link(self.recipe.pk, 'ingredients', 'remove')
+
+        res = self.client.post(url, {'ids': [ingredient.pk]}, format='json')
+
+        self.assertEqual(res.data, {'removed': 1})
+        self.assertFalse(self.recipe.ingredients.exists())
+        self.assertEqual(list(self.recipe.tags.all()), [self.vegan])
+        ingredient.refresh_from_db()
+        self.assertEqual(ingredient.recipe_count, 0)
+
+    def test_foreign_ids_rejected(self):
+        '''Tests if the tags and recipes of other users are rejected'''
+        other = create_user_model(email='other@gmail.com')
+        foreign_tag = create_tag('Foreign', other)
+        foreign_recipe = create_recipe(other)
+
+        res = self.client.post(
+            create_links_link(self.recipe.pk, 'tags', 'add'),
+            {'ids': [foreign_tag.pk]}, format='json'
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(
+            create_links_link(foreign_recipe.pk, 'tags', 'add'),
+            {'ids': [self.spicy.pk]}, format='json'
+        )
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(foreign_recipe.tags.exists())
+
+    def test_bulk_add(self):
+        '''Tests if a tag is added to many recipes with a few queries'''
+        recipes = [create_recipe(self.user) for _ in range(30)]
+        url = create_bulk_links_link('tags', 'add')
+        payload = {
+            'recipes': [recipe.pk for recipe in recipes] + [self.recipe.pk],
+            'ids': [self.vegan.pk],
+        }
+
+        with self.assertNumQueries(11):
+            res = self.client.post(url, payload, format='json')
+
+        self.assertEqual(res.data, {'added': 30})
+        self.vegan.refresh_from_db()
+        self.assertEqual(self.vegan.recipe_count, 31)
+        self.assertEqual(self.vegan.recipe_set.count(), 31)
+
+    def test_bulk_remove_missing_recipe(self):
+        '''Tests if unknown recipes are reported and nothing is removed'''
+        url = create_bulk_links_link('tags', 'remove')
+        payload = {'recipes': [self.recipe.pk, 9999], 'ids': [self.vegan.pk]}
+
+        res = self.client.post(url, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('recipes', res.data)
+        self.assertTrue(self.recipe.tags.exists())
+
+
 class RecipesImagesTests(TestCase):
 
     def setUp(self):
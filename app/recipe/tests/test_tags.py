@@ -114,6 +114,8 @@ class PrivateInteraction(TestCase):
         recipe = create_recipe(self.user)
 
         recipe.tags.add(tag_1, tag_2)
+        tag_1.refresh_from_db()
+        tag_2.refresh_from_db()
         serializer_1 = TagSerializer([tag_2, tag_1], many=True)
         serializer_2 = TagSerializer(tag_3)
 
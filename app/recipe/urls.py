@@ -2,7 +2,8 @@ from django.urls import include, path
 
 from rest_framework.routers import DefaultRouter
 
-from recipe.views import TagViewSet, IngredientViewSet, RecipeViewSet
+from recipe.views import TagViewSet, IngredientViewSet, RecipeViewSet, \
+                         ChangesView
 
 app_name = 'recipe'
 
@@ -12,5 +13,6 @@ router.register(r'ingredients', IngredientViewSet, basename='ingredients')
 router.register(r'recipes', RecipeViewSet, basename='recipes')
 
 urlpatterns = [
+    path('changes/', ChangesView.as_view(), name='changes'),
     path('', include(router.urls)),
 ]
@@ -1,66 +1,293 @@
+import hashlib
+
 from rest_framework import viewsets, mixins
+from rest_framework.views import APIView
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+
+from django.conf import settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
 
-from core.models import Tag, Ingredient, Recipe
+from core import outbox
+from core.changes import read_changes
+from core.idempotency import IdempotencyMixin
+from core.renderers import ORJSONRenderer
+
+from core.ingredient_index import registry as ingredient_registry
+from core.models import ChangeSequence, Tag, Ingredient, Recipe
+from core.pagination import EstimatedPageNumberPagination
+from core.relations import change_links
+from core.similarity import registry as similarity_registry
+from recipe import cache as recipe_cache
+from core.throttling import ReadWriteThrottle
 from core.filters import IsOwnerFilterBackend, RecipeTagsFilterBackend, \
                          RecipeIngredientsFilterBackend, \
-                         AssignedToRecipeFilterBackend
+                         AssignedToRecipeFilterBackend, \
+                         RecipePriceFilterBackend, \
+                         RecipeTitleFilterBackend, RecipeOrderingFilter, \
+                         parse_ids, parse_int
 from recipe.serializers import TagSerializer, IngredientSerializer, \
                                RecipeSerializer, RecipeDetailSerializer, \
-                               RecipeImageSerializer
+                               RecipeImageSerializer, \
+                               CookableRecipeSerializer, \
+                               SimilarRecipeSerializer, \
+                               RecipeLinksSerializer, \
+                               BulkRecipeLinksSerializer, \
+                               SyncTagSerializer, SyncIngredientSerializer
+
+LINKS_PATH = r'(?P<relation>tags|ingredients)/(?P<operation>add|remove)'
 
 
-class RecipePartsBaseViewSet(mixins.ListModelMixin,
+class RecipePartsBaseViewSet(IdempotencyMixin,
+                             mixins.ListModelMixin,
                              mixins.CreateModelMixin,
                              viewsets.GenericViewSet):
     '''Base viewset for both tags and ingredients'''
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    throttle_classes = [ReadWriteThrottle]
+    pagination_class = EstimatedPageNumberPagination
     filter_backends = [IsOwnerFilterBackend, AssignedToRecipeFilterBackend]
 
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)
+        instance = serializer.save(owner=self.request.user)
+        outbox.record(
+            f'{self.event_name}.created', self.request.user.pk, instance.pk,
+            {'id': instance.pk, 'name': instance.name},
+        )
 
 
 class TagViewSet(RecipePartsBaseViewSet):
     '''Retrieve, update or create new tag'''
     queryset = Tag.objects.all().order_by('-name')
     serializer_class = TagSerializer
+    event_name = 'tag'
 
 
 class IngredientViewSet(RecipePartsBaseViewSet):
     '''Retrieve, update or create new ingredient'''
     queryset = Ingredient.objects.all().order_by('-name')
     serializer_class = IngredientSerializer
+    event_name = 'ingredient'
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(IdempotencyMixin, viewsets.ModelViewSet):
     '''Retrieve, update or create new recipe'''
     authentication_classes = [TokenAuthentication, ]
     permission_classes = [IsAuthenticated, ]
+    throttle_classes = [ReadWriteThrottle, ]
+    pagination_class = EstimatedPageNumberPagination
 
     queryset = Recipe.objects.all().order_by('-id')
     serializer_class = RecipeSerializer
     filter_backends = [
         IsOwnerFilterBackend, RecipeIngredientsFilterBackend,
-        RecipeTagsFilterBackend,
+        RecipeTagsFilterBackend, RecipePriceFilterBackend,
+        RecipeTitleFilterBackend, RecipeOrderingFilter,
     ]
 
+    def record_event(self, action, recipe_id, payload):
+        outbox.record(
+            f'recipe.{action}', self.request.user.pk, recipe_id, payload
+        )
+
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)
+        recipe = serializer.save(owner=self.request.user)
+        self.record_event('created', recipe.pk, serializer.data)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        recipe = serializer.save()
+        self.record_event('updated', recipe.pk, serializer.data)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        recipe_id = instance.pk
+        instance.delete()
+        self.record_event('deleted', recipe_id, {'id': recipe_id})
+
+    def list(self, request, *args, **kwargs):
+        '''
+        Serves the cached response of the same request of the user while
+        the user has not changed anything, the response is otherwise
+        assembled from the cached recipe representations
+        '''
+        if 'ids' in request.query_params:
+            return self.multi_get(request)
+        change_seq = ChangeSequence.objects.filter(owner=request.user) \
+            .values_list('seq', flat=True).first()
+        request_key = hashlib.md5(repr((
+            request.get_host(), sorted(request.query_params.lists())
+        )).encode()).hexdigest()
+        return Response(recipe_cache.fetch_results(
+            request.user.pk, change_seq, request_key, self.list_results
+        ))
+
+    def list_results(self):
+        request = self.request
+        queryset = self.filter_queryset(self.get_queryset())
+        recipe_ids = queryset.values_list('id', flat=True)
+
+        def serialize(recipes):
+            return self.get_serializer(recipes, many=True).data
+
+        page = self.paginate_queryset(recipe_ids)
+        if page is not None:
+            return self.get_paginated_response(
+                recipe_cache.list_representations(
+                    page, serialize, request.user.pk
+                )
+            ).data
+        return recipe_cache.list_representations(
+            list(recipe_ids), serialize, request.user.pk
+        )
+
+    def multi_get(self, request):
+        '''
+        Returns the detail representations of the ?ids recipes in the
+        given order, the ids of missing recipes are skipped
+        '''
+        recipe_ids = list(dict.fromkeys(
+            parse_ids(request.query_params['ids'], 'ids')
+        ))
+        if len(recipe_ids) > settings.RECIPE_MULTI_GET_MAX_IDS:
+            raise ValidationError({'ids': (
+                f'Ensure this field has no more than '
+                f'{settings.RECIPE_MULTI_GET_MAX_IDS} elements.'
+            )})
+
+        def serialize(recipes):
+            return RecipeDetailSerializer(
+                recipes, many=True, context=self.get_serializer_context()
+            ).data
+
+        return Response(recipe_cache.detail_representations(
+            recipe_ids, request.user.pk, serialize
+        ))
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        '''Streams the recipes as JSON lines, one batch per chunk'''
+        queryset = self.filter_queryset(self.get_queryset()).order_by('-id')
+        return StreamingHttpResponse(
+            self.export_lines(queryset),
+            content_type='application/x-ndjson',
+        )
+
+    def export_lines(self, queryset):
+        renderer = ORJSONRenderer()
+
+        def serialize(recipes):
+            return self.get_serializer(recipes, many=True).data
+
+        last_id = None
+        while True:
+            batch = queryset if last_id is None \
+                else queryset.filter(id__lt=last_id)
+            recipe_ids = list(
+                batch.values_list('id', flat=True)
+                [:settings.EXPORT_BATCH_SIZE]
+            )
+            if not recipe_ids:
+                return
+            yield b''.join(
+                renderer.render(data) + b'\n' for data in
+                recipe_cache.list_representations(
+                    recipe_ids, serialize, self.request.user.pk
+                )
+            )
+            last_id = recipe_ids[-1]
+
+    def retrieve(self, request, *args, **kwargs):
+        '''Serves the cached detail representation of the recipe'''
+        if request.query_params:
+            return super().retrieve(request, *args, **kwargs)
+        try:
+            recipe_id = int(kwargs[self.lookup_field])
+        except ValueError:
+            return super().retrieve(request, *args, **kwargs)
+
+        return Response(recipe_cache.fetch_detail(
+            recipe_id, request.user.pk,
+            lambda: self.get_serializer(self.get_object()).data,
+        ))
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return RecipeDetailSerializer
         elif self.action == 'upload_image':
             return RecipeImageSerializer
+        elif self.action == 'cookable':
+            return CookableRecipeSerializer
+        elif self.action == 'similar':
+            return SimilarRecipeSerializer
+        elif self.action == 'links':
+            return RecipeLinksSerializer
+        elif self.action == 'bulk_links':
+            return BulkRecipeLinksSerializer
         else:
             return self.serializer_class
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['relation'] = self.kwargs.get('relation')
+        return context
+
+    @transaction.atomic
+    def change_links(self, relation, operation, recipe_ids, target_ids):
+        owner_id = self.request.user.pk
+        key = 'added' if operation == 'add' else 'removed'
+        links = change_links(
+            relation, operation, owner_id, recipe_ids, target_ids
+        )
+        changed = {}
+        for recipe_id, target_id in links:
+            changed.setdefault(recipe_id, []).append(target_id)
+        outbox.record_many(
+            (f'recipe.{relation}_{key}', owner_id, recipe_id,
+             {'id': recipe_id, relation: ids})
+            for recipe_id, ids in changed.items()
+        )
+        return Response({key: len(links)}, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['post'], url_path=LINKS_PATH,
+            url_name='links')
+    def links(self, request, pk=None, relation=None, operation=None):
+        '''
+        Adds or removes the given tags or ingredients of the recipe
+        without touching its other links
+        '''
+        recipe_id = get_object_or_404(
+            self.filter_queryset(self.get_queryset())
+            .values_list('pk', flat=True),
+            pk=pk,
+        )
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return self.change_links(
+            relation, operation, [recipe_id],
+            serializer.validated_data['ids'],
+        )
+
+    @action(detail=False, methods=['post'], url_path=LINKS_PATH,
+            url_name='bulk-links')
+    def bulk_links(self, request, relation=None, operation=None):
+        '''Adds or removes the given tags or ingredients of many recipes'''
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return self.change_links(
+            relation, operation, serializer.validated_data['recipes'],
+            serializer.validated_data['ids'],
+        )
+
     @action(detail=True, methods=['post'], url_path='upload-image')
     def upload_image(self, request, pk=None):
         recipe = self.get_object()
@@ -70,9 +297,130 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
 
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
+                self.record_event('image_updated', recipe.pk, {
+                    'id': recipe.pk, 'image': recipe.image.name,
+                })
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
         )
+
+    @action(detail=False, methods=['get'])
+    def cookable(self, request):
+        '''
+        Lists the recipes which can be cooked with the given ingredients,
+        missing at most `missing` of their ingredients
+        '''
+        ingredients = parse_ids(
+            request.query_params.get('ingredients', ''), 'ingredients'
+        )
+        missing = parse_int(request, 'missing', 0)
+
+        index = ingredient_registry.get(request.user.pk)
+        matches = index.search(ingredients, missing)
+        matches = matches[:settings.COOKABLE_MAX_RESULTS]
+
+        recipes = Recipe.objects.filter(owner=request.user) \
+            .prefetch_related('tags', 'ingredients') \
+            .in_bulk([recipe_id for recipe_id, _, _ in matches])
+        ranked = []
+        for recipe_id, covered, total in matches:
+            recipe = recipes.get(recipe_id)
+            if recipe is not None:
+                recipe.missing = total - covered
+                recipe.coverage = covered / total
+                ranked.append(recipe)
+
+        serializer = self.get_serializer(ranked, many=True)
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        '''
+        Lists up to `k` recipes with the most similar sets of tags and
+        ingredients
+        '''
+        recipe = self.get_object()
+        k = parse_int(request, 'k', 10, settings.SIMILAR_MAX_RESULTS)
+
+        index = similarity_registry.get(request.user.pk)
+        matches = index.similar(recipe.pk, k)
+
+        recipes = Recipe.objects.filter(owner=request.user) \
+            .prefetch_related('tags', 'ingredients') \
+            .in_bulk([recipe_id for recipe_id, _ in matches])
+        ranked = []
+        for recipe_id, similarity in matches:
+            similar = recipes.get(recipe_id)
+            if similar is not None:
+                similar.similarity = similarity
+                ranked.append(similar)
+
+        serializer = self.get_serializer(ranked, many=True)
+        return Response(serializer.data)
+
+
+class ChangesView(APIView):
+    '''
+    Lists the recipes, tags and ingredients changed after the `since`
+    token, deleted objects are returned as tombstones. Clients store the
+    returned `next` token and ask again while `has_more` is true
+    '''
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [ReadWriteThrottle]
+
+    sync_serializers = {
+        'tag': (Tag, SyncTagSerializer),
+        'ingredient': (Ingredient, SyncIngredientSerializer),
+    }
+
+    def serialize_recipes(self, recipes):
+        return RecipeSerializer(recipes, many=True).data
+
+    def get(self, request):
+        since = parse_int(request, 'since', 0)
+        limit = parse_int(
+            request, 'limit', settings.CHANGES_PAGE_SIZE,
+            settings.CHANGES_PAGE_SIZE,
+        ) or settings.CHANGES_PAGE_SIZE
+        changes, has_more = read_changes(request.user.pk, since, limit)
+
+        changed = {}
+        for kind, object_id, _, deleted in changes:
+            if not deleted:
+                changed.setdefault(kind, []).append(object_id)
+        data = {}
+        if 'recipe' in changed:
+            for recipe in recipe_cache.list_representations(
+                    changed['recipe'], self.serialize_recipes,
+                    request.user.pk):
+                data['recipe', recipe['id']] = recipe
+        for kind, (model, serializer_class) in self.sync_serializers.items():
+            if kind in changed:
+                objects = model.objects.filter(
+                    owner=request.user, pk__in=changed[kind]
+                )
+                for item in serializer_class(objects, many=True).data:
+                    data[kind, item['id']] = item
+
+        results = []
+        for kind, object_id, _, deleted in changes:
+            if deleted:
+                results.append(
+                    {'type': kind, 'id': object_id, 'deleted': True}
+                )
+            elif (kind, object_id) in data:
+                results.append({
+                    'type': kind, 'id': object_id, 'deleted': False,
+                    'data': data[kind, object_id],
+                })
+
+        return Response({
+            'changes': results,
+            'next': str(changes[-1][2] if changes else since),
+            'has_more': has_more,
+        })
@@ -1,28 +1,39 @@
-from rest_framework import generics
+from rest_framework import generics, status
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
+from core.purge import request_deletion
+from core.throttling import ReadWriteThrottle, LoginThrottle
 from user.serializers import UserSerializer, UserTokenSerializer
 
 
 class UserCreationView(generics.CreateAPIView):
     serializer_class = UserSerializer
+    throttle_classes = [LoginThrottle]
 
 
 class UserCreateTokenView(ObtainAuthToken):
     serializer_class = UserTokenSerializer
+    throttle_classes = [LoginThrottle]
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
 
-class UserInformationView(generics.RetrieveUpdateAPIView):
-    '''View of user profile, patching profile'''
+class UserInformationView(generics.RetrieveUpdateDestroyAPIView):
+    '''View of user profile, patching and deleting profile'''
 
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    throttle_classes = [ReadWriteThrottle]
     serializer_class = UserSerializer
 
     def get_object(self):
         '''Retrieve authenticated user'''
         return self.request.user
+
+    def destroy(self, request, *args, **kwargs):
+        '''Deactivates the account, the data is purged in the background'''
+        request_deletion(self.get_object())
+        return Response(status=status.HTTP_202_ACCEPTED)